@@ -0,0 +1,122 @@
+# accentuation.py
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+from gauss_backend import gaussian
+from precision import en_float
+from traces import span
+from tuiles import TAILLE_TUILE, appliquer_par_tuiles, halo_gaussien
+
+# Sigma minimal (base et incrément) pour composer deux flous sans erreur visible.
+# Sous ~1 px, le noyau échantillonné s'éloigne trop de la vraie gaussienne.
+SIGMA_MIN_COMPOSE = 1.0
+
+
+def _flou(image: np.ndarray, sigma: float, channel_axis: int | None) -> np.ndarray:
+    if sigma <= 0:
+        return image
+    return gaussian(image, sigma, channel_axis=channel_axis)
+
+
+def flous_incrementaux(
+    image: np.ndarray,
+    sigmas: Iterable[float],
+    channel_axis: int | None = -1,
+    sigma_min: float = SIGMA_MIN_COMPOSE,
+) -> Iterator[tuple[float, np.ndarray]]:
+    # Génère (sigma, flou) pour chaque sigma, en construisant chaque flou à partir
+    # d'un flou précédent: G(s) = G(sqrt(s² - a²)) * G(a).
+    # On garde seulement deux "ancres" espacées d'au moins sigma_min (en quadrature),
+    # ce qui garantit qu'une des deux est toujours utilisable pour le sigma suivant.
+    if image.ndim == 2:
+        channel_axis = None
+    sigmas = [float(s) for s in sigmas]
+
+    # Bordure 'edge' assez large pour le plus grand sigma: la composition avec
+    # mode='nearest' donne alors le même résultat qu'un flou direct, même aux bords.
+    pad = int(np.ceil(4.0 * max(sigmas, default=0.0))) + 1
+    pad_width = [(pad, pad), (pad, pad)]
+    if channel_axis is not None:
+        pad_width.insert(channel_axis % image.ndim, (0, 0))
+    image_pad = np.pad(image, pad_width, mode="edge")
+    coupe = tuple(slice(None) if w == (0, 0) else slice(pad, -pad) for w in pad_width)
+
+    ancres: list[tuple[float, np.ndarray]] = []
+    sigma_prec = -np.inf
+
+    for s in sigmas:
+        # Sigmas pas en ordre croissant -> on repart de l'original
+        if s < sigma_prec:
+            ancres = []
+        sigma_prec = s
+
+        base = None
+        if s >= sigma_min:
+            for a, flou_a in reversed(ancres):
+                if s * s - a * a >= sigma_min * sigma_min:
+                    base = (a, flou_a)
+                    break
+
+        with span("filtre", octets=image_pad.nbytes, sigma=s, incremental=base is not None):
+            if base is None:
+                flou = _flou(image_pad, s, channel_axis)
+            else:
+                a, flou_a = base
+                flou = _flou(flou_a, np.sqrt(s * s - a * a), channel_axis)
+
+        # Nouvelle ancre seulement si assez loin de la dernière
+        if s >= sigma_min and (not ancres or s * s - ancres[-1][0] ** 2 >= sigma_min * sigma_min):
+            ancres = ancres[-1:] + [(s, flou)]
+
+        yield s, flou[coupe]
+
+
+def accentuation_sigmas(
+    image: np.ndarray,
+    sigmas: Iterable[float],
+    channel_axis: int | None = -1,
+) -> Iterator[tuple[float, np.ndarray]]:
+    # Accentuation pour une liste de sigmas, tous les canaux en un seul appel.
+    # img_sharp = image + sigma * (image - flou), comme accentuation() dans main_accentuation.
+    for s, flou in flous_incrementaux(image, sigmas, channel_axis=channel_axis):
+        with span("combinaison", octets=image.nbytes, sigma=s):
+            sharp = image + s * (image - flou)
+        yield s, sharp
+
+
+def accentuation_tuiles(
+    image: np.ndarray,
+    sigmas: Sequence[float],
+    sorties: Sequence[np.ndarray],
+    taille: int = TAILLE_TUILE,
+) -> None:
+    # Accentuation par tuiles pour les images plus grandes que la RAM (voir tuiles.py).
+    # image: uint8 (ou float [0,1]) gris/RGB/RGBA, typiquement un memmap de Scratch.image().
+    # sorties: un tableau uint8 par sigma, même forme que image (alpha recopié tel quel).
+    # Flou direct pour chaque sigma (pas de composition): identique à un flou direct de l'image
+    # entière, mais pas octet pour octet à accentuation_sigmas(), qui compose les flous et
+    # choisit spatial/FFT selon la taille de l'image entière (écarts de 1 niveau uint8 sur
+    # quelques centaines de pixels): les deux modes ont des signatures de build distinctes.
+    # Tous les sigmas de sorties sont tenus en même temps par tuile: passer de petits lots.
+    echelle = 255.0 if np.issubdtype(image.dtype, np.integer) else 1.0
+    channel_axis = -1 if image.ndim == 3 else None
+
+    def tuile(t: np.ndarray) -> list[np.ndarray]:
+        alpha = None
+        if t.ndim == 3 and t.shape[2] == 4:
+            alpha = t[:, :, 3]
+            t = t[:, :, :3]
+        img = en_float(t) / echelle
+
+        resultats = []
+        for s in sigmas:
+            sharp = img + s * (img - _flou(img, s, channel_axis))
+            sharp_u8 = np.clip(sharp * 255.0, 0, 255).astype(np.uint8)
+            if alpha is not None:
+                sharp_u8 = np.dstack((sharp_u8, alpha))
+            resultats.append(sharp_u8)
+        return resultats
+
+    appliquer_par_tuiles(tuile, [image], sorties, halo=halo_gaussien(max(sigmas, default=0.0)), taille=taille)
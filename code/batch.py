@@ -0,0 +1,291 @@
+# batch.py
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from fichiers_image import FORMATS, PROFILS, ecritures, format_octets, lire_image, set_encodage
+from precision import set_precision
+
+# Plusieurs travaux (accentuation, hybrides, piles, mélange, rapport) décrits dans un seul
+# fichier TOML ou JSON, exécutés dans un seul processus: les modules (numpy, scipy, skimage,
+# matplotlib) ne sont importés qu'une fois, et une image utilisée par plusieurs travaux
+# n'est décodée qu'une fois.
+#
+#   python code/batch.py travaux.toml
+#   python code/batch.py travaux.json --seulement hybride rapport
+#
+# Exemple (TOML):
+#
+#   [defauts]
+#   precision = "float32"       # précision du pipeline (voir precision.py)
+#   n_workers = 4               # processus des sweeps (absent: tous les coeurs)
+#   encodage = "brouillon"      # effort de compression: brouillon, standard, publication
+#   format = "webp"             # format des sorties: png (défaut) ou webp sans perte
+#
+#   [[travail]]
+#   type = "accentuation"
+#   images = ["web/images/data/Iris.png", "web/images/data/Optimus.png"]
+#
+#   [[travail]]
+#   type = "hybride"
+#   paire = "T3"                # ou images = ["a.png", "b.png"]
+#   out_dir = "web/images/hybrid/T3"
+#   cutoff_lows = [5.0, 10.0]
+#   cutoff_highs = [5.0, 10.0]
+#   auto = true
+#   tuiles = true               # calcul par tuiles (images plus grandes que la RAM, sans amplitudes FFT)
+#
+#   [[travail]]
+#   type = "pile"
+#   image = "web/images/data/Partie2.jpg"
+#   couleur = true              # piles en couleur (défaut: image convertie en gris)
+#
+#   [[travail]]
+#   type = "melange"
+#   images = ["web/images/data/Pomme.png", "web/images/data/Orange.png"]
+#   masque = "web/images/data/masque_melange.png"
+#
+#   [[travail]]
+#   type = "rapport"
+#
+# Chemins relatifs au dossier courant (la racine du dépôt, comme les scripts main_*).
+# Chaque travail garde le manifeste de build: ce qui est à jour n'est pas recalculé.
+# Pas d'interface graphique: un hybride doit avoir "auto = true" (pas d'alignement par clics).
+
+
+class LecteurImages:
+    # Images décodées gardées par chemin (et date de modification): un seul décodage par
+    # image pour tout le lot. Les tableaux sont en lecture seule, partagés entre travaux.
+
+    def __init__(self) -> None:
+        self._images: dict[tuple[Path, int], np.ndarray] = {}
+        self.decodages = 0
+
+    def __call__(self, chemin: str | Path) -> np.ndarray:
+        chemin = Path(chemin).resolve()
+        cle = (chemin, chemin.stat().st_mtime_ns)
+        img = self._images.get(cle)
+        if img is None:
+            img = lire_image(chemin)
+            img.setflags(write=False)
+            self._images[cle] = img
+            self.decodages += 1
+        return img
+
+
+def _chemins(valeurs: list[str]) -> list[Path]:
+    return [Path(v) for v in valeurs]
+
+
+def _accentuation(t: dict[str, Any], lire: LecteurImages, n_workers: int | None) -> None:
+    import main_accentuation
+
+    main_accentuation.accentuer(
+        _chemins(t["images"]),
+        sigma=t.get("sigmas", main_accentuation.SIGMAS),
+        out_dir=Path(t.get("out_dir", main_accentuation.OUT_DIR)),
+        lire=lire,
+        n_workers=n_workers,
+    )
+
+
+def _hybride(t: dict[str, Any], lire: LecteurImages, n_workers: int | None) -> None:
+    import main_hybride
+
+    if "paire" in t:
+        img1_path, img2_path = main_hybride.PAIRES[t["paire"]]
+    else:
+        img1_path, img2_path = _chemins(t["images"])
+    out_dir = Path(t.get("out_dir", main_hybride.OUT_DIR))
+    main_hybride.hybrider(
+        img1_path, img2_path,
+        out_dir=out_dir,
+        out_amp_dir=Path(t.get("out_amp_dir", out_dir / "amplitude")),
+        cutoff_lows=t.get("cutoff_lows", main_hybride.CUTOFF_LOWS),
+        cutoff_highs=t.get("cutoff_highs", main_hybride.CUTOFF_HIGHS),
+        auto=t["auto"],
+        cache=t.get("cache", main_hybride.CACHE_ALIGNEMENT),
+        lire=lire,
+        n_workers=n_workers,
+        tuiles=t.get("tuiles", main_hybride.TUILES),
+    )
+
+
+def _pile(t: dict[str, Any], lire: LecteurImages, n_workers: int | None) -> None:
+    import main_pile
+
+    main_pile.empiler(
+        Path(t["image"]),
+        Path(t.get("out_dir", "web/images/pile")),
+        n_levels=t.get("n_levels", 6),
+        sigma0=t.get("sigma0", 2.0),
+        sigma_mult=t.get("sigma_mult", 2.0),
+        lire=lire,
+        n_workers=n_workers,
+        couleur=t.get("couleur", main_pile.COULEUR),
+    )
+
+
+def _melange(t: dict[str, Any], lire: LecteurImages, n_workers: int | None) -> None:
+    import main_melange
+
+    img_a_path, img_b_path = _chemins(t["images"])
+    main_melange.melanger(
+        img_a_path, img_b_path,
+        Path(t["masque"]) if "masque" in t else None,
+        Path(t.get("out_dir", "web/images/melange")),
+        n_levels=t.get("n_levels", 6),
+        sigma0=t.get("sigma0", 2.0),
+        sigma_mult=t.get("sigma_mult", 2.0),
+        lire=lire,
+    )
+
+
+def _rapport(t: dict[str, Any], lire: LecteurImages, n_workers: int | None) -> None:
+    import generate_report_tp2
+
+    generate_report_tp2.generer_rapport(Path(t.get("sortie", generate_report_tp2.OUTPUT_HTML)), n_workers=n_workers)
+
+
+# type -> (fonction, clés obligatoires, clés optionnelles)
+# (n_workers seulement pour les travaux qui font un sweep: le mélange est séquentiel)
+TRAVAUX: dict[str, tuple[Callable[..., None], set[str], set[str]]] = {
+    "accentuation": (_accentuation, {"images"}, {"sigmas", "out_dir", "n_workers"}),
+    "hybride": (_hybride, {"auto"}, {"paire", "images", "out_dir", "out_amp_dir", "cutoff_lows",
+                                     "cutoff_highs", "cache", "tuiles", "n_workers"}),
+    "pile": (_pile, {"image"}, {"out_dir", "n_levels", "sigma0", "sigma_mult", "couleur", "n_workers"}),
+    "melange": (_melange, {"images"}, {"masque", "out_dir", "n_levels", "sigma0", "sigma_mult"}),
+    "rapport": (_rapport, set(), {"sortie", "n_workers"}),
+}
+
+# Clés acceptées par tous les travaux
+CLES_COMMUNES = {"type", "nom"}
+
+
+def lire_fichier(chemin: Path) -> dict[str, Any]:
+    # TOML (Python 3.11+) ou JSON, selon l'extension
+    texte = chemin.read_text(encoding="utf-8")
+    if chemin.suffix == ".toml":
+        import tomllib
+        return tomllib.loads(texte)
+    return json.loads(texte)
+
+
+def _fichiers_entree(t: dict[str, Any]) -> list[Path]:
+    # Fichiers lus par un travail (images, masque), pour les vérifier avant le premier calcul
+    if t["type"] == "pile":
+        return [Path(t["image"])]
+    if t["type"] == "hybride" and "paire" in t:
+        import main_hybride
+        return list(main_hybride.PAIRES.get(t["paire"], ()))
+    chemins = _chemins(t.get("images", []))
+    if "masque" in t:
+        chemins.append(Path(t["masque"]))
+    return chemins
+
+
+def valider(lot: dict[str, Any]) -> list[dict[str, Any]]:
+    # Toutes les erreurs de description avant le premier calcul (pas d'échec après 10 minutes)
+    travaux = lot.get("travail", [])
+    if not travaux:
+        raise ValueError("Aucun [[travail]] dans le fichier")
+    erreurs = []
+    defauts = lot.get("defauts", {})
+    if defauts.get("encodage", "standard") not in PROFILS:
+        erreurs.append(f"defauts: encodage {defauts['encodage']!r} inconnu (attendu: {', '.join(PROFILS)})")
+    if defauts.get("format", "png") not in FORMATS:
+        erreurs.append(f"defauts: format {defauts['format']!r} inconnu (attendu: {', '.join(FORMATS)})")
+    for k, t in enumerate(travaux, start=1):
+        type_ = t.get("type")
+        if type_ not in TRAVAUX:
+            erreurs.append(f"travail {k}: type {type_!r} inconnu (attendu: {', '.join(TRAVAUX)})")
+            continue
+        _, obligatoires, optionnelles = TRAVAUX[type_]
+        manquantes = obligatoires - set(t)
+        inconnues = set(t) - obligatoires - optionnelles - CLES_COMMUNES
+        if manquantes:
+            erreurs.append(f"travail {k} ({type_}): clé(s) manquante(s) {sorted(manquantes)}")
+        if inconnues:
+            erreurs.append(f"travail {k} ({type_}): clé(s) inconnue(s) {sorted(inconnues)}")
+        if manquantes or inconnues:
+            continue
+        if type_ == "hybride" and ("paire" in t) == ("images" in t):
+            erreurs.append(f"travail {k} (hybride): donner 'paire' ou 'images' (un seul des deux)")
+            continue
+        if type_ == "hybride" and t["auto"] is not True:
+            erreurs.append(f"travail {k} (hybride): alignement par clics impossible en mode batch "
+                           "(mettre auto = true)")
+        if type_ == "hybride" and "paire" in t:
+            import main_hybride
+            if t["paire"] not in main_hybride.PAIRES:
+                erreurs.append(f"travail {k} (hybride): paire {t['paire']!r} inconnue "
+                               f"(attendu: {', '.join(main_hybride.PAIRES)})")
+        if type_ in ("hybride", "melange") and "images" in t and len(t["images"]) != 2:
+            erreurs.append(f"travail {k} ({type_}): 'images' doit contenir 2 chemins")
+        for p in _fichiers_entree(t):
+            if not p.is_file():
+                erreurs.append(f"travail {k} ({type_}): fichier introuvable {p}")
+    if erreurs:
+        raise ValueError("Fichier de travaux invalide:\n  " + "\n  ".join(erreurs))
+    return travaux
+
+
+def executer(lot: dict[str, Any], seulement: list[str] | None = None) -> list[tuple[str, float]]:
+    # Exécute les travaux dans l'ordre du fichier; retourne (nom, secondes) par travail
+    travaux = valider(lot)
+    defauts = lot.get("defauts", {})
+    if "precision" in defauts:
+        set_precision(defauts["precision"])
+    set_encodage(defauts.get("encodage"), defauts.get("format"))
+
+    lire = LecteurImages()
+    durees = []
+    for k, t in enumerate(travaux, start=1):
+        if seulement and t["type"] not in seulement:
+            continue
+        nom = t.get("nom", f"{k}:{t['type']}")
+        print(f"\n========== Travail {nom} ==========")
+        t0 = time.perf_counter()
+        f0, o0 = ecritures()
+        fonction = TRAVAUX[t["type"]][0]
+        fonction(t, lire, t.get("n_workers", defauts.get("n_workers")))
+        f1, o1 = ecritures()
+        durees.append((nom, time.perf_counter() - t0, f1 - f0, o1 - o0))
+
+    print(f"\n{lire.decodages} image(s) décodée(s)")
+    for nom, secondes, fichiers, octets in durees:
+        print(f" - {nom:<24} {secondes:8.2f} s {fichiers:6d} fichier(s) {format_octets(octets):>10}")
+    total = sum(d[3] for d in durees)
+    print(f"   {'total écrit':<24} {format_octets(total):>28}")
+    return [(nom, secondes) for nom, secondes, _, _ in durees]
+
+
+def main() -> None:
+    # Pas de fenêtre en mode batch: matplotlib (montages) sur un backend sans interface,
+    # fixé avant tout import de matplotlib (aussi hérité par les workers des sweeps)
+    os.environ["MPLBACKEND"] = "Agg"
+
+    parser = argparse.ArgumentParser(description="Exécute un lot de travaux du TP2 dans un seul processus")
+    parser.add_argument("fichier", type=Path, help="description des travaux (.toml ou .json)")
+    parser.add_argument("--seulement", nargs="+", choices=list(TRAVAUX), default=None,
+                        help="n'exécuter que ces types de travaux")
+    args = parser.parse_args()
+
+    try:
+        lot = lire_fichier(args.fichier)
+        valider(lot)
+    except (OSError, ValueError) as e:
+        sys.exit(f"ERREUR: {e}")
+    executer(lot, args.seulement)
+
+
+if __name__ == "__main__":
+    main()
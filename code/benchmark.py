@@ -0,0 +1,272 @@
+# benchmark.py
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import numpy as np
+
+from accentuation import accentuation_sigmas
+from hybrid_python.align_images import align_images
+from hybrid_python.hybrid_image import hybrid_image
+from main_hybride import fft_log_amplitude
+from main_pile import gaussian_stack, laplacian_stack, make_grid
+from precision import dtype_calcul, get_precision, set_precision
+
+# Banc d'essai des chemins chauds, sur des images synthétiques (aucun fichier requis).
+#
+#   python code/benchmark.py                          -> bench/bench_<date>.json
+#   python code/benchmark.py --tailles 512 2048 --cas hybrid_image accentuation
+#   python code/benchmark.py --comparer bench/avant.json bench/apres.json --seuil 0.10
+#
+# Pour chaque (cas, taille, canaux): meilleur temps sur quelques répétitions, débit en
+# mégapixels/s et pic mémoire (tracemalloc, mesuré dans un passage séparé pour ne pas
+# ralentir le chronométrage). Les tampons internes de pocketfft ne sont pas comptés.
+
+TAILLES = (512, 2048, 8192)
+
+# Canaux des images d'entrée: gris (2D), RGB, RGBA
+CANAUX = {"gris": 0, "rgb": 3, "rgba": 4}
+
+# Temps de mesure visé par cas (les petits cas sont répétés, les gros exécutés une fois)
+DUREE_CIBLE = 1.0
+REPETITIONS_MAX = 5
+
+# Résultats (non suivis par git), à la racine du dépôt peu importe le dossier courant
+DOSSIER_RESULTATS = Path(__file__).resolve().parent.parent / "bench"
+
+# Au-delà de ce ratio (nouveau / ancien - 1), un cas est signalé comme régression
+SEUIL_REGRESSION = 0.10
+
+
+def image_synthetique(taille: int, canaux: int, graine: int = 0, decalage: tuple[int, int] = (0, 0)) -> np.ndarray:
+    # Image uint8 déterministe: structures de plusieurs échelles (basse résolution agrandie)
+    # + bruit fin, pour que filtres et alignement travaillent sur un contenu réaliste
+    rng = np.random.default_rng(graine)
+    c = max(canaux, 1)
+    grossier = rng.random((taille // 32 + 2, taille // 32 + 2, c), dtype=np.float32)
+    img = np.repeat(np.repeat(grossier, 32, axis=0), 32, axis=1)[:taille, :taille]
+    img = 0.8 * img + 0.2 * rng.random((taille, taille, c), dtype=np.float32)
+    img = np.roll(img, decalage, axis=(0, 1))
+    img = (img * 255).astype(np.uint8)
+    if canaux == 4:
+        img[:, :, 3] = 255
+    return img[:, :, 0] if canaux == 0 else img
+
+
+def _sigmas_accentuation() -> list[float]:
+    # Même balayage que main_accentuation
+    return [0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5]
+
+
+def _cas_hybrid_image(taille: int, canaux: int) -> Callable[[], Any]:
+    im1 = image_synthetique(taille, canaux, graine=1)
+    im2 = image_synthetique(taille, canaux, graine=2)
+    return lambda: hybrid_image(im1, im2, 5.0, 3.0)
+
+
+def _cas_accentuation(taille: int, canaux: int) -> Callable[[], Any]:
+    img = image_synthetique(taille, canaux, graine=1)
+    rgb = (img[:, :, :3] if img.ndim == 3 else img).astype(dtype_calcul()) / 255.0
+
+    def cas() -> None:
+        for _ in accentuation_sigmas(rgb, _sigmas_accentuation(), channel_axis=-1):
+            pass
+    return cas
+
+
+def _cas_piles(taille: int, canaux: int) -> Callable[[], Any]:
+    # Gris (H, W) ou couleur (H, W, C): canaux filtrés en un appel, alpha recopié
+    img = image_synthetique(taille, canaux, graine=1).astype(dtype_calcul()) / 255.0
+
+    def cas() -> None:
+        g, _ = gaussian_stack(img, n_levels=6)
+        laplacian_stack(g)
+    return cas
+
+
+def _cas_fft_log_amplitude(taille: int, canaux: int) -> Callable[[], Any]:
+    img = image_synthetique(taille, canaux, graine=1)
+    return lambda: fft_log_amplitude(img)
+
+
+def _cas_align_images(taille: int, canaux: int) -> Callable[[], Any]:
+    # Alignement automatique (pas de clics) d'une image et de sa copie décalée
+    im1 = image_synthetique(taille, canaux, graine=1)
+    im2 = image_synthetique(taille, canaux, graine=1, decalage=(taille // 50, -taille // 40))
+    return lambda: align_images(im1, im2, auto=True)
+
+
+def _cas_make_grid(taille: int, canaux: int) -> Callable[[], Any]:
+    # Montage d'une pile de 6 niveaux uint8 (comme make_two_row_montage)
+    niveaux = [image_synthetique(taille, canaux, graine=k) for k in range(6)]
+    return lambda: make_grid(niveaux, n_cols=6)
+
+
+# nom -> (fabrique du cas, canaux supportés)
+CAS: dict[str, tuple[Callable[[int, int], Callable[[], Any]], tuple[str, ...]]] = {
+    "hybrid_image": (_cas_hybrid_image, ("gris", "rgb", "rgba")),
+    "accentuation": (_cas_accentuation, ("gris", "rgb", "rgba")),
+    "gaussian_laplacian_stack": (_cas_piles, ("gris", "rgb", "rgba")),
+    "fft_log_amplitude": (_cas_fft_log_amplitude, ("gris", "rgb", "rgba")),
+    "align_images": (_cas_align_images, ("gris", "rgb", "rgba")),
+    "make_grid": (_cas_make_grid, ("gris", "rgb", "rgba")),
+}
+
+
+@contextlib.contextmanager
+def _silence() -> Iterator[None]:
+    # Les fonctions du pipeline impriment leurs formes/types: hors du chronométrage
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def chronometrer(fonction: Callable[[], Any]) -> tuple[float, int]:
+    # (meilleur temps, nombre de répétitions); le premier appel sert aussi de mesure
+    temps = []
+    while True:
+        gc.collect()
+        t0 = time.perf_counter()
+        fonction()
+        temps.append(time.perf_counter() - t0)
+        if len(temps) >= REPETITIONS_MAX or sum(temps) >= DUREE_CIBLE:
+            return min(temps), len(temps)
+
+
+def pic_memoire(fonction: Callable[[], Any]) -> int:
+    # Pic des allocations Python/numpy pendant un appel (octets, hors entrées déjà allouées)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fonction()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def mesurer(nom: str, taille: int, canaux: str) -> dict[str, Any]:
+    fabrique, _ = CAS[nom]
+    resultat: dict[str, Any] = {"cas": nom, "taille": taille, "canaux": canaux}
+    try:
+        with _silence():
+            fonction = fabrique(taille, CANAUX[canaux])
+            secondes, repetitions = chronometrer(fonction)
+            octets = pic_memoire(fonction)
+    except MemoryError:
+        # Cas trop gros pour cette machine: noté, le reste du banc continue
+        resultat["erreur"] = "MemoryError"
+        return resultat
+    finally:
+        gc.collect()
+
+    resultat.update(
+        secondes=secondes,
+        repetitions=repetitions,
+        mpx_par_s=taille * taille / 1e6 / secondes,
+        pic_octets=octets,
+    )
+    return resultat
+
+
+def meta() -> dict[str, Any]:
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "precision": get_precision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processeur": platform.processor(),
+        "coeurs": os.cpu_count(),
+    }
+
+
+def executer(cas: list[str], tailles: list[int], canaux: list[str] | None = None) -> dict[str, Any]:
+    resultats = []
+    for taille in tailles:
+        for nom in cas:
+            for c in CAS[nom][1]:
+                if canaux is not None and c not in canaux:
+                    continue
+                r = mesurer(nom, taille, c)
+                resultats.append(r)
+                if "erreur" in r:
+                    print(f"{nom:<26} {taille:>5}² {c:<5} {r['erreur']}")
+                else:
+                    print(f"{nom:<26} {taille:>5}² {c:<5} {r['secondes']:9.4f} s "
+                          f"{r['mpx_par_s']:9.2f} Mpx/s {r['pic_octets'] / 1024**2:9.1f} Mo")
+    return {"meta": meta(), "resultats": resultats}
+
+
+def comparer(ancien: dict[str, Any], nouveau: dict[str, Any], seuil: float = SEUIL_REGRESSION) -> list[dict[str, Any]]:
+    # Cas communs aux deux fichiers, avec les ratios nouveau / ancien (temps et mémoire).
+    # regression=True si le temps ou le pic mémoire augmente de plus de seuil.
+    def cle(r: dict[str, Any]) -> tuple[str, int, str]:
+        return r["cas"], r["taille"], r["canaux"]
+
+    avant = {cle(r): r for r in ancien["resultats"] if "erreur" not in r}
+    lignes = []
+    for r in nouveau["resultats"]:
+        a = avant.get(cle(r))
+        if a is None or "erreur" in r:
+            continue
+        ratio_temps = r["secondes"] / a["secondes"]
+        ratio_memoire = r["pic_octets"] / max(a["pic_octets"], 1)
+        lignes.append({
+            "cas": r["cas"], "taille": r["taille"], "canaux": r["canaux"],
+            "ratio_temps": ratio_temps,
+            "ratio_memoire": ratio_memoire,
+            "regression": ratio_temps > 1 + seuil or ratio_memoire > 1 + seuil,
+        })
+    return lignes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banc d'essai des chemins chauds du TP2")
+    parser.add_argument("--cas", nargs="+", choices=list(CAS), default=list(CAS))
+    parser.add_argument("--tailles", nargs="+", type=int, default=list(TAILLES))
+    parser.add_argument("--canaux", nargs="+", choices=list(CANAUX), default=None)
+    parser.add_argument("--precision", choices=["float32", "float64"], default=None)
+    parser.add_argument("--sortie", type=Path, default=None, help="fichier JSON (défaut: bench/bench_<date>.json)")
+    parser.add_argument("--comparer", nargs=2, type=Path, metavar=("ANCIEN", "NOUVEAU"),
+                        help="compare deux fichiers de résultats au lieu de mesurer")
+    parser.add_argument("--seuil", type=float, default=SEUIL_REGRESSION)
+    args = parser.parse_args()
+
+    if args.comparer:
+        ancien, nouveau = (json.loads(p.read_text(encoding="utf-8")) for p in args.comparer)
+        for champ in ("precision", "machine", "coeurs"):
+            if ancien["meta"].get(champ) != nouveau["meta"].get(champ):
+                print(f"Attention: {champ} différent(e) ({ancien['meta'].get(champ)} vs {nouveau['meta'].get(champ)})")
+        lignes = comparer(ancien, nouveau, args.seuil)
+        for l in lignes:
+            marque = "RÉGRESSION" if l["regression"] else ""
+            print(f"{l['cas']:<26} {l['taille']:>5}² {l['canaux']:<5} temps x{l['ratio_temps']:.2f} "
+                  f"mémoire x{l['ratio_memoire']:.2f} {marque}")
+        n = sum(l["regression"] for l in lignes)
+        print(f"{n} régression(s) au-delà de {args.seuil:.0%} sur {len(lignes)} cas comparés")
+        # Code de sortie non nul: utilisable dans un script de vérification
+        sys.exit(1 if n else 0)
+
+    if args.precision:
+        set_precision(args.precision)
+    resultats = executer(args.cas, args.tailles, args.canaux)
+
+    sortie = args.sortie or DOSSIER_RESULTATS / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    sortie.parent.mkdir(parents=True, exist_ok=True)
+    sortie.write_text(json.dumps(resultats, indent=1), encoding="utf-8")
+    print(f"Résultats: {sortie.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
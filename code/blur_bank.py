@@ -0,0 +1,132 @@
+# blur_bank.py
+from __future__ import annotations
+
+from collections import OrderedDict
+
+import numpy as np
+
+from conversions import mettre_float01, to_gray
+from gauss_backend import GaussianMultiSigma
+from spectre import rfft2_reel
+
+# Modes de canaux supportés
+MODES = ("rgb", "gray")
+
+
+def preparer_source(image: np.ndarray, mode: str) -> np.ndarray:
+    # Image float [0,1] sur laquelle on applique les flous pour ce mode
+    if mode == "gray":
+        return mettre_float01(to_gray(image))
+    if mode == "rgb":
+        # Le canal alpha n'est jamais filtré
+        return mettre_float01(image[:, :, :3] if image.ndim == 3 else image)
+    raise ValueError(f"Mode inconnu: {mode!r} (attendu un de {MODES})")
+
+
+class BlurBank:
+    # Cache des flous gaussiens, clé = (image, mode de canaux, sigma).
+    # Les spectres rfft2 des flous (voir spectre()), les sources float et les filtres
+    # (image paddée + FFT directe) partagent le même cache LRU et le même budget.
+    #
+    # L'image est identifiée par l'objet numpy lui-même (on garde une référence,
+    # donc son id() ne peut pas être réutilisé). Les flous sont en lecture seule
+    # et évincés du plus ancien au plus récent quand max_bytes est dépassé.
+
+    def __init__(self, max_bytes: int = 2 * 1024**3, sigma_max: float | None = None) -> None:
+        self.max_bytes = int(max_bytes)
+        # Plus grand sigma attendu: évite de refaire la FFT directe quand sigma augmente
+        self.sigma_max = sigma_max
+        self.nbytes = 0
+
+        self._images: dict[int, np.ndarray] = {}
+        self._cache: OrderedDict[tuple, np.ndarray | GaussianMultiSigma] = OrderedDict()
+
+        self.calcules = 0
+        self.reutilises = 0
+        self.evinces = 0
+
+    def _cle_image(self, image: np.ndarray) -> int:
+        cle = id(image)
+        self._images.setdefault(cle, image)
+        return cle
+
+    def _lire(self, cle: tuple):
+        valeur = self._cache.get(cle)
+        if valeur is not None:
+            self._cache.move_to_end(cle)
+        return valeur
+
+    def _ajouter(self, cle: tuple, valeur) -> None:
+        self._cache[cle] = valeur
+        self.nbytes += valeur.nbytes
+        self._evincer()
+
+    def source(self, image: np.ndarray, mode: str = "rgb") -> np.ndarray:
+        # Version float [0,1] (gris ou couleur) de l'image, recalculée si elle a été évincée
+        cle = (self._cle_image(image), mode, "source")
+        src = self._lire(cle)
+        if src is None:
+            src = preparer_source(image, mode)
+            src.flags.writeable = False
+            self._ajouter(cle, src)
+        return src
+
+    def _filtre(self, image: np.ndarray, mode: str) -> GaussianMultiSigma:
+        cle = (self._cle_image(image), mode, "filtre")
+        filtre = self._lire(cle)
+        if filtre is None:
+            src = self.source(image, mode)
+            filtre = GaussianMultiSigma(src, channel_axis=-1 if src.ndim == 3 else None, sigma_max=self.sigma_max)
+            self._ajouter(cle, filtre)
+        return filtre
+
+    def flou(self, image: np.ndarray, sigma: float, mode: str = "rgb") -> np.ndarray:
+        cle = (self._cle_image(image), mode, float(sigma))
+
+        flou = self._lire(cle)
+        if flou is not None:
+            self.reutilises += 1
+            return flou
+
+        filtre = self._filtre(image, mode)
+        # La FFT directe du filtre peut être (re)calculée plus grande pour ce sigma
+        avant = filtre.nbytes
+        flou = filtre.filtre(float(sigma))
+        if self._cache.get(cle[:2] + ("filtre",)) is filtre:
+            self.nbytes += filtre.nbytes - avant
+        flou.flags.writeable = False
+        self.calcules += 1
+
+        self._ajouter(cle, flou)
+        return flou
+
+    def spectre(self, image: np.ndarray, sigma: float = 0.0, mode: str = "gray") -> np.ndarray:
+        # rfft2 du flou (sigma <= 0: de la source). La FFT étant linéaire, le spectre d'une
+        # combinaison de flous (ex: source - flou) est la même combinaison de ces spectres.
+        cle = (self._cle_image(image), mode, float(sigma), "rfft2")
+
+        spectre = self._lire(cle)
+        if spectre is not None:
+            self.reutilises += 1
+            return spectre
+
+        src = self.source(image, mode) if sigma <= 0 else self.flou(image, sigma, mode)
+        spectre = rfft2_reel(src)
+        spectre.flags.writeable = False
+        self.calcules += 1
+
+        self._ajouter(cle, spectre)
+        return spectre
+
+    def _evincer(self) -> None:
+        # LRU: on garde toujours au moins la dernière entrée ajoutée
+        while self.nbytes > self.max_bytes and len(self._cache) > 1:
+            _, vieux = self._cache.popitem(last=False)
+            self.nbytes -= vieux.nbytes
+            self.evinces += 1
+
+    def resume(self) -> str:
+        return (
+            f"BlurBank: {self.calcules} flous calculés, {self.reutilises} réutilisés, "
+            f"{self.evinces} évincés ({self.nbytes / 1024**2:.1f} Mo en cache)"
+        )
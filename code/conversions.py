@@ -0,0 +1,31 @@
+# conversions.py
+import numpy as np
+
+from precision import dtype_calcul
+
+
+def echelle_01(maximum):
+    # Diviseur qui ramène une image dans [0,1], d'après son max (canaux de couleur seulement)
+    return 255.0 if maximum > 1.0 else 1.0
+
+
+def mettre_float01(img, dtype=None, echelle=None):
+    # Convertit en float [0,1] (accepte uint8 ou float), dans la précision du pipeline
+    # (ou dans dtype, ex: float32 pour les piles).
+    # Normalisation commune à tout le pipeline (banque de flous, hybrides, piles): ne pas
+    # passer le canal alpha. echelle: diviseur déjà choisi sur l'image entière (mode tuiles)
+    x = img.astype(dtype or dtype_calcul(), copy=False)
+    if echelle is None:
+        echelle = echelle_01(x.max())
+    if echelle != 1.0:
+        x = x / echelle
+    return np.clip(x, 0.0, 1.0)
+
+
+def to_gray(img):
+    # Retourne une image 2D (gris) peu importe l'entrée (gris/RGB/RGBA)
+    if img.ndim == 2:
+        return img
+    rgb = img[:, :, :3].astype(dtype_calcul(), copy=False)
+    # Luminance classique
+    return 0.2989 * rgb[:, :, 0] + 0.5870 * rgb[:, :, 1] + 0.1140 * rgb[:, :, 2]
@@ -0,0 +1,134 @@
+# fichiers_image.py
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from imageio.v3 import imread, imwrite
+
+# Lecture/écriture des images directement avec imageio.v3 (ce que font skimage.io.imread
+# et skimage.io.imsave pour PNG/JPEG), sans importer skimage.io: son import tire
+# skimage.color et scipy.linalg (~0.3 s de démarrage pour rien).
+# imageio.v3 est importé ici, pas au premier appel: l'écriture se fait dans les threads
+# d'ImageWriter, et un import en cours dans un thread ne doit pas croiser un fork (sweep.py).
+
+# Encodage des sorties: un profil fixe l'effort de compression (toujours sans perte).
+# - brouillon: zlib 1, ~3x plus rapide que le niveau par défaut, fichiers un peu plus gros
+# - standard: zlib 6 (défaut de Pillow, mêmes fichiers qu'avant)
+# - publication: zlib 9, fichiers les plus petits
+# Format: PNG, ou WebP sans perte (souvent 20-30 % plus petit, lu par tous les navigateurs).
+# WebP n'a pas de mode gris ni d'alpha opaque: relu, un gris revient en RGB (canaux égaux)
+# et un alpha partout à 255 disparaît; les valeurs des pixels sont identiques.
+# (méthode 6 ne gagne que ~0.1 % pour un temps 20x plus long: pas utilisée)
+# Choix sans toucher au code: TP2_ENCODAGE=brouillon TP2_FORMAT=webp python code/main_xxx.py
+PROFILS = {
+    # nom: (niveau zlib PNG, (qualité, méthode) WebP sans perte = effort)
+    "brouillon": (1, (0, 0)),
+    "standard": (6, (80, 4)),
+    "publication": (9, (100, 4)),
+}
+FORMATS = ("png", "webp")
+
+_PROFIL = os.environ.get("TP2_ENCODAGE", "standard")
+_FORMAT = os.environ.get("TP2_FORMAT", "png")
+if _PROFIL not in PROFILS or _FORMAT not in FORMATS:
+    raise ValueError(f"TP2_ENCODAGE={_PROFIL!r} / TP2_FORMAT={_FORMAT!r}: attendu un de "
+                     f"{list(PROFILS)} / {list(FORMATS)}")
+
+# Fichiers et octets écrits par ce processus (plus ceux des workers des sweeps, voir sweep.py)
+_verrou = threading.Lock()
+_fichiers = 0
+_octets = 0
+
+
+def set_encodage(profil: str | None = None, format: str | None = None) -> None:
+    global _PROFIL, _FORMAT
+    if profil is not None and profil not in PROFILS:
+        raise ValueError(f"Profil d'encodage inconnu: {profil!r} (attendu un de {list(PROFILS)})")
+    if format is not None and format not in FORMATS:
+        raise ValueError(f"Format inconnu: {format!r} (attendu un de {list(FORMATS)})")
+    _PROFIL = profil if profil is not None else _PROFIL
+    _FORMAT = format if format is not None else _FORMAT
+
+
+def get_encodage() -> tuple[str, str]:
+    # (profil, format), aussi pour les signatures du manifeste
+    return _PROFIL, _FORMAT
+
+
+def extension() -> str:
+    # Extension des sorties générées (".png" ou ".webp")
+    return f".{_FORMAT}"
+
+
+def lire_image(chemin: str | Path) -> np.ndarray:
+    # Même résultat que skimage.io.imread(chemin): tableau modifiable, uint8 pour PNG/JPEG
+    img = np.asarray(imread(str(chemin)))
+    if not img.flags.writeable:
+        img = img.copy()
+    return img
+
+
+def ecrire_image(chemin: str | Path, image: np.ndarray) -> int:
+    # Encode selon l'extension du chemin et le profil courant; retourne les octets écrits
+    donnees = encoder_image(image, Path(chemin).suffix)
+    Path(chemin).write_bytes(donnees)
+    compter_ecriture(len(donnees))
+    return len(donnees)
+
+
+def encoder_image(image: np.ndarray, suffixe: str) -> bytes:
+    # Encodage en mémoire (".png", ".webp", ".jpg"...) avec le profil courant, sans rien
+    # écrire ni compter (ex: data URI; l'appelant compte avec compter_ecriture()).
+    # Un seul canal (H, W) ou (H, W, 1) -> PNG/WebP gris 8 bits, pas de RGB(A) répété.
+    if image.dtype == bool:
+        image = image.astype(np.uint8) * 255
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+
+    zlib, (qualite, methode) = PROFILS[_PROFIL]
+    suffixe = suffixe.lower()
+    if suffixe == ".png":
+        options = {"compress_level": zlib}
+    elif suffixe == ".webp":
+        options = {"lossless": True, "quality": qualite, "method": methode}
+        # WebP: au plus RGBA; un 5e canal (2e alpha des hybrides couleur) n'est pas écrit,
+        # sinon imageio lirait le tableau comme une pile de H images
+        if image.ndim == 3 and image.shape[2] > 4:
+            image = image[:, :, :4]
+    else:
+        options = {}
+    return imwrite("<bytes>", image, extension=suffixe, **options)
+
+
+def compter_ecriture(octets: int, fichiers: int = 1) -> None:
+    global _fichiers, _octets
+    with _verrou:
+        _fichiers += fichiers
+        _octets += octets
+
+
+def ecritures() -> tuple[int, int]:
+    # (fichiers, octets) écrits depuis le début du processus
+    with _verrou:
+        return _fichiers, _octets
+
+
+def format_octets(octets: int) -> str:
+    return f"{octets / 1024**2:.1f} Mo" if octets >= 1024**2 else f"{octets / 1024:.0f} Ko"
+
+
+@contextmanager
+def bilan_ecritures(titre: str) -> Iterator[None]:
+    # with bilan_ecritures("hybride"): ... -> affiche les fichiers/octets écrits dans le bloc
+    f0, o0 = ecritures()
+    try:
+        yield
+    finally:
+        f1, o1 = ecritures()
+        print(f"[{titre}] {f1 - f0} fichier(s) écrit(s), {format_octets(o1 - o0)} "
+              f"(profil {_PROFIL}, {_FORMAT})")
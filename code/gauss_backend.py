@@ -0,0 +1,216 @@
+# gauss_backend.py
+from __future__ import annotations
+
+import numpy as np
+import scipy.fft as sfft
+
+from precision import en_float
+
+# Modèle de coût grossier (ns), mesuré avec scipy.ndimage / scipy.fft sur 512²..2048².
+# Spatial: un coût fixe par pixel + un coût par "tap" du noyau (2 axes séparables).
+# FFT: ~ N log2(N) par transformée sur l'image paddée.
+COUT_SPATIAL_PIXEL = 33.0
+COUT_SPATIAL_TAP = 0.6
+COUT_FFT = 1.4
+
+
+def rayon_noyau(sigma: float, truncate: float = 4.0) -> int:
+    # Même rayon que scipy.ndimage.gaussian_filter (utilisé par skimage)
+    return int(truncate * float(sigma) + 0.5)
+
+
+def _noyau_1d(sigma: float, rayon: int, dtype) -> np.ndarray:
+    x = np.arange(-rayon, rayon + 1, dtype=np.float64)
+    phi = np.exp(-0.5 / (sigma * sigma) * x * x)
+    return (phi / phi.sum()).astype(dtype)
+
+
+def _transfert_1d(sigma: float, rayon: int, n: int, reel: bool, dtype) -> np.ndarray:
+    # Réponse fréquentielle du noyau échantillonné et tronqué (comme scipy),
+    # centré en 0 de façon circulaire -> spectre réel (noyau symétrique).
+    k = np.zeros(n, dtype=np.float64)
+    phi = _noyau_1d(sigma, rayon, np.float64)
+    k[: rayon + 1] = phi[rayon:]
+    if rayon > 0:
+        k[-rayon:] = phi[:rayon]
+    h = sfft.rfft(k) if reel else sfft.fft(k)
+    return h.real.astype(dtype)
+
+
+def _taille_hw(shape: tuple[int, ...], channel_axis: int | None) -> tuple[int, int, int]:
+    # (H, W, C) peu importe où sont les canaux
+    if channel_axis is None:
+        return shape[0], shape[1], 1
+    axes = [a for a in range(len(shape)) if a != channel_axis % len(shape)]
+    return shape[axes[0]], shape[axes[1]], shape[channel_axis]
+
+
+def cout_spatial(shape: tuple[int, ...], sigma: float, channel_axis: int | None = None,
+                 truncate: float = 4.0) -> float:
+    H, W, C = _taille_hw(shape, channel_axis)
+    r = rayon_noyau(sigma, truncate)
+    return H * W * C * (COUT_SPATIAL_PIXEL + COUT_SPATIAL_TAP * 2 * (2 * r + 1))
+
+
+def cout_fft(shape: tuple[int, ...], sigma: float, channel_axis: int | None = None,
+             truncate: float = 4.0, spectre_en_cache: bool = False) -> float:
+    H, W, C = _taille_hw(shape, channel_axis)
+    r = rayon_noyau(sigma, truncate)
+    n = sfft.next_fast_len(H + 2 * r, real=True) * sfft.next_fast_len(W + 2 * r, real=True)
+    n_transformees = 1 if spectre_en_cache else 2
+    return C * n_transformees * COUT_FFT * n * np.log2(max(n, 2))
+
+
+def choisir_methode(shape: tuple[int, ...], sigma: float, channel_axis: int | None = None,
+                    truncate: float = 4.0, spectre_en_cache: bool = False) -> str:
+    # "spatial" pour les petits sigmas, "fft" quand le noyau devient large
+    # (le coût FFT ne dépend presque plus de sigma).
+    if sigma <= 0:
+        return "spatial"
+    spatial = cout_spatial(shape, sigma, channel_axis, truncate)
+    fft = cout_fft(shape, sigma, channel_axis, truncate, spectre_en_cache)
+    return "fft" if fft < spatial else "spatial"
+
+
+class FFTGaussian:
+    # Flou gaussien dans le domaine fréquentiel, avec la FFT directe gardée en cache:
+    # chaque sigma supplémentaire coûte une multiplication + une FFT inverse.
+    #
+    # L'image est paddée en mode 'edge' d'au moins le rayon du noyau, donc le résultat
+    # est le même que skimage.filters.gaussian(mode='nearest') (à l'arrondi près).
+
+    def __init__(
+        self,
+        image: np.ndarray,
+        channel_axis: int | None = None,
+        sigma_max: float | None = None,
+        truncate: float = 4.0,
+    ) -> None:
+        image = np.asarray(image)
+        if not np.issubdtype(image.dtype, np.floating):
+            image = en_float(image)
+        if image.ndim == 2:
+            channel_axis = None
+
+        self._source = image
+        self.shape = image.shape
+        self.dtype = image.dtype
+        self.channel_axis = channel_axis
+        self.truncate = truncate
+
+        # Canaux en premier: FFT sur les 2 derniers axes
+        self._image = image if channel_axis is None else np.moveaxis(image, channel_axis, 0)
+        self._pad = -1
+        self._spectre: np.ndarray | None = None
+        self._forme_pad: tuple[int, int] = (0, 0)
+
+        if sigma_max is not None:
+            self._preparer(rayon_noyau(sigma_max, truncate))
+
+    def _preparer(self, pad: int) -> None:
+        # (Re)calcule la FFT directe si le padding actuel est trop petit pour ce rayon
+        if pad <= self._pad:
+            return
+        H, W = self._image.shape[-2:]
+        Hp = sfft.next_fast_len(H + 2 * pad, real=True)
+        Wp = sfft.next_fast_len(W + 2 * pad, real=True)
+        pad_width = [(0, 0)] * (self._image.ndim - 2) + [(pad, Hp - H - pad), (pad, Wp - W - pad)]
+        img_pad = np.pad(self._image, pad_width, mode="edge")
+
+        self._spectre = sfft.rfft2(img_pad, axes=(-2, -1))
+        self._pad = pad
+        self._forme_pad = (Hp, Wp)
+
+    @property
+    def nbytes(self) -> int:
+        # Mémoire propre au filtre (FFT directe); la source appartient à l'appelant
+        return 0 if self._spectre is None else self._spectre.nbytes
+
+    def filtre(self, sigma: float) -> np.ndarray:
+        if sigma <= 0:
+            return self._source.copy()
+
+        r = rayon_noyau(sigma, self.truncate)
+        self._preparer(r)
+        Hp, Wp = self._forme_pad
+        reel = self._spectre.real.dtype
+
+        hy = _transfert_1d(sigma, r, Hp, reel=False, dtype=reel)
+        hx = _transfert_1d(sigma, r, Wp, reel=True, dtype=reel)
+        out = sfft.irfft2(self._spectre * (hy[:, None] * hx[None, :]), s=(Hp, Wp), axes=(-2, -1))
+
+        H, W = self._image.shape[-2:]
+        p = self._pad
+        out = out[..., p : p + H, p : p + W].astype(self.dtype, copy=False)
+
+        if self.channel_axis is not None:
+            out = np.moveaxis(out, 0, self.channel_axis)
+        return np.ascontiguousarray(out)
+
+
+def gaussian(
+    image: np.ndarray,
+    sigma: float,
+    channel_axis: int | None = None,
+    methode: str = "auto",
+    truncate: float = 4.0,
+) -> np.ndarray:
+    # Remplaçant de skimage.filters.gaussian(preserve_range=True, mode='nearest')
+    # qui choisit le domaine spatial ou fréquentiel selon sigma et la taille de l'image.
+    if not np.issubdtype(image.dtype, np.floating):
+        image = en_float(image)
+    if image.ndim == 2:
+        channel_axis = None
+    elif channel_axis is None:
+        # Volume 3D sans axe de canaux: seulement le chemin spatial de skimage
+        methode = "spatial"
+    if methode == "auto":
+        methode = choisir_methode(image.shape, sigma, channel_axis, truncate)
+
+    if methode == "fft":
+        return FFTGaussian(image, channel_axis=channel_axis, truncate=truncate).filtre(sigma)
+    if methode != "spatial":
+        raise ValueError(f"Méthode inconnue: {methode!r} (attendu 'auto', 'spatial' ou 'fft')")
+    if sigma <= 0:
+        return np.array(image, dtype=np.result_type(image.dtype, np.float32), copy=True)
+
+    # skimage.filters (et scipy.ndimage) seulement au premier flou spatial
+    import skimage.filters
+
+    return skimage.filters.gaussian(
+        image, sigma=sigma, channel_axis=channel_axis, preserve_range=True, truncate=truncate
+    )
+
+
+class GaussianMultiSigma:
+    # Plusieurs sigmas sur la même image: réutilise la FFT directe quand le chemin
+    # fréquentiel est choisi, sinon délègue au chemin spatial.
+    def __init__(
+        self,
+        image: np.ndarray,
+        channel_axis: int | None = None,
+        sigma_max: float | None = None,
+        truncate: float = 4.0,
+    ) -> None:
+        self.image = image
+        self.channel_axis = None if image.ndim == 2 else channel_axis
+        self.sigma_max = sigma_max
+        self.truncate = truncate
+        self._fft: FFTGaussian | None = None
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._fft is None else self._fft.nbytes
+
+    def filtre(self, sigma: float, methode: str = "auto") -> np.ndarray:
+        if methode == "auto":
+            methode = choisir_methode(
+                self.image.shape, sigma, self.channel_axis, self.truncate,
+                spectre_en_cache=self._fft is not None and self._fft._pad >= rayon_noyau(sigma, self.truncate),
+            )
+        if methode == "fft":
+            if self._fft is None:
+                self._fft = FFTGaussian(self.image, channel_axis=self.channel_axis,
+                                        sigma_max=self.sigma_max, truncate=self.truncate)
+            return self._fft.filtre(sigma)
+        return gaussian(self.image, sigma, channel_axis=self.channel_axis, methode=methode, truncate=self.truncate)
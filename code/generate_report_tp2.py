@@ -3,7 +3,10 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Mapping, Optional
+
+from manifeste import Manifeste
+from miniatures import Miniatures, preparer_miniatures
 
 
 # =========================
@@ -46,6 +49,29 @@ IMG_HYBRID_T3 = Path("web/images/hybrid/T3/hybrid_cutoff10.0_10.0.png")  # exten
 # Partie 2
 IMG_PILE_MONTAGE = Path("web/images/pile/montage_gauss_lap.png")
 
+# Partie 3
+IMG_POMME = Path("web/images/data/Pomme.png")
+IMG_ORANGE = Path("web/images/data/Orange.png")
+IMG_MASQUE = Path("web/images/melange/masque.png")
+IMG_MELANGE = Path("web/images/melange/melange_Pomme_Orange.png")
+
+# Images produites par les scripts main_* (les entrées web/images/data ne sont pas vérifiées)
+IMAGES_GENEREES = (
+    IMG_IRIS_SHARP, IMG_OPTIMUS_SHARP, IMG_IRIS_MONTAGE, IMG_OPTIMUS_MONTAGE,
+    IMG_HYBRID_T1, IMG_HYBRID_T2, IMG_AMP_HIGH, IMG_AMP_LOW, IMG_HYBRID_T3,
+    IMG_PILE_MONTAGE, IMG_MASQUE, IMG_MELANGE,
+)
+
+# Toutes les images affichées (miniatures préparées avant build_html)
+IMAGES_RAPPORT = (
+    IMG_IRIS, IMG_OPTIMUS, IMG_EINSTEIN, IMG_MARILYN, IMG_CAP, IMG_THOR,
+    IMG_TONY, IMG_PAT, IMG_POMME, IMG_ORANGE,
+) + IMAGES_GENEREES
+
+# Largeur max du contenu (.container) et bascule des paires sur une colonne (@media)
+LARGEUR_CONTENU_PX = 1400
+BASCULE_UNE_COLONNE_PX = 900
+
 
 # =========================
 # Helpers HTML
@@ -62,12 +88,14 @@ def _escape(s: str) -> str:
 def pick_existing(p: Path) -> Path:
     """
     Si le path n'existe pas, et qu'il n'a pas d'extension, on essaie .png/.jpg/.jpeg.
+    Un .png manquant peut avoir été généré en WebP (TP2_FORMAT=webp): on essaie .webp.
     Sinon on retourne tel quel (même si manquant) -> ça évite de crasher ton script.
     """
     if p.exists():
         return p
     if p.suffix:
-        return p
+        webp = p.with_suffix(".webp")
+        return webp if p.suffix == ".png" and webp.exists() else p
     for ext in [".png", ".jpg", ".jpeg"]:
         candidate = p.with_suffix(ext)
         if candidate.exists():
@@ -86,32 +114,71 @@ def rel_to_output(img_path: Path, output_html: Path) -> str:
         # fallback: relativize by commonpath if weird paths
         return img_path.as_posix()
 
-def figure(img_path: Path, caption: str, output_html: Path, max_width: str = "70%") -> str:
+def img_attrs(p: Path, output_html: Path, miniatures: Mapping[Path, Miniatures], sizes: str,
+              style: str = "") -> str:
+    """
+    Attributs d'une image: src/srcset/sizes/data-fullsize, chargement différé,
+    dimensions et aperçu flou.
+    Avec des miniatures: src = miniature moyenne, srcset = miniatures; l'original
+    n'est chargé que par la lightbox (data-fullsize).
+    width/height (dimensions de l'original) réservent la place avant le chargement: pas de
+    décalage de la page. L'aperçu (data URI, voir miniatures.py) est affiché en fond
+    jusqu'au chargement, puis retiré (images avec transparence).
+    Sans miniatures (image absente de miniatures, ex: manquante): l'original partout.
+    """
+    full = rel_to_output(p, output_html)
+    attrs = f'loading="lazy" decoding="async" data-fullsize="{full}"'
+    mini = miniatures.get(p)
+    if mini is None:
+        return f'src="{full}" {attrs}' + (f' style="{style}"' if style else "")
+
+    if mini.variantes:
+        candidats = mini.srcset()
+        src = rel_to_output(candidats[(len(candidats) - 1) // 2][1], output_html)
+        srcset = ", ".join(f"{rel_to_output(c, output_html)} {w}w" for w, c in candidats)
+        attrs = f'src="{src}" srcset="{srcset}" sizes="{sizes}" {attrs}'
+    else:
+        attrs = f'src="{full}" {attrs}'
+    attrs += f' width="{mini.largeur}" height="{mini.hauteur}"'
+    if mini.apercu:
+        style += f"background-image:url('{mini.apercu}');"
+        attrs += ' class="apercu" onload="this.style.backgroundImage=\'none\'"'
+    return attrs + (f' style="{style}"' if style else "")
+
+def figure(img_path: Path, caption: str, output_html: Path, miniatures: Mapping[Path, Miniatures],
+           max_width: str = "70%") -> str:
     p = pick_existing(img_path)
-    src = rel_to_output(p, output_html)
+    # Largeur affichée: max_width du conteneur, plafonnée par .container
+    pct = float(max_width.rstrip("%")) if max_width.endswith("%") else 100.0
+    sizes = f"(max-width: {LARGEUR_CONTENU_PX}px) {pct:g}vw, {round(LARGEUR_CONTENU_PX * pct / 100)}px"
+    attrs = img_attrs(p, output_html, miniatures, sizes, style=f"max-width:{max_width};")
     cap = _escape(caption)
     return f"""
     <div class="figure-container">
-        <img src="{src}" alt="{cap}" data-fullsize="{src}" onclick="openLightbox(this)" style="max-width:{max_width};" />
+        <img {attrs} alt="{cap}" onclick="openLightbox(this)" />
         <p class="figure-caption">{cap}</p>
     </div>
     """
 
-def pair_two(img_a: Path, cap_a: str, img_b: Path, cap_b: str, output_html: Path) -> str:
+def pair_two(img_a: Path, cap_a: str, img_b: Path, cap_b: str, output_html: Path,
+             miniatures: Mapping[Path, Miniatures]) -> str:
     a = pick_existing(img_a)
     b = pick_existing(img_b)
-    sa = rel_to_output(a, output_html)
-    sb = rel_to_output(b, output_html)
+    # Deux colonnes (une seule sous BASCULE_UNE_COLONNE_PX)
+    sizes = (f"(max-width: {BASCULE_UNE_COLONNE_PX}px) 100vw, "
+             f"(max-width: {LARGEUR_CONTENU_PX}px) 50vw, {LARGEUR_CONTENU_PX // 2}px")
+    sa = img_attrs(a, output_html, miniatures, sizes)
+    sb = img_attrs(b, output_html, miniatures, sizes)
     ca = _escape(cap_a)
     cb = _escape(cap_b)
     return f"""
     <div class="comparison-images">
         <div class="comparison-image-item" onclick="openLightbox(this.querySelector('img'))">
-            <img src="{sa}" alt="{ca}" data-fullsize="{sa}">
+            <img {sa} alt="{ca}">
             <div class="comparison-image-label">{ca}</div>
         </div>
         <div class="comparison-image-item" onclick="openLightbox(this.querySelector('img'))">
-            <img src="{sb}" alt="{cb}" data-fullsize="{sb}">
+            <img {sb} alt="{cb}">
             <div class="comparison-image-label">{cb}</div>
         </div>
     </div>
@@ -158,7 +225,11 @@ def section(title: str, inner: str) -> str:
 # HTML Template
 # =========================
 
-def build_html(output_html: Path) -> str:
+def build_html(output_html: Path, miniatures: Mapping[Path, Miniatures]) -> str:
+    """
+    HTML du rapport. miniatures: résultat de preparer_miniatures() (voir generer_rapport);
+    une image absente du dictionnaire est servie en original.
+    """
     now = datetime.now().strftime("%d %B %Y à %H:%M")
 
     # ---- Partie 0
@@ -167,7 +238,7 @@ def build_html(output_html: Path) -> str:
     p0 += f"""
     <div class="comparison-pair">
         <div class="comparison-pair-title">Iris vs Optimus</div>
-        {pair_two(IMG_IRIS, "Iris (original)", IMG_OPTIMUS, "Optimus (original)", output_html)}
+        {pair_two(IMG_IRIS, "Iris (original)", IMG_OPTIMUS, "Optimus (original)", output_html, miniatures)}
     </div>
     """
 
@@ -175,7 +246,8 @@ def build_html(output_html: Path) -> str:
     p0 += f"""
     <div class="comparison-pair">
         <div class="comparison-pair-title">Sharpening σ=2.5</div>
-        {pair_two(IMG_IRIS_SHARP, "Iris sharpened (σ=2.5)", IMG_OPTIMUS_SHARP, "Optimus sharpened (σ=2.5)", output_html)}
+        {pair_two(IMG_IRIS_SHARP, "Iris sharpened (σ=2.5)", IMG_OPTIMUS_SHARP, "Optimus sharpened (σ=2.5)",
+                  output_html, miniatures)}
     </div>
     """
 
@@ -183,7 +255,7 @@ def build_html(output_html: Path) -> str:
     p0 += f"""
     <div class="comparison-pair">
         <div class="comparison-pair-title">Montages</div>
-        {pair_two(IMG_IRIS_MONTAGE, "Montage Iris", IMG_OPTIMUS_MONTAGE, "Montage Optimus", output_html)}
+        {pair_two(IMG_IRIS_MONTAGE, "Montage Iris", IMG_OPTIMUS_MONTAGE, "Montage Optimus", output_html, miniatures)}
     </div>
     """
     p0 += textarea_block("Observations / réponses (Partie 0)")
@@ -194,11 +266,11 @@ def build_html(output_html: Path) -> str:
     p1 += f"""
     <div class="comparison-pair">
         <div class="comparison-pair-title">Entrées</div>
-        {pair_two(IMG_EINSTEIN, "Albert Einstein (input)", IMG_MARILYN, "Marilyn Monroe (input)", output_html)}
+        {pair_two(IMG_EINSTEIN, "Albert Einstein (input)", IMG_MARILYN, "Marilyn Monroe (input)", output_html, miniatures)}
     </div>
     """
     p1 += "<h4>Résultat</h4>"
-    p1 += figure(IMG_HYBRID_T1, "Image hybride (cutoff 5.0 / 5.0)", output_html, max_width="75%")
+    p1 += figure(IMG_HYBRID_T1, "Image hybride (cutoff 5.0 / 5.0)", output_html, miniatures, max_width="75%")
 
     p1 += "<hr class='soft-hr' />"
 
@@ -206,11 +278,11 @@ def build_html(output_html: Path) -> str:
     p1 += f"""
     <div class="comparison-pair">
         <div class="comparison-pair-title">Entrées</div>
-        {pair_two(IMG_CAP, "Capitaine (input)", IMG_THOR, "Thor (input)", output_html)}
+        {pair_two(IMG_CAP, "Capitaine (input)", IMG_THOR, "Thor (input)", output_html, miniatures)}
     </div>
     """
     p1 += "<h4>Résultat</h4>"
-    p1 += figure(IMG_HYBRID_T2, "Image hybride (cutoff 3.0 / 3.5)", output_html, max_width="75%")
+    p1 += figure(IMG_HYBRID_T2, "Image hybride (cutoff 3.0 / 3.5)", output_html, miniatures, max_width="75%")
 
     p1 += url_inputs_block(
         "Sources (si images prises sur Internet)",
@@ -223,7 +295,7 @@ def build_html(output_html: Path) -> str:
     p1 += f"""
     <div class="comparison-pair">
         <div class="comparison-pair-title">Amplitude (log) — composantes</div>
-        {pair_two(IMG_AMP_HIGH, "Amplitude passe-haut", IMG_AMP_LOW, "Amplitude passe-bas", output_html)}
+        {pair_two(IMG_AMP_HIGH, "Amplitude passe-haut", IMG_AMP_LOW, "Amplitude passe-bas", output_html, miniatures)}
     </div>
     """
     p1 += textarea_block("Réponse: Illustration détaillée de l'analyse fréquentielle")
@@ -234,11 +306,12 @@ def build_html(output_html: Path) -> str:
     p1b += f"""
     <div class="comparison-pair">
         <div class="comparison-pair-title">Entrées (mes photos)</div>
-        {pair_two(IMG_TONY, "Tony (input) — MES PHOTOS", IMG_PAT, "Pat (input) — MES PHOTOS", output_html)}
+        {pair_two(IMG_TONY, "Tony (input) — MES PHOTOS", IMG_PAT, "Pat (input) — MES PHOTOS", output_html, miniatures)}
     </div>
     """
     p1b += "<h4>Résultat</h4>"
-    p1b += figure(IMG_HYBRID_T3, "Image hybride couleur (cutoff 10.0 / 10.0) — MES PHOTOS", output_html, max_width="75%")
+    p1b += figure(IMG_HYBRID_T3, "Image hybride couleur (cutoff 10.0 / 10.0) — MES PHOTOS", output_html, miniatures,
+                  max_width="75%")
 
     p1b += textarea_block(
         "Pour quelle(s) composantes la couleur améliore l'effet ? (passe-haut, passe-bas, les deux)",
@@ -248,12 +321,25 @@ def build_html(output_html: Path) -> str:
     # ---- Partie 2
     p2 = ""
     p2 += "<h3>Piles gaussienne et laplacienne — « Lincoln et Gala » (Dali)</h3>"
-    p2 += figure(IMG_PILE_MONTAGE, "Montage piles gaussienne + laplacienne", output_html, max_width="85%")
+    p2 += figure(IMG_PILE_MONTAGE, "Montage piles gaussienne + laplacienne", output_html, miniatures, max_width="85%")
     p2 += textarea_block("Commentaires / observations (Partie 2)")
 
-    # ---- Partie 3 (placeholder)
+    # ---- Partie 3
     p3 = ""
-    p3 += "<h3>À compléter</h3>"
+    p3 += "<h3>Mélange multirésolution — Pomme / Orange</h3>"
+    p3 += f"""
+    <div class="comparison-pair">
+        <div class="comparison-pair-title">Entrées</div>
+        {pair_two(IMG_POMME, "Pomme (input)", IMG_ORANGE, "Orange (input)", output_html, miniatures)}
+    </div>
+    """
+    p3 += "<h4>Résultat</h4>"
+    p3 += f"""
+    <div class="comparison-pair">
+        <div class="comparison-pair-title">Masque et mélange</div>
+        {pair_two(IMG_MASQUE, "Masque (blanc = pomme)", IMG_MELANGE, "Mélange multirésolution", output_html, miniatures)}
+    </div>
+    """
     p3 += textarea_block("Décrivez votre mélange multirésolution + résultats", "Ajoute tes images + ton texte quand tu les as.")
 
     # ---- Partie 4 (placeholder)
@@ -351,12 +437,20 @@ def build_html(output_html: Path) -> str:
     .figure-container img {{
       max-width: 100%;
       max-height: 520px;
+      height: auto;
+      object-fit: contain;
       border-radius: 8px;
       box-shadow: 0 4px 20px rgba(0,0,0,0.3);
       cursor: pointer;
       transition: transform 0.15s, box-shadow 0.15s;
     }}
 
+    img.apercu {{
+      background-size: contain;
+      background-position: center;
+      background-repeat: no-repeat;
+    }}
+
     .figure-container img:hover {{
       transform: scale(1.015);
       box-shadow: 0 6px 30px rgba(0,0,0,0.5);
@@ -620,11 +714,36 @@ def build_html(output_html: Path) -> str:
     return html
 
 
+def verifier_images(images: Iterable[Path]) -> list[tuple[Path, str]]:
+    """
+    État de chaque image dans le manifeste de build (voir manifeste.py).
+    Retourne seulement celles qui ne sont pas "ok": manquante, inconnue (copiée à la main),
+    ou modifiée depuis sa génération.
+    """
+    manifeste = Manifeste()
+    etats = [(p, manifeste.etat(p)) for p in map(pick_existing, images)]
+    return [(p, e) for p, e in etats if e != "ok"]
+
+def generer_rapport(output_html: Path = OUTPUT_HTML, n_workers: Optional[int] = None) -> Path:
+    """
+    Vérifie les images générées, prépare leurs miniatures (en parallèle, en cache
+    d'un rapport à l'autre; voir miniatures.py) puis écrit le rapport HTML.
+    Retourne le chemin du rapport.
+    """
+    for p, etat in verifier_images(IMAGES_GENEREES):
+        print(f"[{etat.upper()}] {p}")
+
+    miniatures = preparer_miniatures(map(pick_existing, IMAGES_RAPPORT), n_workers=n_workers)
+
+    output_html = Path(output_html)
+    output_html.parent.mkdir(parents=True, exist_ok=True)
+    html = build_html(output_html, miniatures)
+    output_html.write_text(html, encoding="utf-8")
+    print(f"[OK] Rapport généré: {output_html.resolve()}")
+    return output_html
+
 def main() -> None:
-    OUTPUT_HTML.parent.mkdir(parents=True, exist_ok=True)
-    html = build_html(OUTPUT_HTML)
-    OUTPUT_HTML.write_text(html, encoding="utf-8")
-    print(f"[OK] Rapport généré: {OUTPUT_HTML.resolve()}")
+    generer_rapport(OUTPUT_HTML)
 
 
 if __name__ == "__main__":
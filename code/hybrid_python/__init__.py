@@ -0,0 +1,4 @@
+# Paquet hybrid_python: code de départ du TP (alignement, hybrides, crop).
+# Importé depuis le dossier code (déjà dans sys.path pour les scripts main_*):
+#   from hybrid_python.hybrid_image import hybrid_image
+# Les modules du dossier code (precision, gauss_backend, traces...) sont importés tels quels.
@@ -1,27 +1,19 @@
 import numpy as np
 # import scipy.misc as misc
-import matplotlib.pyplot as plt
-import skimage.transform as sktr
+import scipy.fft as sfft
 
+# scipy.ndimage, skimage.transform et skimage.registration (~0.5 s) sont importés dans les
+# fonctions qui s'en servent: rien de lourd quand l'alignement vient du cache
 
-def norm_image(image_array):
-    return image_array.astype(np.float64) / 255.0
-
+from precision import dtype_calcul
+from traces import trace
 
-def translate_image(img, t, axis):
-    # Supporte 2D (H,W) et 3D (H,W,C)
-    if img.ndim == 2:
-        pad_width = [(0, 0), (0, 0)]
-    else:
-        pad_width = [(0, 0), (0, 0), (0, 0)]
+# Mode automatique: côté max des copies réduites, du grossier au fin
+TAILLES_AUTO = (256, 1024)
 
-    if t > 0:
-        pad_width[axis] = (t, 0)
-    else:
-        pad_width[axis] = (0, -t)
 
-    pad_width = tuple(pad_width)
-    return np.pad(img, pad_width, mode='constant')
+def norm_image(image_array):
+    return image_array.astype(dtype_calcul()) / 255.0
 
 
 def _get_hw(img):
@@ -33,91 +25,287 @@ def _to_gray_for_display(img):
     # Conversion minimale pour afficher en gris quand l'image est RGB/RGBA
     if img.ndim == 2:
         return img
-    rgb = img[:, :, :3].astype(np.float64)
+    rgb = img[:, :, :3].astype(dtype_calcul(), copy=False)
     return 0.2989 * rgb[:, :, 0] + 0.5870 * rgb[:, :, 1] + 0.1140 * rgb[:, :, 2]
 
 
-def _rescale_keep_channels(img, scale):
-    # Empêche skimage de redimensionner l’axe des canaux
-    if img.ndim == 2:
-        return sktr.rescale(img, scale)
-    try:
-        return sktr.rescale(img, scale, channel_axis=-1)
-    except TypeError:
-        return sktr.rescale(img, scale, multichannel=True)
+def _reduire(img, k):
+    # Copie en gris réduite d'un facteur entier k (moyenne par blocs k x k), float32.
+    # Somme de k² sous-échantillonnages décalés: bien plus rapide qu'un reshape + mean
+    H, W = _get_hw(img)
+    H, W = H // k * k, W // k * k
+    src = img[:, :, :3] if img.ndim == 3 else img
+    acc = np.zeros((H // k, W // k) + src.shape[2:], dtype=np.float32)
+    for i in range(k):
+        for j in range(k):
+            acc += src[i:H:k, j:W:k]
+    acc /= k * k
+    if acc.ndim == 3:
+        return 0.2989 * acc[:, :, 0] + 0.5870 * acc[:, :, 1] + 0.1140 * acc[:, :, 2]
+    return acc
 
 
-def align_images(img1, img2):
-    #
-    # Aligns im1 and im2 (translation, scale, rotation) after getting two pairs
-    # of points from the user.  In the output of im1 and im2, the two pairs of
-    # points will have approximately the same coordinates.
-    #
+def _passage(k):
+    # Coordonnées (x, y) de l'image réduite -> image d'origine (centre des blocs)
+    return np.array([[k, 0, (k - 1) / 2], [0, k, (k - 1) / 2], [0, 0, 1.0]])
 
-    # get image sizes
-    h1, w1 = _get_hw(img1)
-    h2, w2 = _get_hw(img2)
 
-    # gets two points from the user
-    print('Select two points from each image define rotation, scale, translation')
-    plt.imshow(_to_gray_for_display(img1), cmap='gray')
-    x1, y1 = tuple(zip(*plt.ginput(2)))
-    plt.close()
-    cx1, cy1 = np.mean(x1), np.mean(y1)
+def _centre(g):
+    return np.array([(g.shape[1] - 1) / 2, (g.shape[0] - 1) / 2])
+
+
+def _similitude(angle, echelle, c1, c2):
+    # Matrice 3x3 (x, y): rotation (degrés) + échelle autour de c1, puis c1 -> c2
+    a = np.deg2rad(angle)
+    R = echelle * np.array([[np.cos(a), -np.sin(a)], [np.sin(a), np.cos(a)]])
+    M = np.eye(3)
+    M[:2, :2] = R
+    M[:2, 2] = np.asarray(c2) - R @ np.asarray(c1)
+    return M
+
+
+def _ramener(g2, M, shape, cval=0.0):
+    # g2 rééchantillonnée dans le repère de l'image 1 (M: image 1 -> image 2)
+    import skimage.transform as sktr
+    return sktr.warp(g2, sktr.AffineTransform(matrix=M), output_shape=shape, order=1, cval=cval)
+
+
+def _hann_radial(h, w):
+    # Fenêtre de Hann circulaire (une fenêtre séparable favoriserait les axes x/y)
+    y = np.linspace(-1.0, 1.0, h, dtype=np.float32)[:, None]
+    x = np.linspace(-1.0, 1.0, w, dtype=np.float32)[None, :]
+    r = np.minimum(np.sqrt(x * x + y * y), 1.0)
+    return 0.5 + 0.5 * np.cos(np.pi * r)
+
+
+def _spectre_log_polaire(g, S):
+    # Amplitude de la FFT (invariante en translation) en coordonnées log-polaires:
+    # une rotation devient un décalage vertical, un changement d'échelle un décalage horizontal
+    x = np.zeros((S, S), dtype=np.float32)
+    h, w = g.shape
+    y0, x0 = (S - h) // 2, (S - w) // 2
+    x[y0:y0 + h, x0:x0 + w] = (g - g.mean()) * _hann_radial(h, w)
+    F = np.abs(sfft.fftshift(sfft.fft2(x)))
+
+    # Passe-haut: les basses fréquences dominent et ne portent presque pas d'orientation
+    f = sfft.fftshift(sfft.fftfreq(S))
+    F *= 1.0 - np.cos(np.pi * f[:, None]) * np.cos(np.pi * f[None, :])
+
+    import skimage.transform as sktr
+    rayon = S // 2
+    return sktr.warp_polar(F, radius=rayon, output_shape=(360, rayon), scaling="log", order=1), rayon
+
+
+def _rotation_echelle(g1, g2):
+    # (angle en degrés, échelle) de l'image 1 vers l'image 2, à 180 degrés près
+    from skimage.registration import phase_cross_correlation
+    S = max(*g1.shape, *g2.shape)
+    lp1, rayon = _spectre_log_polaire(g1, S)
+    lp2, _ = _spectre_log_polaire(g2, S)
+    # Spectre d'amplitude symétrique: seulement la moitié des angles
+    decalage, _, _ = phase_cross_correlation(lp1[:180], lp2[:180], upsample_factor=20, normalization=None)
+    return -decalage[0], np.exp(decalage[1] * np.log(rayon) / rayon)
+
+
+def _recaler_translation(g1, g2, M):
+    # Ajoute à M la translation restante (corrélation de phase après rotation/échelle)
+    from skimage.registration import phase_cross_correlation
+    decalage, _, _ = phase_cross_correlation(g1, _ramener(g2, M, g1.shape), upsample_factor=10)
+    T = np.eye(3)
+    T[:2, 2] = -decalage[::-1]
+    return M @ T
+
+
+def _correlation(g1, g2, M):
+    # Corrélation normalisée sur la zone commune (pour choisir entre les candidats)
+    w = _ramener(g2, M, g1.shape, cval=np.nan)
+    valide = ~np.isnan(w)
+    if valide.sum() < 0.1 * valide.size:
+        return -1.0
+    a = g1[valide] - g1[valide].mean()
+    b = w[valide] - w[valide].mean()
+    return float((a * b).sum() / np.sqrt((a * a).sum() * (b * b).sum() + 1e-12))
 
-    plt.imshow(_to_gray_for_display(img2), cmap='gray')
-    x2, y2 = tuple(zip(*plt.ginput(2)))
-    plt.close()
-    cx2, cy2 = np.mean(x2), np.mean(y2)
 
-    # translate first so that center of ref points is center of image
-    tx = int(np.round((w1 / 2 - cx1) * 2))
-    img1 = translate_image(img1, tx, axis=1)
-    ty = int(np.round((h1 / 2 - cy1) * 2))
-    img1 = translate_image(img1, ty, axis=0)
+@trace("estimation")
+def estimer_similitude(img1, img2, tailles=TAILLES_AUTO):
+    # Transformation (translation, rotation, échelle) qui envoie les coordonnées (x, y)
+    # de img1 sur celles de img2 (matrice 3x3), par corrélation de phase sur des copies
+    # réduites, du grossier au fin: chaque niveau corrige le résidu du précédent.
+    # Facteurs de réduction, chacun multiple du plus fin: les copies grossières sont
+    # calculées à partir des plus fines (l'image d'origine n'est parcourue qu'une fois)
+    cote = max(*_get_hw(img1), *_get_hw(img2))
+    k_fin = max(1, int(np.ceil(cote / max(tailles))))
+    facteurs = sorted({k_fin * max(1, int(np.ceil(cote / (t * k_fin)))) for t in tailles}, reverse=True)
 
-    tx = int(np.round((w2 / 2 - cx2) * 2))
-    img2 = translate_image(img2, tx, axis=1)
-    ty = int(np.round((h2 / 2 - cy2) * 2))
-    img2 = translate_image(img2, ty, axis=0)
+    copies = {k_fin: (_reduire(img1, k_fin), _reduire(img2, k_fin))}
+    for k in facteurs[:-1]:
+        g1, g2 = copies[k_fin]
+        copies[k] = (_reduire(g1, k // k_fin), _reduire(g2, k // k_fin))
 
-    # downscale larger image so that lengths between ref points are the same
-    len1 = np.sqrt((y1[1]-y1[0]) ** 2 + (x1[1]-x1[0]) ** 2)
-    len2 = np.sqrt((y2[1]-y2[0]) ** 2 + (x2[1]-x2[0]) ** 2)
+    M = None
+    for k in facteurs:
+        g1, g2 = copies[k]
+        c1 = _centre(g1)
 
-    dscale = len2 / len1
+        if M is None:
+            # Rotation ambiguë à 180 degrés près: on garde le candidat le mieux corrélé
+            angle, echelle = _rotation_echelle(g1, g2)
+            candidats = [_similitude(a, echelle, c1, _centre(g2)) for a in (angle, angle + 180.0)]
+        else:
+            # Résidu mesuré sur img2 déjà ramenée dans le repère de img1
+            M_k = np.linalg.inv(_passage(k)) @ M @ _passage(k)
+            angle, echelle = _rotation_echelle(g1, _ramener(g2, M_k, g1.shape))
+            candidats = [M_k, M_k @ _similitude(angle, echelle, c1, c1)]
 
-    if dscale < 1:
-        img1 = _rescale_keep_channels(img1, dscale)
-    else:
-        img2 = _rescale_keep_channels(img2, 1/dscale)
+        candidats = [_recaler_translation(g1, g2, C) for C in candidats]
+        M_k = max(candidats, key=lambda C: _correlation(g1, g2, C))
+        M = _passage(k) @ M_k @ np.linalg.inv(_passage(k))
 
-    # rotate im1 so that angle between points is the same
-    theta1 = np.arctan2(-(y1[1]-y1[0]), x1[1]-x1[0])
-    theta2 = np.arctan2(-(y2[1]-y2[0]), x2[1]-x2[0])
-    dtheta = theta2-theta1
+    return M
 
-    # skimage.rotate supporte les images multicanaux (H,W,C) directement
-    img1 = sktr.rotate(img1, dtheta*180/np.pi, preserve_range='True')  # imrotate uses degree units
 
-    # Crop images (on both sides of border) to be same height and width
+def points_auto(img1, img2):
+    # Deux paires de points équivalentes aux clics: de part et d'autre du centre de img1,
+    # et leurs positions dans img2 selon la similitude estimée
+    M = estimer_similitude(img1, img2)
     h1, w1 = _get_hw(img1)
-    h2, w2 = _get_hw(img2)
+    p1 = np.array([[w1 / 4, h1 / 2, 1.0], [3 * w1 / 4, h1 / 2, 1.0]])
+    p2 = p1 @ M.T
+    return tuple(p1[:, 0]), tuple(p1[:, 1]), tuple(p2[:, 0]), tuple(p2[:, 1])
 
-    minw = min(w1, w2)
-    brd = (max(w1, w2) - minw) / 2
 
-    if minw == w1:
-        img2 = img2[:, int(np.ceil(brd)):-int(np.floor(brd)), ...] if img2.ndim == 3 else img2[:, int(np.ceil(brd)):-int(np.floor(brd))]
-    else:
-        img1 = img1[:, int(np.ceil(brd)):-int(np.floor(brd)), ...] if img1.ndim == 3 else img1[:, int(np.ceil(brd)):-int(np.floor(brd))]
+def _polygone_image(h, w, c, a):
+    # Coins de l'image (x + iy) ramenés dans le repère de sortie w = (z - c) / a
+    coins = np.array([0, w - 1, (w - 1) + 1j * (h - 1), 1j * (h - 1)])
+    return list((coins - c) / a)
 
-    minh = min(h1, h2)
-    brd = (max(h1, h2) - minh) / 2
 
-    if minh == h1:
-        img2 = img2[int(np.ceil(brd)):-int(np.floor(brd)), :, ...] if img2.ndim == 3 else img2[int(np.ceil(brd)):-int(np.floor(brd)), :]
-    else:
-        img1 = img1[int(np.ceil(brd)):-int(np.floor(brd)), :, ...] if img1.ndim == 3 else img1[int(np.ceil(brd)):-int(np.floor(brd)), :]
+def _couper(polygone, bord):
+    # Sutherland-Hodgman: partie de polygone (convexe) du côté intérieur de chaque arête de bord
+    def dedans(p, a, b):
+        return ((b - a).conjugate() * (p - a)).imag >= 0
+
+    def intersection(p, q, a, b):
+        d, e = q - p, b - a
+        t = ((a - p).conjugate() * e).imag / ((d.conjugate() * e).imag)
+        return p + t * d
+
+    # Même sens de parcours pour les deux polygones
+    aire = sum((p.conjugate() * q).imag for p, q in zip(bord, bord[1:] + bord[:1]))
+    if aire < 0:
+        bord = bord[::-1]
+
+    for a, b in zip(bord, bord[1:] + bord[:1]):
+        entree, polygone = polygone, []
+        for p, q in zip(entree, entree[1:] + entree[:1]):
+            if dedans(q, a, b):
+                if not dedans(p, a, b):
+                    polygone.append(intersection(p, q, a, b))
+                polygone.append(q)
+            elif dedans(p, a, b):
+                polygone.append(intersection(p, q, a, b))
+        if not polygone:
+            break
+    return polygone
+
+
+def transformations_alignement(points, shape1, shape2):
+    # Deux paires de points (x1, y1, x2, y2) -> (A1, A2, (H, W)).
+    # A1, A2: matrices 3x3 qui envoient les coordonnées (x, y) du canevas de sortie sur
+    # celles de img1 / img2. Comme avant: les points sont centrés, img1 est tournée
+    # vers l'orientation de img2, et la plus grande des deux est réduite à l'échelle de l'autre.
+    # Le canevas est la boîte englobante de la zone couverte par les deux images.
+    x1, y1, x2, y2 = points
+    c1, c2 = np.mean(x1) + 1j * np.mean(y1), np.mean(x2) + 1j * np.mean(y2)
+    v1 = (x1[1] - x1[0]) + 1j * (y1[1] - y1[0])
+    v2 = (x2[1] - x2[0]) + 1j * (y2[1] - y2[0])
+    if abs(v1) == 0 or abs(v2) == 0:
+        raise ValueError("Les deux points d'une image doivent être distincts")
+
+    # Repère de sortie: orientation de img2, échelle de la plus petite distance entre points
+    vo = v2 / abs(v2) * min(abs(v1), abs(v2))
+    a1, a2 = v1 / vo, v2 / vo
+
+    zone = _couper(_polygone_image(*shape1, c1, a1), _polygone_image(*shape2, c2, a2))
+    if not zone:
+        raise ValueError("Les images alignées ne se recouvrent pas")
+    zone = np.array(zone)
+    x0, y0 = int(np.ceil(zone.real.min() - 1e-6)), int(np.ceil(zone.imag.min() - 1e-6))
+    x_max, y_max = int(np.floor(zone.real.max() + 1e-6)), int(np.floor(zone.imag.max() + 1e-6))
+    shape = (y_max - y0 + 1, x_max - x0 + 1)
+
+    def matrice(c, a):
+        # z_image = c + a * (x0 + col + i (y0 + row))
+        o = c + a * (x0 + 1j * y0)
+        return np.array([[a.real, -a.imag, o.real], [a.imag, a.real, o.imag], [0.0, 0.0, 1.0]])
+
+    return matrice(c1, a1), matrice(c2, a2), shape
+
+
+@trace("reechantillonnage")
+def reechantillonner(img, A, shape):
+    # Un seul rééchantillonnage (bilinéaire) de img dans le canevas, canal par canal:
+    # pas de copie float de l'image d'entrée, seulement le canevas de sortie.
+    # Les valeurs gardent l'intervalle d'origine (0..255 pour uint8), en dtype_calcul().
+    import scipy.ndimage as ndi
+    echelle = np.sqrt(abs(np.linalg.det(A[:2, :2])))
+    # Réduction: même anti-repliement que skimage.transform.rescale
+    sigma = max(0.0, (echelle - 1.0) / 2.0)
+
+    # (x, y) -> (ligne, colonne) pour scipy.ndimage
+    matrice = np.array([[A[1, 1], A[1, 0]], [A[0, 1], A[0, 0]]])
+    offset = np.array([A[1, 2], A[0, 2]])
+
+    canaux = [img] if img.ndim == 2 else [img[:, :, c] for c in range(img.shape[2])]
+    sortie = np.empty(shape + img.shape[2:], dtype=dtype_calcul())
+    for c, canal in enumerate(canaux):
+        if sigma > 0:
+            canal = ndi.gaussian_filter(canal.astype(dtype_calcul()), sigma, mode="nearest")
+        res = ndi.affine_transform(canal, matrice, offset, output_shape=shape, output=dtype_calcul(),
+                                   order=1, mode="constant", cval=0.0)
+        if img.ndim == 2:
+            sortie[...] = res
+        else:
+            sortie[:, :, c] = res
+    return sortie
+
+
+def choisir_points(img1, img2, auto=False):
+    # Deux paires de points (x1, y1, x2, y2): clics de l'utilisateur, ou estimer_similitude() si auto
+    if auto:
+        return points_auto(img1, img2)
+
+    # pyplot (~0.7 s) seulement pour les clics: pas chargé en mode auto ni si l'alignement est en cache
+    import matplotlib.pyplot as plt
+    if plt.get_backend().lower() == "agg":
+        raise RuntimeError("Alignement manuel impossible sans interface graphique (backend Agg): "
+                           "utiliser auto=True ou un alignement déjà en cache")
+
+    # gets two points from the user
+    print('Select two points from each image define rotation, scale, translation')
+    plt.imshow(_to_gray_for_display(img1), cmap='gray')
+    x1, y1 = tuple(zip(*plt.ginput(2)))
+    plt.close()
+
+    plt.imshow(_to_gray_for_display(img2), cmap='gray')
+    x2, y2 = tuple(zip(*plt.ginput(2)))
+    plt.close()
+    return x1, y1, x2, y2
+
+
+def align_images(img1, img2, auto=False):
+    #
+    # Aligns im1 and im2 (translation, scale, rotation) after getting two pairs
+    # of points from the user.  In the output of im1 and im2, the two pairs of
+    # points will have approximately the same coordinates.
+    # Les deux sorties ont la même taille: la zone où les deux images se recouvrent.
+    #
+    # auto=True: pas de clics, les deux paires de points viennent de estimer_similitude()
+    #
+    points = choisir_points(img1, img2, auto=auto)
 
-    return img1, img2
+    # Une seule transformation affine par image, appliquée une seule fois,
+    # directement dans un canevas de la taille de la zone commune
+    A1, A2, shape = transformations_alignement(points, _get_hw(img1), _get_hw(img2))
+    return reechantillonner(img1, A1, shape), reechantillonner(img2, A2, shape)
@@ -0,0 +1,124 @@
+# cache_alignement.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from precision import dtype_calcul
+
+from .align_images import TAILLES_AUTO, _get_hw, choisir_points, reechantillonner, transformations_alignement
+
+# Cache persistant de l'alignement d'une paire d'images, clé = contenu des deux images
+# + mode d'alignement (clics, ou auto et ses paramètres): un alignement auto n'est jamais
+# relu pour une demande de clics, ni l'inverse.
+#
+#   <dossier>/<clé>/alignement.json   points cliqués (ou estimés), matrices A1/A2, taille du canevas
+#   <dossier>/<clé>/im1_<dtype>.npy, im2_<dtype>.npy   paire alignée (optionnel), relue en memmap
+#
+# Avec les .npy: ni clics ni rééchantillonnage. Sans: pas de clics, un seul rééchantillonnage.
+# À côté de ce module (pas relatif au dossier courant); ignoré par git
+DOSSIER_CACHE = Path(__file__).resolve().parent / ".cache" / "alignement"
+
+# À incrémenter si la géométrie de transformations_alignement() change
+VERSION = 1
+
+
+def empreinte(img: np.ndarray) -> bytes:
+    # Hash du contenu (pixels + forme + type), indépendant du fichier d'origine
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.shape}|{img.dtype.str}".encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.digest()
+
+
+def mode_alignement(auto: bool) -> str:
+    # Mode et paramètres qui déterminent les points: "clics" ou "auto:256,1024"
+    return f"auto:{','.join(map(str, TAILLES_AUTO))}" if auto else "clics"
+
+
+def cle_paire(img1: np.ndarray, img2: np.ndarray, mode: str) -> str:
+    # L'ordre compte: (img1, img2) et (img2, img1) ne donnent pas le même alignement
+    return hashlib.blake2b(empreinte(img1) + empreinte(img2) + mode.encode(), digest_size=16).hexdigest()
+
+
+def _ecrire_atomique(chemin: Path, ecrire) -> None:
+    # Écrit dans un fichier temporaire puis renomme: jamais d'entrée à moitié écrite
+    tmp = chemin.with_name(chemin.name + ".tmp")
+    with open(tmp, "wb") as f:
+        ecrire(f)
+    os.replace(tmp, chemin)
+
+
+def lire_alignement(dossier: Path, mode: str) -> dict | None:
+    chemin = dossier / "alignement.json"
+    if not chemin.is_file():
+        return None
+    meta = json.loads(chemin.read_text(encoding="utf-8"))
+    if meta.get("version") != VERSION or meta.get("mode") != mode:
+        return None
+    return meta
+
+
+def aligner_avec_cache(
+    img1: np.ndarray,
+    img2: np.ndarray,
+    auto: bool = False,
+    dossier: Path = DOSSIER_CACHE,
+    garder_images: bool = True,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Même contrat que align_images(img1, img2, auto): (img1 alignée, img2 alignée).
+    # Les tableaux relus du cache sont des memmap en lecture seule.
+    mode = mode_alignement(auto)
+    entree = Path(dossier) / cle_paire(img1, img2, mode)
+    meta = lire_alignement(entree, mode)
+    # Un fichier par précision (les sorties de reechantillonner() sont en dtype_calcul())
+    noms = (f"im1_{dtype_calcul().name}.npy", f"im2_{dtype_calcul().name}.npy")
+
+    if meta is not None:
+        if garder_images and all((entree / nom).is_file() for nom in noms):
+            print(f"Alignement relu du cache: {entree}")
+            return tuple(np.load(entree / nom, mmap_mode="r") for nom in noms)
+        print(f"Points d'alignement relus du cache: {entree}")
+        A1, A2 = np.array(meta["A1"]), np.array(meta["A2"])
+        shape = tuple(meta["shape"])
+    else:
+        points = choisir_points(img1, img2, auto=auto)
+        A1, A2, shape = transformations_alignement(points, _get_hw(img1), _get_hw(img2))
+        meta = {
+            "version": VERSION,
+            "mode": mode,
+            "points": [list(map(float, p)) for p in points],
+            "A1": A1.tolist(),
+            "A2": A2.tolist(),
+            "shape": list(shape),
+        }
+        entree.mkdir(parents=True, exist_ok=True)
+        _ecrire_atomique(entree / "alignement.json",
+                         lambda f: f.write(json.dumps(meta, indent=2).encode("utf-8")))
+
+    im1_aligned = reechantillonner(img1, A1, shape)
+    im2_aligned = reechantillonner(img2, A2, shape)
+
+    if garder_images:
+        for nom, tableau in zip(noms, (im1_aligned, im2_aligned)):
+            _ecrire_atomique(entree / nom, lambda f, t=tableau: np.save(f, t))
+    return im1_aligned, im2_aligned
+
+
+def transportable(img: np.ndarray):
+    # Pour les entrées d'un sweep: un memmap du cache voyage comme son chemin
+    # (chaque worker le relit en memmap au lieu de recevoir une copie des pixels)
+    if isinstance(img, np.memmap) and img.filename is not None:
+        return Path(img.filename)
+    return img
+
+
+def relire(img) -> np.ndarray:
+    # Inverse de transportable()
+    if isinstance(img, Path):
+        return np.load(img, mmap_mode="r")
+    return img
@@ -1,8 +1,14 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
+# Module "traces" partagé (dossier "code")
+from traces import trace
 
+
+@trace("crop")
 def crop_image(img):
+    # pyplot (~0.7 s) seulement pour les clics
+    import matplotlib.pyplot as plt
+
     print('Select two points that define the area of the image you '
           'want to crop')
     plt.imshow(img, cmap='gray')
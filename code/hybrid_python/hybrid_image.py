@@ -1,160 +1,125 @@
-import skimage
-import pathlib
 import numpy as np
 
-# Vérifier si on veux print dans le terminal des lignes de debug
-#DEBUG = True
-DEBUG = False
+# Backend gaussien partagé (dossier "code"), spatial ou FFT selon sigma
+from conversions import echelle_01, mettre_float01
+from gauss_backend import gaussian
+from traces import span
+from tuiles import TAILLE_TUILE, appliquer_par_tuiles, halo_gaussien, maximum_par_tuiles
 
-def hybrid_image(im1, im2, cutoff_low, cutoff_high):
+def _preparer(img, echelle=None):
+    # Retourne (image float [0,1] sans alpha, alpha uint8 ou None).
+    # Même normalisation que la banque de flous (mettre_float01 sur les canaux de couleur):
+    # img - bank.flou(img) reste cohérent. echelle: voir mettre_float01 (mode tuiles)
+
+    # Si l'image a un canal alpha (transparance), le mettre dans une variable et s'assurer qu'il est dans l'intervalle [0, 255]
+    alpha = None
+    if img.ndim == 3 and img.shape[2] == 4:
+        alpha = img[:, :, 3]
+        img = img[:, :, 0:3]
+        if alpha.dtype != np.uint8:
+            if alpha.max() > 0.0 and alpha.max() <= 1.0:
+                alpha = alpha * 255.0
+            alpha = np.clip(alpha, 0, 255).astype(np.uint8)
+
+    # Mettre l'image en float [0,1] (précision du pipeline) pour les calculs
+    return mettre_float01(img, echelle=echelle), alpha
+
+
+def _en_uint8(img, alphas):
+    # Normaliser pour mettre dans l'intervalle [0, 255], convertir en uint8
+    img_uft8 = (np.clip(img, 0, 1) * 255.0).astype(np.uint8)
+
+    # Remettre le canal alpha si les images originales en avaient un
+    for alpha in alphas:
+        if alpha is not None:
+            img_uft8 = np.dstack((img_uft8, alpha))
+    return img_uft8
+
+
+def hybrid_image(im1, im2, cutoff_low, cutoff_high, bank=None, les_deux=False):
     # you supply this code
-    img1 = im1
-    img2 = im2
-
-    # Si image en gris
-    if img1.ndim == 2 and img2.ndim == 2:
-        # Mettre les images en float64 pour les calculs
-        if img1.dtype != np.float64:
-            img1 = img1.astype(np.float64)
-        if img2.dtype != np.float64:
-            img2 = img2.astype(np.float64)
-        
-        # Normaliser les images si elles sont dans l'intervalle [0, 255]
-        if img1.max() > 1.0 and img1.max() <= 255.0:
-            img1 = img1 / 255.0
-        if img2.max() > 1.0 and img2.max() <= 255.0:
-            img2 = img2 / 255.0
-
-        print(f"Image 1 :\n    Shape {img1.shape}\n    Type {img1.dtype}")
-        print(f"Image 2 :\n    Shape {img2.shape}\n    Type {img2.dtype}")
-
-        # Calcul du filtre Gaussien (Low-pass)
-        img1GaussLow = skimage.filters.gaussian(img1, cutoff_low)
-        img2GaussLow = skimage.filters.gaussian(img2, cutoff_low)
-
-        # Calcul du filtre Gaussien (High-pass)
-        img1GaussHigh = img1 - skimage.filters.gaussian(img1, cutoff_high)
-        img2GaussHigh = img2 - skimage.filters.gaussian(img2, cutoff_high)
-
-        if DEBUG:
-            print(f"Valeur max filtre Gaussien img1GaussLow: {img1GaussLow.max()}, Min: {img1GaussLow.min()}")
-            print(f"Valeur max filtre Gaussien img2GaussLow: {img2GaussLow.max()}, Min: {img2GaussLow.min()}")
-            print(f"Valeur max filtre Gaussien img2GaussHigh: {img2GaussHigh.max()}, Min: {img2GaussHigh.min()}")
-            print(f"Valeur max filtre Gaussien img1GaussHigh: {img1GaussHigh.max()}, Min: {img1GaussHigh.min()}")
-
-        # Combiner les images Low-Pass et High-Pass
-        img1Low_2High = img1GaussLow + img2GaussHigh
-        img1High_2Low = img1GaussHigh + img2GaussLow
-
-        # Normaliser les images pour les mettre dans l'intervalle [0, 255]
-        img1Low_2High_clip255 = np.clip(img1Low_2High, 0, 1) * 255.0
-        img1High_2Low_clip255 = np.clip(img1High_2Low, 0, 1) * 255.0
-
-        # Convertir les images en uint8
-        img1Low_2High_uft8 = img1Low_2High_clip255.astype(np.uint8)
-        img1High_2Low_uft8 = img1High_2Low_clip255.astype(np.uint8)
-
-    # Si image de couleur
-    elif img1.ndim == 3 and img2.ndim == 3:
-        # Mettre les images en float64 pour les calculs
-        if img1.dtype != np.float64:
-            img1 = img1.astype(np.float64)
-        if img2.dtype != np.float64:
-            img2 = img2.astype(np.float64)
-        
-        # Normaliser les images si elles sont dans l'intervalle [0, 255]
-        if img1.max() > 1.0 and img1.max() <= 255.0:
-            img1 = img1 / 255.0
-        if img2.max() > 1.0 and img2.max() <= 255.0:
-            img2 = img2 / 255.0
-        
-        # Si l'image a un canal alpha (transparance), le mettre dans une variable et s'assurer qu'il est dans l'intervalle [0, 255]
-        alpha_img1 = None
-        alpha_img2 = None
-        
-        if img1.shape[2] == 4:
-            alpha_img1 = img1[:, :, 3]
-            img1 = img1[:, :, 0:3]
-            if alpha_img1.max() > 0.0 and alpha_img1.max() <= 1.0:
-                alpha_img1 = alpha_img1 * 255.0
-            alpha_img1 = np.clip(alpha_img1, 0, 255).astype(np.uint8)
-
-        if img2.shape[2] == 4:
-            alpha_img2 = img2[:, :, 3]
-            img2 = img2[:, :, 0:3]
-            if alpha_img2.max() > 0.0 and alpha_img2.max() <= 1.0:
-                alpha_img2 = alpha_img2 * 255.0
-            alpha_img2 = np.clip(alpha_img2, 0, 255).astype(np.uint8)
-
-
-        # Séparer les composantes de couleur
-        r_img1, g_img1, b_img1 = img1[:, :, 0], img1[:, :, 1], img1[:, :, 2]
-        r_img2, g_img2, b_img2 = img2[:, :, 0], img2[:, :, 1], img2[:, :, 2]
-
-        print(f"Image 1 :\n    Shape {img1.shape}\n    Type {img1.dtype}")
-        print(f"Image 2 :\n    Shape {img2.shape}\n    Type {img2.dtype}")
-
-        # Calcul du filtre Gaussien (Low-pass)
-        img1GaussLow = skimage.filters.gaussian(img1, cutoff_low)
-        img2GaussLow = skimage.filters.gaussian(img2, cutoff_low)
-
-        # Calcul du filtre Gaussien (Low-pass) pour chaque composante de couleur
-        r_img1GaussLow = skimage.filters.gaussian(r_img1, cutoff_low)
-        r_img2GaussLow = skimage.filters.gaussian(r_img2, cutoff_low)
-        g_img1GaussLow = skimage.filters.gaussian(g_img1, cutoff_low)
-        g_img2GaussLow = skimage.filters.gaussian(g_img2, cutoff_low)
-        b_img1GaussLow = skimage.filters.gaussian(b_img1, cutoff_low)
-        b_img2GaussLow = skimage.filters.gaussian(b_img2, cutoff_low)
-
-        # Calcul du filtre Gaussien (High-pass)
-        img1GaussHigh = img1 - skimage.filters.gaussian(img1, cutoff_high)
-        img2GaussHigh = img2 - skimage.filters.gaussian(img2, cutoff_high)
-
-        # Calcul du filtre Gaussien (High-pass) pour chaque composante de couleur
-        r_img1GaussHigh = r_img1 - skimage.filters.gaussian(r_img1, cutoff_high)
-        r_img2GaussHigh = r_img2 - skimage.filters.gaussian(r_img2, cutoff_high)
-        g_img1GaussHigh = g_img1 - skimage.filters.gaussian(g_img1, cutoff_high)
-        g_img2GaussHigh = g_img2 - skimage.filters.gaussian(g_img2, cutoff_high)
-        b_img1GaussHigh = b_img1 - skimage.filters.gaussian(b_img1, cutoff_high)
-        b_img2GaussHigh = b_img2 - skimage.filters.gaussian(b_img2, cutoff_high)
-
-        if DEBUG:
-            print(f"Valeur max filtre Gaussien img1GaussLow: {img1GaussLow.max()}, Min: {img1GaussLow.min()}")
-            print(f"Valeur max filtre Gaussien img2GaussLow: {img2GaussLow.max()}, Min: {img2GaussLow.min()}")
-            print(f"Valeur max filtre Gaussien img2GaussHigh: {img2GaussHigh.max()}, Min: {img2GaussHigh.min()}")
-            print(f"Valeur max filtre Gaussien img1GaussHigh: {img1GaussHigh.max()}, Min: {img1GaussHigh.min()}")
-
-        # Combiner les images Low-Pass et High-Pass
-        r_img1Low_2High = r_img1GaussLow + r_img2GaussHigh
-        r_img1High_2Low = r_img1GaussHigh + r_img2GaussLow
-        g_img1Low_2High = g_img1GaussLow + g_img2GaussHigh
-        g_img1High_2Low = g_img1GaussHigh + g_img2GaussLow
-        b_img1Low_2High = b_img1GaussLow + b_img2GaussHigh
-        b_img1High_2Low = b_img1GaussHigh + b_img2GaussLow
-
-        # Faire l'image de couleur (image 1 Low-Pass + image 2 High-Pass)
-        img1Low_2High = (np.stack((r_img1Low_2High, g_img1Low_2High, b_img1Low_2High), axis=2))
-
-        # Faire l'image de couleur (image 1 High-Pass + image 2 Low-Pass)
-        img1High_2Low = (np.stack((r_img1High_2Low, g_img1High_2Low, b_img1High_2Low), axis=2))
-
-        # Normaliser les images pour les mettre dans l'intervalle [0, 255]
-        img1Low_2High_clip255 = np.clip(img1Low_2High, 0, 1) * 255.0
-        img1High_2Low_clip255 = np.clip(img1High_2Low, 0, 1) * 255.0
-
-        # Convertir les images en uint8
-        img1Low_2High_uft8 = img1Low_2High_clip255.astype(np.uint8)
-        img1High_2Low_uft8 = img1High_2Low_clip255.astype(np.uint8)
-
-        # Remettre le canal alpha si les images originales en avaient un
-        if alpha_img1 is not None:
-            img1Low_2High_uft8 = np.dstack((img1Low_2High_uft8, alpha_img1))
-            img1High_2Low_uft8 = np.dstack((img1High_2Low_uft8, alpha_img1))
-        if alpha_img2 is not None:
-            img1Low_2High_uft8 = np.dstack((img1Low_2High_uft8, alpha_img2))
-            img1High_2Low_uft8 = np.dstack((img1High_2Low_uft8, alpha_img2))
-
-    else:
+    # Retourne l'hybride image 1 Low-pass + image 2 High-pass (uint8).
+    # les_deux=True: retourne (low1 + high2, high1 + low2), calculés avec les mêmes flous.
+    # bank (optionnel): BlurBank partagée, pour ne jamais refaire le même flou dans un sweep
+
+    if not ((im1.ndim == 2 and im2.ndim == 2) or (im1.ndim == 3 and im2.ndim == 3)):
+        raise ValueError("Les images doivent être soit en gris (2D) soit en couleur (3D)")
+
+    with span("preparation", octets=im1.nbytes + im2.nbytes):
+        img1, alpha_img1 = _preparer(im1)
+        img2, alpha_img2 = _preparer(im2)
+
+    print(f"Image 1 :\n    Shape {img1.shape}\n    Type {img1.dtype}")
+    print(f"Image 2 :\n    Shape {img2.shape}\n    Type {img2.dtype}")
+
+    flous = {}
+
+    def flou(im, img, sigma):
+        # Tous les canaux en un seul appel; chaque (image, sigma) une seule fois par appel
+        # im: image d'origine (clé de la banque), img: sa version float [0,1] sans alpha
+        cle = (id(im), float(sigma))
+        if cle not in flous:
+            if bank is not None:
+                flous[cle] = bank.flou(im, sigma, mode="rgb")
+            else:
+                flous[cle] = gaussian(img, sigma, channel_axis=-1 if img.ndim == 3 else None)
+        return flous[cle]
+
+    # Seulement les composantes nécessaires aux sorties demandées
+    with span("filtre", octets=img1.nbytes + img2.nbytes, low=cutoff_low, high=cutoff_high):
+        img1GaussLow = flou(im1, img1, cutoff_low)
+        img2GaussHigh = img2 - flou(im2, img2, cutoff_high)
+
+    # Combiner les images Low-Pass et High-Pass (image 1 Low-Pass + image 2 High-Pass)
+    with span("combinaison", octets=img1GaussLow.nbytes + img2GaussHigh.nbytes):
+        img1Low_2High_uft8 = _en_uint8(img1GaussLow + img2GaussHigh, (alpha_img1, alpha_img2))
+
+    if not les_deux:
+        return img1Low_2High_uft8
+
+    with span("filtre", octets=img1.nbytes + img2.nbytes, low=cutoff_low, high=cutoff_high):
+        img2GaussLow = flou(im2, img2, cutoff_low)
+        img1GaussHigh = img1 - flou(im1, img1, cutoff_high)
+
+    # Image 1 High-Pass + image 2 Low-Pass
+    with span("combinaison", octets=img2GaussLow.nbytes + img1GaussHigh.nbytes):
+        img1High_2Low_uft8 = _en_uint8(img1GaussHigh + img2GaussLow, (alpha_img1, alpha_img2))
+
+    return img1Low_2High_uft8, img1High_2Low_uft8
+
+
+def forme_hybride(im1, im2):
+    # Forme de l'hybride uint8: canaux de couleur + un canal alpha par image qui en a un
+    if im1.ndim == 2:
+        return im1.shape
+    n_alpha = sum(1 for im in (im1, im2) if im.shape[2] == 4)
+    return (*im1.shape[:2], 3 + n_alpha)
+
+
+def hybrid_image_tuiles(im1, im2, cutoff_low, cutoff_high, sortie=None, taille=TAILLE_TUILE):
+    # Même résultat que hybrid_image(im1, im2, cutoff_low, cutoff_high), calculé tuile
+    # par tuile (voir tuiles.py) pour les images plus grandes que la RAM.
+    # im1, im2: typiquement des memmap uint8 (Scratch.image()); sortie: memmap uint8
+    # (Scratch.tableau()), sinon allouée en mémoire.
+
+    if not ((im1.ndim == 2 and im2.ndim == 2) or (im1.ndim == 3 and im2.ndim == 3)):
         raise ValueError("Les images doivent être soit en gris (2D) soit en couleur (3D)")
 
-    return img1Low_2High_uft8
+    # Normalisation décidée sur l'image entière (comme _preparer), pas sur chaque tuile
+    echelles = [echelle_01(maximum_par_tuiles(im[..., :3] if im.ndim == 3 else im)) for im in (im1, im2)]
+
+    if sortie is None:
+        sortie = np.empty(forme_hybride(im1, im2), dtype=np.uint8)
+
+    def tuile(t1, t2):
+        img1, alpha_img1 = _preparer(t1, echelle=echelles[0])
+        img2, alpha_img2 = _preparer(t2, echelle=echelles[1])
+        channel_axis = -1 if img1.ndim == 3 else None
+
+        img1GaussLow = gaussian(img1, cutoff_low, channel_axis=channel_axis)
+        img2GaussHigh = img2 - gaussian(img2, cutoff_high, channel_axis=channel_axis)
+        return _en_uint8(img1GaussLow + img2GaussHigh, (alpha_img1, alpha_img2))
+
+    halo = halo_gaussien(max(cutoff_low, cutoff_high))
+    appliquer_par_tuiles(tuile, [im1, im2], [sortie], halo=halo, taille=taille)
+    return sortie
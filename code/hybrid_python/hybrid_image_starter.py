@@ -1,12 +1,17 @@
+# Depuis le dossier code: python -m hybrid_python.hybrid_image_starter
+from pathlib import Path
+
 from imageio import imread
-from align_images import align_images
-from crop_image import crop_image
-from hybrid_image import hybrid_image
-from stacks import stacks
+from hybrid_python.align_images import align_images
+from hybrid_python.crop_image import crop_image
+from hybrid_python.hybrid_image import hybrid_image
+from hybrid_python.stacks import stacks
+
+DOSSIER = Path(__file__).resolve().parent
 
 # read images
-im1 = imread('./Marilyn_Monroe.png', pilmode='L')
-im2 = imread('./Albert_Einstein.png', pilmode='L')
+im1 = imread(DOSSIER / 'Marilyn_Monroe.png', pilmode='L')
+im2 = imread(DOSSIER / 'Albert_Einstein.png', pilmode='L')
 
 # use this if you want to align the two images (e.g., by the eyes) and crop
 # them to be of same size
@@ -1,178 +1,266 @@
-import skimage
 import pathlib
 import numpy as np
-import sys
-import matplotlib.pyplot as plt
 
+from accentuation import accentuation_sigmas, accentuation_tuiles
+from fichiers_image import bilan_ecritures, ecrire_image, extension, get_encodage, lire_image
+from gauss_backend import gaussian
+from manifeste import Manifeste, empreinte_fichier, signature, version_code
+from montage import montage, reduction_pour
+from precision import dtype_calcul, get_precision
+from sweep import cache_worker, decouper, executer_sweep, nombre_workers
+from traces import span
+from tuiles import Scratch
+from writer import ImageWriter
 
-# Vérifier si on veux print dans le terminal des lignes de debug
-#DEBUG = True
-DEBUG = False
 
 # Vérifier si on veut faire plein de png pour faire un vidéo dans Blender
 VIDEO = False
 #VIDEO = True
 
-# Insérer les chemins vers les images
-img_1_path = pathlib.Path("web/images/data/Iris.png")
-img_2_path = pathlib.Path("web/images/data/Optimus.png")
+# Nombre de processus pour le sweep des sigmas (None = tous les coeurs, 1 = séquentiel)
+N_WORKERS = None
 
-# Vérifier que les fichiers existent
-for p in (img_1_path, img_2_path):
-    if not p.is_file():
-        print(f"ERREUR: fichier introuvable -> {p.resolve()}")
-        sys.exit(1)   # stop le programme avec code d’erreur
+# Images plus grandes que la RAM: calcul par tuiles dans des memmap (voir tuiles.py), sans montage
+TUILES = False
 
-img_1_name = img_1_path.stem
-img_2_name = img_2_path.stem
+# Mode tuiles: sigmas calculés par lots (mémoire et memmap de sortie bornés, même en mode vidéo)
+SIGMAS_PAR_LOT = 8
 
-img_1_uft8 = skimage.io.imread(img_1_path)
-img_2_uft8 = skimage.io.imread(img_2_path)
+# Dossier des PNG accentués et des montages
+OUT_DIR = pathlib.Path("web/images/accentuation")
 
-# Convertir les images en float64 pour les calculs
-img_1 = img_1_uft8.astype(np.float64) / 255.0
-img_2 = img_2_uft8.astype(np.float64) / 255.0
+# Sigmas du balayage par défaut
+SIGMAS = [0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5]
 
-alpha_img_1 = None
-alpha_img_2 = None
+# Largeur max du montage des sigmas (tuiles réduites d'un facteur entier au besoin)
+LARGEUR_MONTAGE = 4096
 
-# Si l'image a un canal alpha (transparance), le supprimer
-if img_1.shape[2] == 4:
-    alpha_img_1 = img_1_uft8[:, :, 3]
-    img_1 = img_1[:, :, 0: 3]
-if img_2.shape[2] == 4:
-    alpha_img_2 = img_2_uft8[:, :, 3]
-    img_2 = img_2[:, :, 0: 3]
-
-# Séparer les composantes de couleur
-r_img_1, g_img_1, b_img_1 = img_1[:, :, 0], img_1[:, :, 1], img_1[:, :, 2]
-r_img_2, g_img_2, b_img_2 = img_2[:, :, 0], img_2[:, :, 1], img_2[:, :, 2]
-
-print(f"Image 1 {img_1_name} :\n    Shape {img_1.shape}\n    Type {img_1.dtype}")
-print(f"Image 2 {img_2_name} :\n    Shape {img_2.shape}\n    Type {img_2.dtype}")
+# Sources qui influencent les PNG (pour le manifeste de build)
+SOURCES = ("main_accentuation.py", "accentuation.py", "gauss_backend.py", "precision.py", "writer.py")
 
 def filtre_Gauss(image, sig):
-    # Calcul du filtre Gaussien
-    img = skimage.filters.gaussian(image, sig)
-    
-    if DEBUG:
-        print(f"Valeur max filtre Gaussien: {img.max()}, Min: {img.min()}")
+    # Calcul du filtre Gaussien (spatial ou FFT selon sigma)
+    with span("filtre", octets=image.nbytes, sigma=sig):
+        img = gaussian(image, sig)
     return img
 
 def accentuation(image, sigma):
     # Appliquer le filtre Gaussien à l'image
     img_flou = filtre_Gauss(image, sigma)
-    details = image - img_flou
-    img_sharp = image + sigma*details
-
-    if DEBUG:
-        print(f"Valeur max sharpening: {img_sharp.max()}, Min: {img_sharp.min()}")
+    with span("combinaison", octets=image.nbytes, sigma=sigma):
+        details = image - img_flou
+        img_sharp = image + sigma*details
     return img_sharp
 
-# Appliquer l'accentuation à chaque composante de couleur
-listNoms = ['1', '2']
-#listCouleurs = ['r', 'g', 'b']
-sigma = [0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5]
-
-if VIDEO:
-    sigma = list(np.arange(0, 5.0, 0.01))
-
-images_1 = []
-images_2 = []
-
-count = 0
-
-for j in sigma:
-    count += 1
-    for i in listNoms:
-
-        img_name = eval(f"img_{i}_name")
-
-        if VIDEO == False:
-            print(f"\n-------------{img_name}-------------")
-        
-        img_r = accentuation(eval(f"r_img_{i}"), j)
-        img_g = accentuation(eval(f"g_img_{i}"), j)
-        img_b = accentuation(eval(f"b_img_{i}"), j)
-        img_sharp = (np.stack((img_r, img_g, img_b), axis=2)) * 255.0
-
-        img_sharp_uft8 = np.clip(img_sharp, 0, 255).astype(np.uint8)
-
-        if eval(f"alpha_img_{i}") is not None:
-            img_sharp_uft8 = np.dstack((img_sharp_uft8, eval(f"alpha_img_{i}")))
-
-        if DEBUG:
-            print(f"Valeur max: {img_sharp_uft8.max()}, Min: {img_sharp_uft8.min()}")
-            print(f"\nImage {i} {eval(f'img_{i}_name')} accentuée :\n    Shape {img_sharp_uft8.shape}\n    Type {img_sharp_uft8.dtype}")
-
-        if VIDEO == True:
-            # Sauvegarder l'image accentuée
-            skimage.io.imsave(f"web/images/accentuation/video/{img_name}_sigma_{count}.png", img_sharp_uft8)
-
-            img_path = pathlib.Path(f"web/images/accentuation/video/{img_name}_sigma_{count}.png")
-
-        if VIDEO == False:
-            # Sauvegarder l'image accentuée
-            skimage.io.imsave(f"web/images/accentuation/{img_name}_sigma_{j}.png", img_sharp_uft8)
-
-            img_path = pathlib.Path(f"web/images/accentuation/{img_name}_sigma_{j}.png")
-
-            if img_path.exists():
-                print(f"Image accentuée {img_name}_sigma_{j}.png sauvegardée avec succès.")
-            else:
-                print(f"Erreur lors de la sauvegarde de l'image accentuée {img_name}_sigma_{j}.png.")
-
-            # Ajouter l'image accentuée à la liste pour l'affichage
-            if i == '1':
-                images_1.append(img_sharp_uft8)
-            
-            elif i == '2':
-                images_2.append(img_sharp_uft8)
+def accentuer_bloc(entrees, params):
+    # Worker du sweep: une image, un bloc contigu de (sigma, chemin de sortie).
+    # Tous les sigmas et les 3 canaux en un seul passage: chaque flou est construit
+    # à partir du précédent (voir accentuation.py)
+    i, bloc = params
+    img, alpha = entrees[i]
+    writer = cache_worker("writer", ImageWriter)
+
+    sorties = []
+    sigmas = [j for j, _ in bloc]
+    for (j, img_sharp), (_, chemin) in zip(accentuation_sigmas(img, sigmas, channel_axis=-1), bloc):
+        with span("conversion", octets=img_sharp.nbytes, sigma=j):
+            img_sharp = img_sharp * 255.0
+
+            img_sharp_uft8 = np.clip(img_sharp, 0, 255).astype(np.uint8)
+
+            if alpha is not None:
+                img_sharp_uft8 = np.dstack((img_sharp_uft8, alpha))
+
+        # Sauvegarder l'image accentuée (encodage PNG en arrière-plan)
+        writer.soumettre(chemin, img_sharp_uft8)
+
+        # Pour le montage, seulement hors mode vidéo (sinon trop d'images à renvoyer)
+        sorties.append(None if VIDEO else img_sharp_uft8)
+
+    # Résultat de chaque écriture (remplace la vérification img_path.exists())
+    ecritures = writer.flush()
+    return [(str(r.chemin), r.ok, r.erreur, img) for r, img in zip(ecritures, sorties)]
+
+
+def chemins_sorties(img_name, sigma, out_dir=OUT_DIR):
+    # Noms des images de sortie (mode vidéo: numérotés pour Blender)
+    out_dir, ext = pathlib.Path(out_dir).as_posix(), extension()
+    if VIDEO == True:
+        return [f"{out_dir}/video/{img_name}_sigma_{count}{ext}" for count in range(1, len(sigma) + 1)]
+    return [f"{out_dir}/{img_name}_sigma_{j}{ext}" for j in sigma]
+
+
+def signatures_sorties(img_path, sigma, tuiles=False):
+    # Signature de chaque image accentuée: contenu de l'image, sigma, mode (tuiles: flous directs,
+    # à 1 niveau uint8 près du mode en mémoire), précision, encodage, version du code
+    base = dict(entree=empreinte_fichier(img_path), tuiles=tuiles, precision=get_precision(),
+                encodage=get_encodage(), code=version_code(*SOURCES))
+    return [signature(sigma=float(j), **base) for j in sigma]
+
+
+def a_regenerer(manifeste, chemins, sigs):
+    # Indices des sorties manquantes, modifiées ou calculées avec d'autres paramètres
+    return [k for k, (c, s) in enumerate(zip(chemins, sigs)) if not manifeste.a_jour(c, s)]
+
+
+def accentuer_par_tuiles(chemins, sigma, manifeste, out_dir=OUT_DIR):
+    # Mode tuiles: chaque image est décodée une fois vers un memmap uint8, puis les
+    # accentuations sont calculées tuile par tuile, par lots de SIGMAS_PAR_LOT sigmas:
+    # les memmap de sortie d'un lot sont réutilisés par le suivant une fois écrits
+    with Scratch() as scratch:
+        for chemin in chemins:
+            print(f"\n-------------{chemin.stem}-------------")
+            chemins_png = chemins_sorties(chemin.stem, sigma, out_dir)
+            sigs = signatures_sorties(chemin, sigma, tuiles=True)
+            a_faire = a_regenerer(manifeste, chemins_png, sigs)
+            if not a_faire:
+                print("Images accentuées à jour (rien à régénérer).")
+                continue
+
+            with span("chargement", fichier=chemin.name):
+                img = scratch.image(chemin)
+            sorties = [scratch.tableau(f"sigma_{k}", img.shape, np.uint8)
+                       for k in range(min(SIGMAS_PAR_LOT, len(a_faire)))]
+            for debut in range(0, len(a_faire), SIGMAS_PAR_LOT):
+                lot = a_faire[debut : debut + SIGMAS_PAR_LOT]
+                accentuation_tuiles(img, [sigma[k] for k in lot], sorties[: len(lot)])
+
+                # Écritures terminées avant de réutiliser (ou supprimer) les memmap
+                # (close() lève ErreurEcriture si une écriture a échoué)
+                with ImageWriter() as writer:
+                    for k, sortie in zip(lot, sorties):
+                        writer.soumettre(chemins_png[k], sortie)
+                for k in lot:
+                    manifeste.enregistrer(chemins_png[k], sigs[k])
+                    if VIDEO == False:
+                        print(f"Image accentuée {pathlib.Path(chemins_png[k]).name} sauvegardée avec succès.")
 
 
-# Code fait par ChatGPT pour afficher les images accentuées
 def save_sigma_montage(images, sigmas, out_path, title=None):
-    """Sauvegarde un montage 1xN d'images, avec σ écrit sous chaque image."""
-    n = len(sigmas)
-
-    # Un peu plus haut pour laisser la place au texte plus gros
-    fig, axes = plt.subplots(1, n, figsize=(4*n, 4.4))
-
-    # si n==1, axes n'est pas itérable
-    if n == 1:
-        axes = [axes]
-
-    for ax, s, im in zip(axes, sigmas, images):
-        ax.imshow(im)
-        ax.axis("off")
-        ax.text(
-            0.5, -0.07, f"σ = {s}",
-            transform=ax.transAxes,
-            ha="center", va="top",
-            fontsize=26  # <-- plus gros
-        )
-
-    if title is not None:
-        fig.suptitle(title)
-
-    # Réduire l'espace entre sous-plots + marges
-    fig.subplots_adjust(left=0.0, right=1.0, top=0.92, bottom=0.06, wspace=0.0)
-
-    # Tight layout avec petit padding (optionnel mais aide)
-    plt.tight_layout(pad=0.2)
-
-    fig.savefig(out_path, dpi=200, bbox_inches="tight")
-    plt.close(fig)
-
-if VIDEO == False:
-    save_sigma_montage(
-        images_1, sigma,
-        f"web/images/accentuation/montage_{img_1_name}.png",
-        title=img_1_name
-    )
-
-    save_sigma_montage(
-        images_2, sigma,
-        f"web/images/accentuation/montage_{img_2_name}.png",
-        title=img_2_name
-    )
+    # Montage 1xN d'images, avec σ écrit sous chaque image (canevas numpy, voir montage.py)
+    reduction = reduction_pour(images[0].shape[1], len(images), LARGEUR_MONTAGE)
+    canevas = montage(images, n_cols=len(images), etiquettes=[f"σ = {s}" for s in sigmas],
+                      titre=title, pad=8, fond=255, reduction=reduction)
+    ecrire_image(out_path, canevas)
+
+
+def accentuer(chemins_images, sigma=SIGMAS, out_dir=OUT_DIR, lire=lire_image, n_workers=N_WORKERS):
+    # Accentuation de chaque image pour chaque sigma + un montage par image.
+    # lire(chemin) -> image uint8 (le mode batch passe un lecteur qui garde les images décodées)
+    chemins_images = [pathlib.Path(p) for p in chemins_images]
+
+    # Vérifier que les fichiers existent
+    for p in chemins_images:
+        if not p.is_file():
+            raise FileNotFoundError(f"fichier introuvable -> {p.resolve()}")
+
+    # Manifeste de build: seules les sorties périmées sont recalculées
+    manifeste = Manifeste()
+
+    if TUILES:
+        accentuer_par_tuiles(chemins_images, sigma, manifeste, out_dir)
+        manifeste.sauver()
+        return
+
+    noms = [p.stem for p in chemins_images]
+
+    entrees = []
+    for k, p in enumerate(chemins_images, start=1):
+        with span("chargement", fichier=p.name):
+            img_uft8 = lire(p)
+
+        # Convertir l'image en float (précision du pipeline) pour les calculs
+        img = img_uft8.astype(dtype_calcul()) / 255.0
+
+        # Si l'image a un canal alpha (transparance), le supprimer
+        alpha = None
+        if img.ndim == 3 and img.shape[2] == 4:
+            alpha = img_uft8[:, :, 3]
+            img = img[:, :, 0: 3]
+
+        print(f"Image {k} {p.stem} :\n    Shape {img.shape}\n    Type {img.dtype}")
+        entrees.append((img, alpha))
+
+    # Sweep sur un pool de processus: chaque image est coupée en blocs contigus de sigmas
+    # (un bloc = un seul flou complet, puis des flous incrémentaux)
+    n_workers = nombre_workers(n_workers, len(entrees) * len(sigma))
+    n_blocs = -(-n_workers // len(entrees))
+
+    taches = []
+    sigs = []
+    chemins = []
+    for i, p in enumerate(chemins_images):
+        chemins.append(chemins_sorties(noms[i], sigma, out_dir))
+        sigs.append(signatures_sorties(p, sigma))
+
+        # Seulement les sigmas dont la sortie n'est pas à jour
+        a_faire = [(sigma[k], chemins[i][k]) for k in a_regenerer(manifeste, chemins[i], sigs[i])]
+        for bloc in decouper(a_faire, n_blocs):
+            if bloc:
+                taches.append((i, bloc))
+
+    resultats = executer_sweep(accentuer_bloc, taches, entrees=entrees, max_workers=n_workers)
+
+    # Images calculées à ce passage, par chemin (pour le montage)
+    calculees = {}
+    nom_prec = None
+    for (i, _), sorties in zip(taches, resultats):
+        if VIDEO == False and noms[i] != nom_prec:
+            print(f"\n-------------{noms[i]}-------------")
+        nom_prec = noms[i]
+
+        for chemin, ok, erreur, img_sharp_uft8 in sorties:
+            nom_fichier = pathlib.Path(chemin).name
+            if not ok:
+                print(f"Erreur lors de la sauvegarde de l'image accentuée {nom_fichier}: {erreur}")
+                manifeste.oublier(chemin)
+                continue
+            manifeste.enregistrer(chemin, sigs[i][chemins[i].index(chemin)])
+            if VIDEO == True:
+                continue
+
+            print(f"Image accentuée {nom_fichier} sauvegardée avec succès.")
+            calculees[chemin] = img_sharp_uft8
+
+    if not taches:
+        print("\nImages accentuées à jour (rien à régénérer).")
+
+    if VIDEO == False:
+        for i, nom in enumerate(noms):
+            montage_path = f"{pathlib.Path(out_dir).as_posix()}/montage_{nom}{extension()}"
+            sig_montage = signature(images=sigs[i], sigma=[float(j) for j in sigma],
+                                    code=version_code("montage.py"))
+            if manifeste.a_jour(montage_path, sig_montage):
+                continue
+
+            # Les images à jour sont relues du disque (pas recalculées)
+            images = []
+            for chemin in chemins[i]:
+                if chemin not in calculees and pathlib.Path(chemin).is_file():
+                    calculees[chemin] = lire_image(chemin)
+                images.append(calculees.get(chemin))
+            if any(im is None for im in images):
+                # Une écriture a échoué: montage au prochain passage
+                continue
+
+            save_sigma_montage(images, sigma, montage_path, title=nom)
+            manifeste.enregistrer(montage_path, sig_montage)
+
+    manifeste.sauver()
+
+
+def main():
+    # Insérer les chemins vers les images
+    img_1_path = pathlib.Path("web/images/data/Iris.png")
+    img_2_path = pathlib.Path("web/images/data/Optimus.png")
+
+    sigma = SIGMAS
+    if VIDEO:
+        sigma = list(np.arange(0, 5.0, 0.01))
+
+    with bilan_ecritures("accentuation"):
+        accentuer([img_1_path, img_2_path], sigma, n_workers=N_WORKERS)
+
+
+if __name__ == "__main__":
+    main()
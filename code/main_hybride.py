@@ -1,121 +1,217 @@
-import os
-import sys
+from contextlib import suppress
 from pathlib import Path
 
 import numpy as np
-import matplotlib.pyplot as plt
-from skimage.io import imread, imsave
-import skimage.filters
-import numpy as np
-
-HYBRID_DIR = Path(__file__).resolve().parent / "hybrid_python"
-sys.path.insert(0, str(HYBRID_DIR))
-
-from align_images import align_images
-from crop_image import crop_image
-from hybrid_image import hybrid_image
-
-def crop_to_overlap(im1, im2, thr=0.0, pad=2):
-    # Crop im1 et im2 à la zone où les deux ont des pixels valides (non-noirs).
-    # Seuil pour considérer un pixel valide (0.0 ok si images float; sinon mets 1)
-    # Petite marge pour éviter de crop trop serré
-
-    a = im1.astype(np.float64)
-    b = im2.astype(np.float64)
-
-    # Masques de validité (en gris: a.ndim==2)
-    if a.ndim == 2:
-        m1 = a > thr
-        m2 = b > thr
-    else:
-        # couleur valide si au moins 1 canal
-        m1 = np.any(a > thr, axis=2)
-        m2 = np.any(b > thr, axis=2)
-
-    m = m1 & m2
-    ys, xs = np.where(m)
-
-    # Si jamais le masque est vide, on retourne tel quel
-    if len(ys) == 0 or len(xs) == 0:
-        return im1, im2
-
-    y0, y1 = ys.min(), ys.max()
-    x0, x1 = xs.min(), xs.max()
-
-    # pad + clamp
-    y0 = max(y0 - pad, 0)
-    x0 = max(x0 - pad, 0)
-    y1 = min(y1 + pad, im1.shape[0] - 1)
-    x1 = min(x1 + pad, im1.shape[1] - 1)
-
-    return im1[y0:y1+1, x0:x1+1], im2[y0:y1+1, x0:x1+1]
-
-def mettre_float01(img):
-    # Convertit en float [0,1] (accepte uint8 ou float)
-    x = img.astype(np.float64, copy=False)
-    if x.max() > 1.0:
-        x = x / 255.0
-    return np.clip(x, 0.0, 1.0)
-
-def to_gray(img):
-    # Retourne une image 2D (gris) peu importe l'entrée (gris/RGB/RGBA)
-    if img.ndim == 2:
-        return img
-    rgb = img[:, :, :3].astype(np.float64)
-    # Luminance classique
-    return 0.2989 * rgb[:, :, 0] + 0.5870 * rgb[:, :, 1] + 0.1140 * rgb[:, :, 2]
-
 
+from blur_bank import BlurBank
+from conversions import mettre_float01, to_gray
+from fichiers_image import bilan_ecritures, extension, get_encodage, lire_image
+from hybrid_python.cache_alignement import aligner_avec_cache, relire, transportable
+from hybrid_python.hybrid_image import forme_hybride, hybrid_image, hybrid_image_tuiles
+from manifeste import Manifeste, empreinte_tableau, signature, version_code
+from montage import Planche, reduction_pour
+from precision import get_precision
+from spectre import amplitude_u8, deplier, imsave_spectre, log_amplitude, rfft2_reel
+from sweep import cache_worker, executer_sweep
+from traces import span, trace
+from tuiles import Scratch
+from writer import ErreurEcriture, ImageWriter
+
+# Nombre de processus pour le sweep des cutoffs (None = tous les coeurs, 1 = séquentiel)
+N_WORKERS = None
+
+# Limite mémoire de la banque de flous de chaque worker
+BANK_MAX_BYTES = 512 * 1024**2
+
+# Alignement automatique (corrélation de phase, sans clics) pour les lots sans surveillance.
+# Fiable quand les deux images ont un contenu semblable; sinon garder les clics.
+ALIGN_AUTO = False
+
+# Alignement (points, transformation, paire alignée) gardé dans .cache/alignement,
+# clé = contenu des deux images: pas de clics ni de rééchantillonnage aux exécutions suivantes
+CACHE_ALIGNEMENT = True
+
+# Images plus grandes que la RAM: hybrides calculés par tuiles dans un memmap (voir tuiles.py),
+# en séquence et sans les amplitudes FFT (une FFT de l'image entière)
+TUILES = False
+
+# Paires d'images du TP (la paire du rapport: T3)
+PAIRES = {
+    "T1": (Path("code/hybrid_python/Albert_Einstein.png"), Path("code/hybrid_python/Marilyn_Monroe.png")),
+    "T2": (Path("web/images/data/Capitaine.png"), Path("web/images/data/Thor.png")),
+    "T3": (Path("web/images/data/Tony.png"), Path("web/images/data/Pat.png")),
+}
+
+OUT_DIR = Path("web/images/hybrid")
+OUT_AMP_DIR = OUT_DIR / "amplitude"
+
+# Valeurs de cutoff
+CUTOFF_LOWS = [1.0, 2.0, 3.0, 4.0, 5.0, 7.0, 10.0, 15.0]
+CUTOFF_HIGHS = [1.0, 2.0, 3.0, 4.0, 5.0, 7.0, 10.0, 15.0]
+
+# Planche de tous les combos (lignes: cutoff low, colonnes: cutoff high), largeur max
+LARGEUR_PLANCHE = 2048
+
+# Sources qui influencent les PNG (pour le manifeste de build)
+SOURCES = ("main_hybride.py", "blur_bank.py", "conversions.py", "gauss_backend.py", "precision.py",
+           "spectre.py", "tuiles.py", "writer.py", "hybrid_python/hybrid_image.py")
+
+@trace("spectre")
 def fft_log_amplitude(imageGris):
-    # Amplitude log de la FFT2
+    # Amplitude log de la FFT2, centrée (comme fftshift), dépliée depuis la rfft2
     g = mettre_float01(to_gray(imageGris))
 
-    return np.log(np.abs(np.fft.fftshift(np.fft.fft2(g))) + 1e-8)
+    # scipy.fft garde la précision de l'entrée (float32 -> complex64)
+    return deplier(log_amplitude(rfft2_reel(g)), g.shape[1])
 
 
-def save_amplitude_image(imageGris, out_path):
-    # Sauvegarde une image (PNG) de l’amplitude log FFT2, normalisée pour affichage
-    amp = fft_log_amplitude(imageGris)
+def save_spectre(demi, largeur, out_path, writer=None):
+    # Sauvegarde une image (PNG gris 8 bits) de l'amplitude log d'un demi-spectre rfft2,
+    # normalisée pour affichage (sinon c'est trop sombre/bright)
+    with span("spectre", octets=demi.nbytes, fichier=out_path.name):
+        demi_u8 = amplitude_u8(demi)
 
-    # normaliser pour sauvegarde (0..1) sinon c'est trop sombre/bright
-    amin, amax = amp.min(), amp.max()
-    if np.isclose(amax - amin, 0.0):
-        amp_norm = np.zeros_like(amp)
-    else:
-        amp_norm = (amp - amin) / (amax - amin)
+    # Encodage (et dépliage) en arrière-plan si un writer est fourni
+    if writer is not None:
+        return writer.soumettre(out_path, demi_u8, imsave_spectre, largeur=largeur)
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    plt.imsave(str(out_path), amp_norm, cmap="gray")
+    imsave_spectre(out_path, demi_u8, largeur)
 
 
-def main():
-    # Aller cherhcher les images dans le dossier "code/hybrid_python"
-    #img1_path = Path("code/hybrid_python/Albert_Einstein.png")
-    #img2_path = Path("code/hybrid_python/Marilyn_Monroe.png")
-    #img1_path = Path("web/images/data/Capitaine.png")
-    #img2_path = Path("web/images/data/Thor.png")
-    img1_path = Path("web/images/data/Tony.png")
-    img2_path = Path("web/images/data/Pat.png")
-
-    out_dir = Path("web/images/hybrid")
-    out_amp_dir = Path("web/images/hybrid/amplitude")
+def save_amplitude_image(imageGris, out_path, writer=None):
+    # Sauvegarde une image (PNG) de l’amplitude log FFT2 d'une image
+    g = mettre_float01(to_gray(imageGris))
+    return save_spectre(rfft2_reel(g), g.shape[1], out_path, writer=writer)
+
+
+def sorties_combo(out_dir, out_amp_dir, low, high, tuiles=False):
+    # Les 4 images d'un combo: hybride + amplitudes FFT (low, high, hybride); l'hybride seul en mode tuiles
+    tag, ext = f"{low}_{high}", extension()
+    hybride = [out_dir / f"hybrid_cutoff{tag}{ext}"]
+    if tuiles:
+        return hybride
+    return hybride + [out_amp_dir / f"amp_{nom}_cutoff{tag}{ext}" for nom in ("low", "high", "hybrid")]
+
+
+def planche_cutoffs(out_dir, cutoff_lows, cutoff_highs, taille, lire=lire_image):
+    # Planche de contact des hybrides: une case par combo, relue du disque une à une
+    # et réduite directement dans le canevas (un seul hybride en mémoire à la fois)
+    n_cols = len(cutoff_highs)
+    planche = None
+    for k, (low, high) in enumerate((l, h) for l in cutoff_lows for h in cutoff_highs):
+        hyb = lire(out_dir / f"hybrid_cutoff{low}_{high}{extension()}")
+        if planche is None:
+            planche = Planche(len(cutoff_lows) * n_cols, n_cols, taille,
+                              canaux=min(hyb.shape[2], 4) if hyb.ndim == 3 else 0, pad=8, fond=255,
+                              reduction=reduction_pour(taille[1], n_cols, LARGEUR_PLANCHE),
+                              etiquettes=True, titre="cutoff low / high")
+        planche.placer(k, hyb, f"{low:g} / {high:g}")
+    return planche.canevas
+
+
+def generer_combo(entrees, params):
+    # Worker du sweep: un hybride + ses 3 amplitudes FFT pour un combo (low, high).
+    # Les noms de fichiers dépendent seulement du combo -> sortie déterministe.
+    low, high = params
+    # Paire alignée relue en memmap (une fois par worker) si elle vient du cache
+    im1_cropped = cache_worker("im1", lambda: relire(entrees["im1"]))
+    im2_cropped = cache_worker("im2", lambda: relire(entrees["im2"]))
+    out_dir, out_amp_dir = entrees["out_dir"], entrees["out_amp_dir"]
+
+    # Banque de flous du worker, partagée par hybrid_image() et les FFT d'amplitude:
+    # chaque (image, gris/couleur, sigma) distinct n'est calculé qu'une fois par worker
+    bank = cache_worker("bank", lambda: BlurBank(max_bytes=BANK_MAX_BYTES, sigma_max=entrees["sigma_max"]))
+    # PNG encodés en arrière-plan pendant que le worker calcule la suite
+    writer = cache_worker("writer", ImageWriter)
+
+    print(f"Génère hybrid: cutoff_low={low}, cutoff_high={high}")
+
+    # Hybride via ma fonction (pour l'image à sauvegarder)
+    hyb_u8 = hybrid_image(im1_cropped, im2_cropped, low, high, bank=bank)
+    #hyb_u8 = crop_image(hyb_u8)
+
+    if hyb_u8.dtype != np.uint8:
+        hyb_u8 = np.clip(hyb_u8, 0, 255).astype(np.uint8)
+
+    # Nom de fichier
+    img_filename = f"hybrid_cutoff{low}_{high}{extension()}"
+    writer.soumettre(out_dir / img_filename, hyb_u8)
+
+    # Spectres de low/high (comme dans l’article/énoncé: low = blur(img1), high = img2 - blur(img2)),
+    # obtenus par linéarité à partir des spectres des flous, gardés dans la banque:
+    # spectre(high) = spectre(img2) - spectre(blur(img2)), spectre(hybride) = spectre(low) + spectre(high)
+    with span("spectre", low=low, high=high):
+        spectre_low = bank.spectre(im1_cropped, low, mode="gray")
+        spectre_high = bank.spectre(im2_cropped, 0.0, mode="gray") - bank.spectre(im2_cropped, high, mode="gray")
+    largeur = im2_cropped.shape[1]
+
+    # FFT amplitude: 2 images filtrées + hybride (pour chaque combo)
+    tag, ext = f"{low}_{high}", extension()
+    save_spectre(spectre_low, largeur, out_amp_dir / f"amp_low_cutoff{tag}{ext}", writer=writer)
+    save_spectre(spectre_high, largeur, out_amp_dir / f"amp_high_cutoff{tag}{ext}", writer=writer)
+    save_spectre(spectre_low + spectre_high, largeur, out_amp_dir / f"amp_hybrid_cutoff{tag}{ext}", writer=writer)
+
+    # Résultat par fichier (les écritures du combo sont terminées au retour)
+    return img_filename, writer.flush()
+
+
+def hybrides_par_tuiles(im1, im2, combos, out_dir):
+    # Mode tuiles: chaque hybride est calculé tuile par tuile dans le même memmap uint8,
+    # réutilisé par le combo suivant une fois écrit. Séquentiel: la mémoire reste bornée.
+    # Même résultat que generer_combo(): (nom du fichier, écritures) par combo
+    resultats = []
+    writer = ImageWriter()
+    try:
+        with Scratch() as scratch:
+            sortie = scratch.tableau("hybride", forme_hybride(im1, im2), np.uint8)
+            for low, high in combos:
+                print(f"Génère hybrid (tuiles): cutoff_low={low}, cutoff_high={high}")
+                with span("filtre", octets=im1.nbytes + im2.nbytes, low=low, high=high, tuiles=True):
+                    hybrid_image_tuiles(im1, im2, low, high, sortie=sortie)
+                img_filename = f"hybrid_cutoff{low}_{high}{extension()}"
+                writer.soumettre(out_dir / img_filename, sortie)
+                # Écriture terminée avant de réutiliser le memmap
+                resultats.append((img_filename, writer.flush()))
+    finally:
+        # Les échecs sont déjà dans les résultats de chaque combo (comme pour les workers du sweep)
+        with suppress(ErreurEcriture):
+            writer.close()
+    return resultats
+
+
+def hybrider(img1_path, img2_path, out_dir=OUT_DIR, out_amp_dir=OUT_AMP_DIR,
+             cutoff_lows=CUTOFF_LOWS, cutoff_highs=CUTOFF_HIGHS,
+             auto=ALIGN_AUTO, cache=CACHE_ALIGNEMENT, lire=lire_image, n_workers=N_WORKERS, tuiles=TUILES):
+    # Sweep des hybrides (low, high) d'une paire + amplitudes FFT.
+    # lire(chemin) -> image (le mode batch passe un lecteur qui garde les images décodées)
+    # tuiles: voir TUILES (avec le cache d'alignement, la paire alignée est relue en memmap)
+    out_dir, out_amp_dir = Path(out_dir), Path(out_amp_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     out_amp_dir.mkdir(parents=True, exist_ok=True)
 
     # Lecture des images
-    im1 = imread(str(img1_path))
-    im2 = imread(str(img2_path))
+    with span("chargement"):
+        im1 = lire(img1_path)
+        im2 = lire(img2_path)
 
 
     # Align une fois
-    print("Alignement: clique 2 points sur l'image 1, puis 2 points sur l'image 2.")
-    im1_aligned, im2_aligned = align_images(im1, im2)
-
-    im1_aligned, im2_aligned = crop_to_overlap(im1_aligned, im2_aligned, thr=0.0, pad=2)
-    print("Après overlap crop:", im1_aligned.shape, im2_aligned.shape)
+    if not auto:
+        print("Alignement: clique 2 points sur l'image 1, puis 2 points sur l'image 2.")
+    # Sorties déjà limitées à la zone commune (calculée à partir de la transformation)
+    with span("alignement", octets=im1.nbytes + im2.nbytes, auto=auto, cache=cache):
+        if cache:
+            im1_aligned, im2_aligned = aligner_avec_cache(im1, im2, auto=auto)
+        else:
+            # Importé seulement sans cache (alignement toujours recalculé)
+            from hybrid_python.align_images import align_images
+            im1_aligned, im2_aligned = align_images(im1, im2, auto=auto)
+    print("Après alignement (zone commune):", im1_aligned.shape, im2_aligned.shape)
 
 
     # Crop une fois sur chacune
+    # (crop manuel: from hybrid_python.crop_image import crop_image, importé seulement ici car il charge pyplot)
     #print("Crop: clique 2 points (haut-gauche puis bas-droit) pour im1 alignée.")
     #im1_cropped = crop_image(im1_aligned)
     im1_cropped = im1_aligned
@@ -124,53 +220,103 @@ def main():
     #im2_cropped = crop_image(im2_aligned)
     im2_cropped = im2_aligned
 
-    # FFT amplitude des 2 images initiales
-    save_amplitude_image(im1_cropped, out_amp_dir / "amp_original_img1.png")
-    save_amplitude_image(im2_cropped, out_amp_dir / "amp_original_img2.png")
-    print("Saved FFT amplitudes for original images.")
-
-    # Valeurs de cutoff
-    cutoff_lows = [1.0, 2.0, 3.0, 4.0, 5.0, 7.0, 10.0, 15.0]
-    cutoff_highs = [1.0, 2.0, 3.0, 4.0, 5.0, 7.0, 10.0, 15.0]
-
-    # Convertir une fois en float [0,1] pour filtres/FFT
-    im1_f = mettre_float01(im1_cropped)
-    im2_f = mettre_float01(im2_cropped)
-
-    # Boucles pour générer les hybrides et leurs FFT pour chaque combo de cutoff
+    # Manifeste de build: un combo n'est recalculé que si une de ses 4 sorties n'est pas à jour
+    # (paire alignée, cutoffs, précision ou code changés, fichier supprimé ou modifié).
+    # Le mode tuiles en fait partie: filtre spatial/FFT choisi par tuile, à 1 niveau uint8 près
+    manifeste = Manifeste()
+    base = dict(tuiles=tuiles, precision=get_precision(), encodage=get_encodage(), code=version_code(*SOURCES))
+    paire = [empreinte_tableau(im1_cropped), empreinte_tableau(im2_cropped)]
+
+    # Sweep des combos de cutoff sur un pool de processus: la paire d'images est
+    # envoyée une seule fois par worker, les combos d'un même low restent ensemble
+    entrees = {
+        "im1": transportable(im1_cropped),
+        "im2": transportable(im2_cropped),
+        "out_dir": out_dir,
+        "out_amp_dir": out_amp_dir,
+        "sigma_max": max(cutoff_lows + cutoff_highs),
+    }
+    combos = []
+    sigs = {}
     for low in cutoff_lows:
         for high in cutoff_highs:
-            print(f"Génère hybrid: cutoff_low={low}, cutoff_high={high}")
-
-            # Hybride via ma fonction (pour l'image à sauvegarder)
-            hyb_u8 = hybrid_image(im1_cropped, im2_cropped, low, high)
-            #hyb_u8 = crop_image(hyb_u8)
+            sigs[low, high] = signature(paire=paire, low=low, high=high, **base)
+            if not manifeste.tous_a_jour(sorties_combo(out_dir, out_amp_dir, low, high, tuiles), sigs[low, high]):
+                combos.append((low, high))
+    print(f"Combos à régénérer: {len(combos)}/{len(sigs)}")
 
-            if hyb_u8.dtype != np.uint8:
-                hyb_u8 = np.clip(hyb_u8, 0, 255).astype(np.uint8)
-
-            # Nom de fichier
-            img_filename = f"hybrid_cutoff{low}_{high}.png"
-            imsave(str(out_dir / img_filename), hyb_u8)
-
-            # Recalcule low/high ici (pour sauvegarder leurs FFT)
-            #    (comme dans l’article/énoncé: low = blur(img1), high = img2 - blur(img2))
-            low_img = skimage.filters.gaussian(mettre_float01(to_gray(im1_cropped)), sigma=low)
-            high_img = mettre_float01(to_gray(im2_cropped)) - skimage.filters.gaussian(mettre_float01(to_gray(im2_cropped)), sigma=high)
-
-
-            # Hybride float (pour FFT) = low + high
-            hyb_f = np.clip(low_img + high_img, 0.0, 1.0)
-
-            # FFT amplitude: 2 images filtrées + hybride (pour chaque combo)
-            tag = f"{low}_{high}"
-            save_amplitude_image(low_img, out_amp_dir / f"amp_low_cutoff{tag}.png")
-            save_amplitude_image(high_img, out_amp_dir / f"amp_high_cutoff{tag}.png")
-            save_amplitude_image(hyb_f, out_amp_dir / f"amp_hybrid_cutoff{tag}.png")
+    if tuiles:
+        resultats = hybrides_par_tuiles(im1_cropped, im2_cropped, combos, out_dir)
+    else:
+        resultats = executer_sweep(generer_combo, combos, entrees=entrees,
+                                   max_workers=n_workers, chunksize=len(cutoff_highs))
+
+    # FFT amplitude des 2 images initiales, après le sweep: aucun thread d'écriture ne doit
+    # tourner pendant le fork des workers (un verrou d'import tenu par un de ces threads
+    # resterait pris pour toujours dans le worker). Pas en mode tuiles (FFT de l'image entière)
+    writer = ImageWriter()
+    originales = []
+    for k, (img, empreinte) in enumerate([] if tuiles else zip((im1_cropped, im2_cropped), paire), start=1):
+        chemin = out_amp_dir / f"amp_original_img{k}{extension()}"
+        sig = signature(image=empreinte, **base)
+        if not manifeste.a_jour(chemin, sig):
+            save_amplitude_image(img, chemin, writer=writer)
+            originales.append((chemin, sig))
+
+    echecs = []
+    for (low, high), (_, ecritures) in zip(combos, resultats):
+        echecs.extend(r for r in ecritures if not r.ok)
+
+    # Planche des combos, si un hybride a changé (et seulement si tous sont écrits)
+    planche = []
+    chemin_planche = out_dir / f"planche_cutoffs{extension()}"
+    sig_planche = signature(combos=[sigs[low, high] for low in cutoff_lows for high in cutoff_highs],
+                            code=version_code("montage.py"))
+    if not echecs and not manifeste.a_jour(chemin_planche, sig_planche):
+        with span("montage"):
+            canevas = planche_cutoffs(out_dir, cutoff_lows, cutoff_highs, im1_cropped.shape[:2])
+        writer.soumettre(chemin_planche, canevas)
+        planche.append((chemin_planche, sig_planche))
+
+    for (low, high), (img_filename, ecritures) in zip(combos, resultats):
+        erreurs = [r for r in ecritures if not r.ok]
+        for r in ecritures:
+            if r.ok:
+                manifeste.enregistrer(r.chemin, sigs[low, high])
+            else:
+                manifeste.oublier(r.chemin)
+        if erreurs:
+            print(f"ERREUR: {len(erreurs)} fichier(s) non sauvegardé(s) pour cutoff_low={low}, cutoff_high={high}")
+        else:
+            print(f"Saved hybrid {img_filename} + FFT amplitudes pour cutoff_low={low}, cutoff_high={high}")
+
+    # Lève ErreurEcriture si les amplitudes originales ou la planche n'ont pas pu être écrites
+    # (le manifeste est sauvé quand même: les combos réussis ne seront pas refaits)
+    try:
+        writer.close()
+    finally:
+        sigs_writer = dict(originales + planche)
+        for r in writer.resultats:
+            if r.ok:
+                manifeste.enregistrer(r.chemin, sigs_writer[r.chemin])
+            else:
+                manifeste.oublier(r.chemin)
+        manifeste.sauver()
+    if originales:
+        print("Saved FFT amplitudes for original images.")
+    if planche:
+        print(f"Saved contact sheet {chemin_planche.name}.")
+    if echecs:
+        raise ErreurEcriture(echecs)
+
+    print(f"Tâche terminée. Images hybrides et FFT sauvegardées dans '{out_dir.as_posix()}/'.")
 
-            print(f"Saved hybrid + FFT amplitudes pour cutoff_low={low}, cutoff_high={high}")
 
-    print("Tâche terminée. Images hybrides et FFT sauvegardées dans 'web/images/hybrid/'.")
+def main():
+    # Paire du rapport (T1: Einstein/Marilyn, T2: Capitaine/Thor)
+    img1_path, img2_path = PAIRES["T3"]
+    with bilan_ecritures("hybride"):
+        hybrider(img1_path, img2_path, auto=ALIGN_AUTO, cache=CACHE_ALIGNEMENT, n_workers=N_WORKERS, tuiles=TUILES)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+# main_melange.py
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from conversions import mettre_float01, to_gray
+from fichiers_image import bilan_ecritures, extension, get_encodage, lire_image
+from main_pile import gaussian_stack, laplacian_stack, niveaux_gaussiens, niveaux_laplaciens
+from manifeste import Manifeste, empreinte_fichier, signature, version_code
+from precision import get_precision
+from traces import span
+from writer import ImageWriter
+
+# Sources qui influencent les PNG (pour le manifeste de build)
+SOURCES = ("main_melange.py", "main_pile.py", "conversions.py", "gauss_backend.py", "precision.py", "writer.py")
+
+
+def sigmas_melange(n_levels: int = 6, sigma0: float = 2.0, sigma_mult: float = 2.0) -> list[float]:
+    # Niveau 0 = image d'origine (sigma 0), puis les sigmas de gaussian_stack.
+    # Sans le niveau 0, la reconstruction redonnerait l'image floutée à sigma0.
+    return [0.0] + [float(sigma0 * sigma_mult**i) for i in range(n_levels - 1)]
+
+
+def preparer_melange(
+    img_a: np.ndarray,
+    img_b: np.ndarray,
+    masque: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Images float32 [0,1] sans alpha (gris ou RGB) + masque 2D float32 [0,1] (1 -> image A).
+    # float32 comme les piles de main_pile: pas de copie float64 des images couleur
+    a = mettre_float01(img_a[:, :, :3] if img_a.ndim == 3 else img_a, np.float32)
+    b = mettre_float01(img_b[:, :, :3] if img_b.ndim == 3 else img_b, np.float32)
+    if a.shape != b.shape:
+        raise ValueError(f"Les images doivent avoir la même taille: {a.shape} vs {b.shape}")
+
+    m = mettre_float01(to_gray(masque) if masque.ndim == 3 else masque, np.float32)
+    if m.shape != a.shape[:2]:
+        raise ValueError(f"Le masque doit avoir la taille des images: {m.shape} vs {a.shape[:2]}")
+    return a, b, m
+
+
+def melange(
+    img_a: np.ndarray,
+    img_b: np.ndarray,
+    masque: np.ndarray,
+    n_levels: int = 6,
+    sigma0: float = 2.0,
+    sigma_mult: float = 2.0,
+) -> np.ndarray:
+    # Mélange multirésolution: sum_i M_i * LA_i + (1 - M_i) * LB_i
+    # (L_i = G_i - G_{i+1}, dernier = G_last; M_i = pile gaussienne du masque).
+    #
+    # Même résultat que melange_piles(), mais un canal à la fois et niveau par niveau
+    # (niveaux_gaussiens et niveaux_laplaciens de main_pile): le niveau i du masque est
+    # produit avec ceux des images, et seuls G_i et G_{i+1} de chaque entrée (canal A,
+    # canal B, masque) et l'accumulateur existent en même temps, au lieu de piles complètes.
+    # Le masque est refiltré pour chaque canal: moins cher en mémoire que garder sa pile.
+    a, b, m = preparer_melange(img_a, img_b, masque)
+    sigmas = sigmas_melange(n_levels, sigma0, sigma_mult)
+
+    resultat = np.zeros_like(a)
+    canaux = [(a, b, resultat)] if a.ndim == 2 else [
+        (a[:, :, c], b[:, :, c], resultat[:, :, c]) for c in range(a.shape[2])
+    ]
+    for canal_a, canal_b, sortie in canaux:
+        lap_a = niveaux_laplaciens(niveaux_gaussiens(canal_a, sigmas))
+        lap_b = niveaux_laplaciens(niveaux_gaussiens(canal_b, sigmas))
+        for i, (l_a, l_b, m_i) in enumerate(zip(lap_a, lap_b, niveaux_gaussiens(m, sigmas))):
+            # M * LA + (1 - M) * LB = LB + M * (LA - LB), en place dans LA
+            with span("combinaison", octets=l_a.nbytes, niveau=i):
+                l_a -= l_b
+                l_a *= m_i
+                l_a += l_b
+                sortie += l_a
+
+    return np.clip(resultat, 0.0, 1.0, out=resultat)
+
+
+def melange_piles(
+    img_a: np.ndarray,
+    img_b: np.ndarray,
+    masque: np.ndarray,
+    n_levels: int = 6,
+    sigma0: float = 2.0,
+    sigma_mult: float = 2.0,
+) -> np.ndarray:
+    # Référence directe avec gaussian_stack/laplacian_stack (piles complètes, canal par canal).
+    # Coûteux en mémoire: sert à valider melange()
+    a, b, m = preparer_melange(img_a, img_b, masque)
+
+    def pile_laplacienne(x: np.ndarray) -> np.ndarray:
+        g, _ = gaussian_stack(x, n_levels=n_levels - 1, sigma0=sigma0, sigma_mult=sigma_mult)
+        return laplacian_stack(np.concatenate([x.astype(np.float32)[None], g]), en_place=True)
+
+    g_m, _ = gaussian_stack(m, n_levels=n_levels - 1, sigma0=sigma0, sigma_mult=sigma_mult)
+    g_m = np.concatenate([m.astype(np.float32)[None], g_m])
+
+    canaux_a = [a] if a.ndim == 2 else [a[:, :, c] for c in range(a.shape[2])]
+    canaux_b = [b] if b.ndim == 2 else [b[:, :, c] for c in range(b.shape[2])]
+    canaux = []
+    for ca, cb in zip(canaux_a, canaux_b):
+        lap_a, lap_b = pile_laplacienne(ca), pile_laplacienne(cb)
+        canaux.append((g_m * lap_a + (1.0 - g_m) * lap_b).sum(axis=0))
+
+    resultat = canaux[0] if a.ndim == 2 else np.dstack(canaux)
+    return np.clip(resultat, 0.0, 1.0)
+
+
+def masque_vertical(shape: tuple[int, ...]) -> np.ndarray:
+    # Masque par défaut: moitié gauche = image A, moitié droite = image B
+    H, W = shape[:2]
+    m = np.zeros((H, W), dtype=np.float32)
+    m[:, : W // 2] = 1.0
+    return m
+
+
+def melanger(
+    img_a_path: Path,
+    img_b_path: Path,
+    masque_path: Path | None,
+    out_dir: Path,
+    n_levels: int = 6,
+    sigma0: float = 2.0,
+    sigma_mult: float = 2.0,
+    lire: Callable[[Path], np.ndarray] = lire_image,
+) -> None:
+    # Mélange de deux images (+ masque optionnel: blanc -> image A), si pas déjà à jour.
+    # lire(chemin) -> image décodée (le mode batch passe un lecteur qui garde les images décodées)
+    img_a_path, img_b_path, out_dir = Path(img_a_path), Path(img_b_path), Path(out_dir)
+    masque_path = Path(masque_path) if masque_path is not None else None
+    a_masque = masque_path is not None and masque_path.is_file()
+
+    for p in (img_a_path, img_b_path):
+        if not p.is_file():
+            raise FileNotFoundError(f"fichier introuvable -> {p.resolve()}")
+
+    # Rien à faire si les images, le masque, les paramètres et le code n'ont pas changé
+    out_path = out_dir / f"melange_{img_a_path.stem}_{img_b_path.stem}{extension()}"
+    sorties = (out_path, out_dir / f"masque{extension()}")
+    manifeste = Manifeste()
+    sig = signature(
+        img_a=empreinte_fichier(img_a_path),
+        img_b=empreinte_fichier(img_b_path),
+        masque=empreinte_fichier(masque_path) if a_masque else "vertical",
+        n_levels=n_levels, sigma0=sigma0, sigma_mult=sigma_mult,
+        precision=get_precision(), encodage=get_encodage(), code=version_code(*SOURCES),
+    )
+    if manifeste.tous_a_jour(sorties, sig):
+        print(f"Mélange à jour (rien à régénérer): {out_path.resolve()}")
+        return
+
+    with span("chargement"):
+        img_a = lire(img_a_path)
+        img_b = lire(img_b_path)
+        if a_masque:
+            masque = lire(masque_path)
+            masque = mettre_float01(to_gray(masque) if masque.ndim == 3 else masque)
+        else:
+            masque = masque_vertical(img_a.shape)
+
+    resultat = melange(img_a, img_b, masque, n_levels=n_levels, sigma0=sigma0, sigma_mult=sigma_mult)
+
+    # skimage importé seulement quand il y a un mélange à écrire
+    from skimage.util import img_as_ubyte
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with ImageWriter() as writer:
+        writer.soumettre(out_path, img_as_ubyte(resultat))
+        writer.soumettre(sorties[1], img_as_ubyte(masque))
+
+    for sortie in sorties:
+        manifeste.enregistrer(sortie, sig)
+    manifeste.sauver()
+
+    print("Mélange multirésolution généré:")
+    print(f" - Images : {img_a_path}, {img_b_path}")
+    print(f" - Masque : {masque_path if a_masque else 'vertical (par défaut)'}")
+    print(f" - Output : {out_path.resolve()}")
+    print(f" - Sigmas : {sigmas_melange(n_levels, sigma0, sigma_mult)}")
+
+
+def main() -> None:
+    # Masque optionnel (blanc -> image A); sinon moitié gauche / moitié droite
+    with bilan_ecritures("melange"):
+        melanger(Path("web/images/data/Pomme.png"), Path("web/images/data/Orange.png"),
+                 Path("web/images/data/masque_melange.png"), Path("web/images/melange/"),
+                 n_levels=6, sigma0=2.0, sigma_mult=2.0)
+
+
+if __name__ == "__main__":
+    main()
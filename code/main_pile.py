@@ -1,88 +1,393 @@
 # main_pile.py
 from __future__ import annotations
 
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Callable, Iterator
 
 import numpy as np
-from skimage import io, img_as_float
-from skimage.color import rgb2gray
-from skimage.filters import gaussian
-from skimage.util import img_as_ubyte
 
+from fichiers_image import bilan_ecritures, ecrire_image, extension, get_encodage, lire_image
+from gauss_backend import GaussianMultiSigma, gaussian
+from manifeste import Manifeste, empreinte_fichier, signature, version_code
+from montage import Planche, montage, reduction_pour
+from precision import dtype_calcul, en_float, get_precision
+from sweep import cache_worker, executer_sweep, nombre_workers
+from traces import span, trace
+from tuiles import TAILLE_TUILE, Scratch, appliquer_par_tuiles, bornes_par_tuiles, halo_gaussien
+from writer import ImageWriter
 
+# Nombre de processus pour les niveaux de la pile (None = tous les coeurs, 1 = séquentiel)
+N_WORKERS = None
+
+# "pile": tous les niveaux à pleine résolution (L, H, W): niveau i = stack[i], contigu
+# "pyramide": décimation par 2 après chaque niveau (liste d'images, ~4/3 de l'image de base)
+MODE = "pile"
+
+# Écart max toléré entre collapse(pile laplacienne) et le premier niveau gaussien
+# (somme télescopique en float32: quelques ulp)
+TOLERANCE_RECONSTRUCTION = 1e-5
+
+# Images plus grandes que la RAM: piles calculées par tuiles dans des memmap (voir tuiles.py)
+TUILES = False
+
+# Mode tuiles: largeur max du montage (niveaux réduits d'un facteur entier)
+LARGEUR_MONTAGE = 4096
+
+# Piles en couleur (L, H, W, C): tous les canaux filtrés en un appel (channel_axis);
+# en RGBA l'alpha suit sans être filtré. False: image convertie en gris (L, H, W)
+COULEUR = False
+
+# Sources qui influencent les PNG (pour le manifeste de build)
+SOURCES = ("main_pile.py", "montage.py", "gauss_backend.py", "precision.py", "tuiles.py", "writer.py")
+
+
+@trace("chargement")
 def load_gray_image(path: Path) -> np.ndarray:
     # Load une image et la convertie en float grayscale normalisé [0,1]
-    img = io.imread(str(path))
+    return load_gray_array(lire_image(path))
+
+
+def load_gray_array(img: np.ndarray) -> np.ndarray:
+    # skimage importé à l'appel: pas au démarrage des scripts qui importent main_pile
+    from skimage.util import img_as_float
+
     img = img_as_float(img)
 
-    # Couleur -> gris
+    # Couleur -> gris (skimage.color tire scipy.linalg: importé seulement pour une image couleur)
     if img.ndim == 3:
+        from skimage.color import rgb2gray
+
         if img.shape[2] == 4:
             img = img[:, :, :3]
         img = rgb2gray(img)
 
-    return np.clip(img, 0.0, 1.0)
+    # Précision du pipeline (float32 ou float64)
+    return en_float(np.clip(img, 0.0, 1.0))
+
+
+def load_color_array(img: np.ndarray) -> np.ndarray:
+    # Float [0,1] en gardant les canaux: gris (H, W), RGB, ou RGBA (gris + alpha -> RGBA)
+    from skimage.util import img_as_float
+
+    img = img_as_float(img)
+    if img.ndim == 3 and img.shape[2] == 2:
+        img = np.dstack([img[:, :, 0]] * 3 + [img[:, :, 1]])
+    return en_float(np.clip(img, 0.0, 1.0))
+
+
+@trace("chargement")
+def load_gray_image_tuiles(path: Path, scratch: Scratch, taille: int = TAILLE_TUILE) -> np.ndarray:
+    # Comme load_gray_image, mais vers un memmap: seul l'uint8 décodé et une tuile float en mémoire
+    src = scratch.image(path)
+    gris = scratch.tableau("gris", src.shape[:2], dtype_calcul())
+    appliquer_par_tuiles(load_gray_array, [src], [gris], taille=taille)
+    return gris
+
+
+@trace("chargement")
+def load_color_image_tuiles(path: Path, scratch: Scratch, taille: int = TAILLE_TUILE) -> np.ndarray:
+    # load_color_array vers un memmap, tuile par tuile
+    src = scratch.image(path)
+    canaux = () if src.ndim == 2 else (4,) if src.shape[2] in (2, 4) else (src.shape[2],)
+    couleur = scratch.tableau("couleur", src.shape[:2] + canaux, dtype_calcul())
+    appliquer_par_tuiles(load_color_array, [src], [couleur], taille=taille)
+    return couleur
 
 
+def couleurs(x: np.ndarray) -> np.ndarray:
+    # Canaux filtrés d'une image ou d'un niveau (vue): tout en gris/RGB, sans l'alpha en RGBA
+    return x[:, :, :3] if x.ndim == 3 and x.shape[2] == 4 else x
+
+
+def _axe_canaux(img: np.ndarray) -> int | None:
+    return -1 if img.ndim == 3 else None
+
+
+def _niveau_gaussien(entrees: tuple[np.ndarray, float], sigma: float) -> np.ndarray:
+    # Worker du sweep: un niveau de la pile gaussienne (tous les canaux en un appel).
+    # FFT de l'image calculée une seule fois par worker (si le chemin FFT est choisi)
+    img, sigma_max = entrees
+    filtre = cache_worker("filtre", lambda: GaussianMultiSigma(img, channel_axis=_axe_canaux(img), sigma_max=sigma_max))
+    return np.clip(filtre.filtre(sigma), 0.0, 1.0).astype(np.float32, copy=False)
+
+
+def niveaux_gaussiens(
+    img: np.ndarray,
+    sigmas: list[float],
+    sortie: np.ndarray | None = None,
+) -> Iterator[np.ndarray]:
+    # Pile gaussienne un niveau à la fois (mêmes valeurs que gaussian_stack, float32).
+    # sortie: pile (L, H, W[, C]) où écrire les niveaux; sinon un tableau neuf par niveau,
+    # pour les traitements qui n'ont besoin que de G_i et G_{i+1} (voir niveaux_laplaciens)
+    src = np.ascontiguousarray(couleurs(img))
+    filtre = GaussianMultiSigma(src, channel_axis=_axe_canaux(src), sigma_max=max(sigmas, default=0.0))
+    for i, s in enumerate(sigmas):
+        niveau = sortie[i] if sortie is not None else np.empty(img.shape, dtype=np.float32)
+        with span("filtre", octets=src.nbytes, sigma=s):
+            np.clip(filtre.filtre(s), 0.0, 1.0, out=couleurs(niveau))
+        if src.shape != img.shape:
+            niveau[..., 3] = img[..., 3]
+        yield niveau
+
+
+@trace("filtre")
 def gaussian_stack(
     img: np.ndarray,
     n_levels: int = 6,
     sigma0: float = 2.0,
     sigma_mult: float = 2.0,
+    max_workers: int | None = 1,
 ) -> tuple[np.ndarray, list[float]]:
     #Pile gaussienne (même taille, sigma double, chaque niveau depuis l'original)
-    H, W = img.shape
-    stack = np.zeros((H, W, n_levels), dtype=np.float32)
-    sigmas: list[float] = []
-
-    sigma = sigma0
+    # Pile (L, H, W) ou (L, H, W, C) float32: chaque niveau est un bloc contigu.
+    # Couleur: tous les canaux filtrés en un appel (channel_axis); alpha (RGBA) copié tel quel
+    stack = np.empty((n_levels, *img.shape), dtype=np.float32)
+    sigmas: list[float] = [float(sigma0 * sigma_mult**i) for i in range(n_levels)]
+    sigma_max = max(sigmas, default=sigma0)
+    src = np.ascontiguousarray(couleurs(img))
+
+    if nombre_workers(max_workers, n_levels) == 1:
+        # Séquentiel: chaque niveau est écrit directement dans la pile (pas de liste de niveaux)
+        for _ in niveaux_gaussiens(img, sigmas, sortie=stack):
+            pass
+        return stack, sigmas
+
+    # Niveaux indépendants -> sweep sur un pool de processus
+    niveaux = executer_sweep(_niveau_gaussien, sigmas, entrees=(src, sigma_max), max_workers=max_workers)
     for i in range(n_levels):
-        g = gaussian(img, sigma=sigma, preserve_range=True, channel_axis=None)
-        stack[:, :, i] = np.clip(g, 0.0, 1.0)
-        sigmas.append(float(sigma))
-        sigma *= sigma_mult
-
+        couleurs(stack[i])[...], niveaux[i] = niveaux[i], None
+    if src.shape != img.shape:
+        stack[..., 3] = img[..., 3]
     return stack, sigmas
 
 
-def laplacian_stack(gauss_stack: np.ndarray) -> np.ndarray:
-    # Pile laplacienne: L_i = G_i - G_{i+1}, dernier = G_last
-    H, W, L = gauss_stack.shape
-    lap = np.zeros_like(gauss_stack, dtype=np.float32)
+@trace("filtre")
+def gaussian_stack_tuiles(
+    img: np.ndarray,
+    n_levels: int = 6,
+    sigma0: float = 2.0,
+    sigma_mult: float = 2.0,
+    sortie: np.ndarray | None = None,
+    taille: int = TAILLE_TUILE,
+) -> tuple[np.ndarray, list[float]]:
+    # Même pile que gaussian_stack, calculée par tuiles avec un halo du plus grand sigma.
+    # sortie: memmap (L, H, W[, C]) float32 (Scratch.tableau()), sinon allouée en mémoire
+    sigmas: list[float] = [float(sigma0 * sigma_mult**i) for i in range(n_levels)]
+    if sortie is None:
+        sortie = np.empty((n_levels, *img.shape), dtype=np.float32)
+
+    def tuile(t: np.ndarray) -> list[np.ndarray]:
+        src = couleurs(t)
+        niveaux = []
+        for s in sigmas:
+            g = np.clip(gaussian(src, s, channel_axis=_axe_canaux(src)), 0.0, 1.0).astype(np.float32, copy=False)
+            niveaux.append(g if src is t else np.dstack([g, t[:, :, 3]]))
+        return niveaux
+
+    # Une sortie (H, W[, C]) par niveau
+    appliquer_par_tuiles(tuile, [img], list(sortie), halo=halo_gaussien(max(sigmas, default=0.0)), taille=taille)
+    return sortie, sigmas
+
+
+@trace("combinaison")
+def laplacian_stack(gauss_stack: np.ndarray, en_place: bool = False) -> np.ndarray:
+    # Pile laplacienne (L, H, W[, C]): L_i = G_i - G_{i+1}, dernier = G_last.
+    # RGBA: l'alpha n'est pas différencié, chaque niveau garde celui de la pile gaussienne.
+    # en_place: la pile gaussienne devient la pile laplacienne (aucune allocation);
+    # ordre croissant: G_{i+1} n'est pas encore modifié quand L_i est calculé
+    # (soustraction sur le niveau entier, contigu, puis alpha remis: ~4x plus rapide
+    # qu'une soustraction sur la vue RGB à pas de 4 canaux)
+    if en_place:
+        lap = gauss_stack
+    else:
+        lap = np.empty_like(gauss_stack, dtype=np.float32)
+        lap[-1] = gauss_stack[-1]
+    rgba = gauss_stack.ndim == 4 and gauss_stack.shape[3] == 4
+
+    for i in range(gauss_stack.shape[0] - 1):
+        alpha = gauss_stack[i, ..., 3].copy() if rgba else None
+        np.subtract(gauss_stack[i], gauss_stack[i + 1], out=lap[i])
+        if alpha is not None:
+            lap[i, ..., 3] = alpha
+    return lap
+
+
+def niveaux_laplaciens(gaussiens: Iterator[np.ndarray]) -> Iterator[np.ndarray]:
+    # laplacian_stack niveau par niveau: L_i = G_i - G_{i+1} calculé en place dans G_i,
+    # dernier = G_last. Seuls G_i et G_{i+1} existent en même temps (alpha RGBA gardé)
+    g = next(gaussiens)
+    for suivant in gaussiens:
+        np.subtract(couleurs(g), couleurs(suivant), out=couleurs(g))
+        yield g
+        g = suivant
+    yield g
+
 
-    for i in range(L - 1):
-        lap[:, :, i] = gauss_stack[:, :, i] - gauss_stack[:, :, i + 1]
-    lap[:, :, L - 1] = gauss_stack[:, :, L - 1]
+@trace("combinaison")
+def laplacian_stack_tuiles(
+    gauss_stack: np.ndarray,
+    sortie: np.ndarray | None = None,
+    taille: int = TAILLE_TUILE,
+) -> np.ndarray:
+    # laplacian_stack tuile par tuile (opération par pixel: pas de halo).
+    # sortie=gauss_stack: en place (chaque tuile est lue avant d'être écrite)
+    if sortie is None:
+        sortie = np.empty_like(gauss_stack, dtype=np.float32)
+
+    def tuile(*niveaux: np.ndarray) -> list[np.ndarray]:
+        return list(laplacian_stack(np.stack(niveaux), en_place=True))
+
+    appliquer_par_tuiles(tuile, list(gauss_stack), list(sortie), taille=taille)
+    return sortie
+
+
+def collapse(lap_stack: np.ndarray | list[np.ndarray], reference: np.ndarray | None = None) -> np.ndarray:
+    # Reconstruction: somme des niveaux de la pile laplacienne (= G_0, le premier niveau
+    # gaussien); pour une pyramide, agrandir + ajouter du niveau le plus grossier au plus fin.
+    # RGBA: l'alpha est celui du niveau le plus fin (non filtré).
+    # reference (ex: copie de G_0): lève ValueError si l'écart max dépasse TOLERANCE_RECONSTRUCTION
+    image = lap_stack[-1].copy()
+    for level in lap_stack[-2::-1]:
+        if isinstance(lap_stack, np.ndarray):
+            couleurs(image)[...] += couleurs(level)
+        else:
+            agrandie, image = agrandir(image, level.shape), level.copy()
+            couleurs(image)[...] += couleurs(agrandie)
+
+    if reference is not None:
+        erreur = float(np.abs(image - reference).max())
+        if erreur > TOLERANCE_RECONSTRUCTION:
+            raise ValueError(f"Reconstruction de la pile laplacienne: écart max {erreur:.3g} "
+                             f"> {TOLERANCE_RECONSTRUCTION:g}")
+    return image
+
+
+@trace("filtre")
+def gaussian_pyramid(
+    img: np.ndarray,
+    n_levels: int = 6,
+    sigma0: float = 2.0,
+) -> tuple[list[np.ndarray], list[float]]:
+    # Pyramide gaussienne: flou puis décimation par 2 à chaque niveau.
+    # Chaque niveau garde un flou de sigma0 dans ses propres pixels, donc sigma0 * 2^i
+    # en pixels de l'image d'origine: mêmes sigmas effectifs que gaussian_stack(sigma_mult=2).
+    # Passer du niveau i au niveau i+1 (avant décimation): sqrt((2*sigma0)^2 - sigma0^2) = sigma0*sqrt(3)
+    # Couleur: canaux filtrés ensemble (channel_axis); alpha (RGBA) seulement décimé
+    sigmas: list[float] = [float(sigma0 * 2.0**i) for i in range(n_levels)]
+    pyramide: list[np.ndarray] = []
+    src = couleurs(img)
+    alpha = img[:, :, 3] if src is not img else None
+
+    g = gaussian(src, sigma0, channel_axis=_axe_canaux(src))
+    for i in range(n_levels):
+        if i > 0:
+            g = np.ascontiguousarray(gaussian(g, sigma0 * np.sqrt(3.0), channel_axis=_axe_canaux(g))[::2, ::2])
+            if alpha is not None:
+                alpha = alpha[::2, ::2]
+        g = np.clip(g, 0.0, 1.0).astype(np.float32, copy=False)
+        pyramide.append(g if alpha is None else np.dstack([g, alpha]).astype(np.float32, copy=False))
+
+    return pyramide, sigmas
+
+
+def agrandir(level: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    # Interpolation bilinéaire d'un niveau de pyramide vers shape
+    if level.shape == tuple(shape):
+        return level
+    from skimage.transform import resize
+
+    return resize(level, shape, order=1, mode="edge", anti_aliasing=False,
+                  preserve_range=True).astype(np.float32, copy=False)
+
+
+@trace("combinaison")
+def laplacian_pyramid(gauss_pyr: list[np.ndarray]) -> list[np.ndarray]:
+    # Pyramide laplacienne: L_i = G_i - agrandir(G_{i+1}), dernier = G_last (alpha RGBA gardé)
+    lap = []
+    for g, g_suivant in zip(gauss_pyr[:-1], gauss_pyr[1:]):
+        level = g.copy()
+        couleurs(level)[...] -= couleurs(agrandir(g_suivant, g.shape))
+        lap.append(level)
+    lap.append(gauss_pyr[-1].copy())
     return lap
 
 
-def normalize_for_save(x: np.ndarray) -> np.ndarray:
-    # Normalise 2D -> uint8
-    x = x.astype(np.float32)
-    mn, mx = float(x.min()), float(x.max())
+def niveaux(stack: np.ndarray | list[np.ndarray], pleine_resolution: bool = True) -> list[np.ndarray]:
+    # Niveaux (H, W[, C]) d'une pile ou d'une pyramide (liste de tailles décroissantes).
+    # pleine_resolution: niveaux de la pyramide agrandis à la taille du niveau 0 (affichage seulement)
+    if isinstance(stack, np.ndarray):
+        return list(stack)
+    if not pleine_resolution:
+        return list(stack)
+    return [agrandir(level, stack[0].shape) for level in stack]
+
+
+def vers_u8(x01: np.ndarray, en_place: bool = False) -> np.ndarray:
+    # [0, 1] -> uint8, mêmes valeurs que img_as_ubyte(np.clip(x01, 0, 1)) en float32,
+    # avec un seul tampon float32 (en_place: x01, déjà float32, sert de tampon)
+    tampon = x01 if en_place else np.empty(x01.shape, dtype=np.float32)
+    np.clip(x01, 0.0, 1.0, out=tampon)
+    tampon *= 255
+    np.rint(tampon, out=tampon)
+    return tampon.astype(np.uint8)
+
+
+def normalize_for_save(x: np.ndarray, bornes: tuple[float, float] | None = None) -> np.ndarray:
+    # Normalise -> uint8 ([min, max] -> [0, 255]); en couleur, un seul [min, max] pour tous
+    # les canaux (pas de dominante ajoutée), l'alpha RGBA gardé tel quel.
+    # bornes: (min, max) des couleurs du niveau entier quand x n'en est qu'une tuile
+    if couleurs(x) is not x:
+        return np.dstack([normalize_for_save(couleurs(x), bornes), vers_u8(x[:, :, 3])])
+    mn, mx = bornes if bornes is not None else (float(x.min()), float(x.max()))
     if np.isclose(mx - mn, 0.0):
-        return np.zeros_like(x, dtype=np.uint8)
-    x01 = (x - mn) / (mx - mn)
-    return img_as_ubyte(np.clip(x01, 0.0, 1.0))
+        return np.zeros(x.shape, dtype=np.uint8)
+    x01 = np.subtract(x, mn, dtype=np.float32)
+    x01 /= mx - mn
+    return vers_u8(x01, en_place=True)
+
+
+def niveaux_u8(
+    stack: np.ndarray | list[np.ndarray],
+    laplacian: bool = False,
+    pleine_resolution: bool = True,
+) -> list[np.ndarray]:
+    # Niveaux convertis une seule fois en uint8 (pour les fichiers et le montage):
+    # gaussiens [0, 1] -> [0, 255], laplaciens normalisés par niveau
+    return [normalize_for_save(level) if laplacian else vers_u8(level)
+            for level in niveaux(stack, pleine_resolution=pleine_resolution)]
 
 
 def save_stack_images(
-    stack: np.ndarray,
+    stack: np.ndarray | list[np.ndarray],
     out_dir: Path,
     prefix: str,
     sigmas: list[float] | None = None,
     laplacian: bool = False,
+    writer: ImageWriter | None = None,
+    pleine_resolution: bool = True,
 ) -> None:
-    out_dir.mkdir(parents=True, exist_ok=True)
-    _, _, L = stack.shape
+    # stack: pile (L, H, W[, C]) ou pyramide (liste; voir niveaux() pour pleine_resolution)
+    niveaux8 = niveaux_u8(stack, laplacian=laplacian, pleine_resolution=pleine_resolution)
+    save_levels_u8(niveaux8, out_dir, prefix, sigmas=sigmas, writer=writer)
 
-    for i in range(L):
-        level = stack[:, :, i]
-        img8 = normalize_for_save(level) if laplacian else img_as_ubyte(np.clip(level, 0.0, 1.0))
 
+def save_levels_u8(
+    niveaux8: list[np.ndarray],
+    out_dir: Path,
+    prefix: str,
+    sigmas: list[float] | None = None,
+    writer: ImageWriter | None = None,
+) -> None:
+    # Niveaux déjà convertis par niveaux_u8() (écrits tels quels), mêmes noms que save_stack_images
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for i, img8 in enumerate(niveaux8):
         sigma_txt = f"_sigma{sigmas[i]:g}" if sigmas is not None else ""
-        out_path = out_dir / f"{prefix}_lvl{i:02d}{sigma_txt}.png"
-        io.imsave(str(out_path), img8)
+        out_path = out_dir / f"{prefix}_lvl{i:02d}{sigma_txt}{extension()}"
+        if writer is not None:
+            writer.soumettre(out_path, img8)
+        else:
+            ecrire_image(out_path, img8)
 
 
 def make_grid(
@@ -91,83 +396,223 @@ def make_grid(
     pad: int = 8,
     pad_value: int = 0,
 ) -> np.ndarray:
-    # Crée un montage grid à partir d'une liste d'images uint8 2D (H,W).
-    # Retourne une image uint8 2D.
-    assert len(stacks_u8) > 0, "Liste vide pour make_grid()"
-    H, W = stacks_u8[0].shape
-    for im in stacks_u8:
-        assert im.shape == (H, W), "Toutes les images doivent avoir la même taille"
-
-    n_imgs = len(stacks_u8)
-    n_rows = int(np.ceil(n_imgs / n_cols))
-
-    grid_h = n_rows * H + (n_rows - 1) * pad
-    grid_w = n_cols * W + (n_cols - 1) * pad
-    grid = np.full((grid_h, grid_w), pad_value, dtype=np.uint8)
-
-    for idx, im in enumerate(stacks_u8):
-        r = idx // n_cols
-        c = idx % n_cols
-        y0 = r * (H + pad)
-        x0 = c * (W + pad)
-        grid[y0 : y0 + H, x0 : x0 + W] = im
-
-    return grid
+    # Crée un montage grid à partir d'une liste d'images uint8 (H,W) ou (H,W,C) (voir montage.py).
+    # Retourne une image uint8 (H,W) ou, si une tuile est en couleur, (H,W,3|4).
+    return montage(stacks_u8, n_cols, pad=pad, fond=pad_value)
 
 
 def make_two_row_montage(
-    gauss_stack: np.ndarray,
-    lap_stack: np.ndarray,
+    gauss_stack: np.ndarray | list[np.ndarray],
+    lap_stack: np.ndarray | list[np.ndarray],
     out_path: Path,
     pad: int = 8,
     pad_value: int = 0,
+    writer: ImageWriter | None = None,
+    sigmas: list[float] | None = None,
 ) -> None:
+    # Piles (L, H, W[, C]) ou pyramides: les niveaux d'une pyramide sont agrandis pour la grille.
+    # Aussi des niveaux déjà convertis par niveaux_u8() (listes de uint8, placés tels quels).
+    # Rangée 1: gaussienne, rangée 2: laplacienne, écrites niveau par niveau dans le canevas;
+    # avec sigmas, chaque niveau est étiqueté (G/L σ=...)
+    gauss = niveaux(gauss_stack)
+    lap = niveaux(lap_stack)
+    L = len(gauss)
+
+    canaux = min(gauss[0].shape[2], 4) if gauss[0].ndim == 3 else 0
+    planche = Planche(2 * L, n_cols=L, taille_case=gauss[0].shape[:2], canaux=canaux, pad=pad,
+                      fond=pad_value, etiquettes=sigmas is not None)
+    for i, level in enumerate(gauss):
+        img8 = level if level.dtype == np.uint8 else vers_u8(level)
+        planche.placer(i, img8, f"G σ={sigmas[i]:g}" if sigmas else None)
+    for i, level in enumerate(lap):
+        img8 = level if level.dtype == np.uint8 else normalize_for_save(level)
+        planche.placer(L + i, img8, f"L σ={sigmas[i]:g}" if sigmas else None)
 
-    _, _, L = gauss_stack.shape
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    if writer is not None:
+        writer.soumettre(out_path, planche.canevas)
+    else:
+        ecrire_image(out_path, planche.canevas)
 
-    gauss_u8 = [img_as_ubyte(np.clip(gauss_stack[:, :, i], 0.0, 1.0)) for i in range(L)]
-    lap_u8 = [normalize_for_save(lap_stack[:, :, i]) for i in range(L)]
 
-    row1 = make_grid(gauss_u8, n_cols=L, pad=pad, pad_value=pad_value)
-    row2 = make_grid(lap_u8, n_cols=L, pad=pad, pad_value=pad_value)
+def generer(
+    img: np.ndarray,
+    out_dir: Path,
+    n_levels: int,
+    sigma0: float,
+    sigma_mult: float,
+    scratch: Scratch | None = None,
+    n_workers: int | None = N_WORKERS,
+) -> tuple[Path, list[float]]:
+    # Piles (ou pyramides) + PNG des niveaux + montage; retourne (chemin du montage, sigmas).
+    # Une seule pile en mémoire: les niveaux gaussiens sont convertis en uint8 (fichiers et
+    # montage), puis la pile gaussienne devient la pile laplacienne en place.
+    # Mode tuiles (scratch): voir ecrire_piles_tuiles()
+    if MODE == "pyramide":
+        # Facteur 2 imposé par la décimation (sigma_mult n'est pas utilisé)
+        g_stack, sigmas = gaussian_pyramid(img, n_levels=n_levels, sigma0=sigma0)
+        suffixe = "_pyr"
+    elif scratch is not None:
+        g_stack, sigmas = gaussian_stack_tuiles(img, n_levels=n_levels, sigma0=sigma0, sigma_mult=sigma_mult,
+                                                sortie=scratch.tableau("pile", (n_levels, *img.shape), np.float32))
+        montage_path = out_dir / f"montage_gauss_lap{extension()}"
+        ecrire_piles_tuiles(g_stack, sigmas, out_dir, montage_path, scratch)
+        return montage_path, sigmas
+    else:
+        g_stack, sigmas = gaussian_stack(img, n_levels=n_levels, sigma0=sigma0, sigma_mult=sigma_mult,
+                                         max_workers=n_workers)
+        suffixe = ""
+
+    # PNG encodés en arrière-plan; close() lève ErreurEcriture si une écriture a échoué
+    with ImageWriter() as writer:
+        # Niveaux gaussiens écrits pendant le calcul de la pile laplacienne
+        g_u8 = niveaux_u8(g_stack)
+        save_levels_u8(g_u8, out_dir, prefix=f"gauss{suffixe}", sigmas=sigmas, writer=writer)
+
+        # G_0 gardé pour vérifier la reconstruction (collapse)
+        reference = np.array(g_stack[0], dtype=np.float32)
+        if MODE == "pyramide":
+            l_stack = laplacian_pyramid(g_stack)
+        else:
+            l_stack = laplacian_stack(g_stack, en_place=True)
+        del g_stack
+        with span("reconstruction"):
+            collapse(l_stack, reference)
+        del reference
+
+        l_u8 = niveaux_u8(l_stack, laplacian=True)
+        save_levels_u8(l_u8, out_dir, prefix=f"lap{suffixe}", sigmas=sigmas, writer=writer)
+
+        # Montage grid (2 rangées, N colonnes)
+        montage_path = out_dir / f"montage_gauss_lap{suffixe}{extension()}"
+        make_two_row_montage(g_u8, l_u8, montage_path, pad=8, pad_value=0, writer=writer, sigmas=sigmas)
+
+    return montage_path, sigmas
+
+
+def ecrire_piles_tuiles(
+    g_stack: np.ndarray,
+    sigmas: list[float],
+    out_dir: Path,
+    montage_path: Path,
+    scratch: Scratch,
+    taille: int = TAILLE_TUILE,
+) -> None:
+    # Fin de generer() en mode tuiles, sans copie pleine résolution en mémoire:
+    # - chaque niveau est converti en uint8 tuile par tuile dans un memmap, écrit, puis
+    #   remplacé par le suivant (seul l'encodeur PNG voit un niveau uint8 entier)
+    # - le montage reçoit les niveaux réduits (LARGEUR_MONTAGE), pas les niveaux entiers
+    # - la reconstruction est vérifiée tuile par tuile contre une copie de G_0 sur disque
+    L, H, W = g_stack.shape[:3]
+    canaux = min(g_stack.shape[3], 4) if g_stack.ndim == 4 else 0
+    planche = Planche(2 * L, n_cols=L, taille_case=(H, W), canaux=canaux, pad=8, fond=0,
+                      reduction=reduction_pour(W, L, LARGEUR_MONTAGE), etiquettes=True)
+    niveau8 = scratch.tableau("niveau_u8", g_stack.shape[1:], np.uint8)
+    reference = scratch.tableau("g0", g_stack.shape[1:], np.float32)
+    out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Empile verticalement avec un pad entre les deux rangées
-    pad_row = np.full((pad, row1.shape[1]), pad_value, dtype=np.uint8)
-    montage = np.vstack([row1, pad_row, row2])
+    def ecrire(nom: str, case: int, etiquette: str) -> None:
+        niveau8.flush()
+        with span("encodage", octets=niveau8.nbytes, fichier=nom):
+            ecrire_image(out_dir / nom, niveau8)
+        planche.placer(case, niveau8, etiquette)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    io.imsave(str(out_path), montage)
+    ext = extension()
+    for i, s in enumerate(sigmas):
+        if i == 0:
+            # G_0 copié au passage (la pile gaussienne devient la pile laplacienne en place)
+            appliquer_par_tuiles(lambda t: (vers_u8(t), t), [g_stack[0]], [niveau8, reference], taille=taille)
+        else:
+            appliquer_par_tuiles(vers_u8, [g_stack[i]], [niveau8], taille=taille)
+        ecrire(f"gauss_lvl{i:02d}_sigma{s:g}{ext}", i, f"G σ={s:g}")
 
+    laplacian_stack_tuiles(g_stack, sortie=g_stack, taille=taille)
 
-def main() -> None:
-    in_path = Path("web/images/data/Partie2.jpg")
-    out_dir = Path("web/images/pile/")
+    def verifier(ref: np.ndarray, *niveaux: np.ndarray) -> tuple:
+        # ValueError (collapse) si l'écart dépasse TOLERANCE_RECONSTRUCTION dans cette tuile
+        collapse(np.stack(niveaux), ref)
+        return ()
 
-    img = load_gray_image(in_path)
+    with span("reconstruction"):
+        appliquer_par_tuiles(verifier, [reference, *g_stack], [], taille=taille)
 
-    # Paramètres
-    n_levels = 6
-    sigma0 = 2.0
-    sigma_mult = 2.0
+    for i, s in enumerate(sigmas):
+        # Normalisation [min, max] du niveau entier, appliquée tuile par tuile
+        bornes = bornes_par_tuiles(couleurs(g_stack[i]), taille)
+        appliquer_par_tuiles(lambda t: normalize_for_save(t, bornes), [g_stack[i]], [niveau8], taille=taille)
+        ecrire(f"lap_lvl{i:02d}_sigma{s:g}{ext}", L + i, f"L σ={s:g}")
 
-    g_stack, sigmas = gaussian_stack(img, n_levels=n_levels, sigma0=sigma0, sigma_mult=sigma_mult)
-    l_stack = laplacian_stack(g_stack)
+    ecrire_image(montage_path, planche.canevas)
 
-    # Sauver chaque niveau
-    save_stack_images(g_stack, out_dir, prefix="gauss", sigmas=sigmas, laplacian=False)
-    save_stack_images(l_stack, out_dir, prefix="lap", sigmas=sigmas, laplacian=True)
 
-    # Montage grid (2 rangées, N colonnes)
-    montage_path = out_dir / "montage_gauss_lap.png"
-    make_two_row_montage(g_stack, l_stack, montage_path, pad=8, pad_value=0)
+def sorties_attendues(out_dir: Path, sigmas: list[float], suffixe: str) -> list[Path]:
+    # Toutes les images produites par generer(), mêmes noms que save_stack_images
+    ext = extension()
+    sorties = [out_dir / f"{prefix}{suffixe}_lvl{i:02d}_sigma{s:g}{ext}"
+               for prefix in ("gauss", "lap") for i, s in enumerate(sigmas)]
+    return sorties + [out_dir / f"montage_gauss_lap{suffixe}{ext}"]
+
+
+def empiler(
+    in_path: Path,
+    out_dir: Path,
+    n_levels: int = 6,
+    sigma0: float = 2.0,
+    sigma_mult: float = 2.0,
+    lire: Callable[[Path], np.ndarray] = lire_image,
+    n_workers: int | None = N_WORKERS,
+    couleur: bool = COULEUR,
+) -> None:
+    # Piles (ou pyramides) d'une image + montage, si pas déjà à jour.
+    # lire(chemin) -> image décodée (le mode batch passe un lecteur qui garde les images décodées)
+    # couleur: piles (L, H, W, C) au lieu de l'image convertie en gris
+    in_path, out_dir = Path(in_path), Path(out_dir)
+
+    # Rien à faire si l'image, les paramètres et le code n'ont pas changé depuis la dernière fois.
+    # Le mode tuiles en fait partie: filtre spatial/FFT choisi par tuile et non sur l'image
+    # entière, d'où des écarts de 1 niveau uint8 sur les grandes images
+    manifeste = Manifeste()
+    sig = signature(entree=empreinte_fichier(in_path), n_levels=n_levels, sigma0=sigma0, sigma_mult=sigma_mult,
+                    mode=MODE, tuiles=TUILES and MODE != "pyramide", couleur=couleur, precision=get_precision(),
+                    encodage=get_encodage(), code=version_code(*SOURCES))
+    if MODE == "pyramide":
+        sorties = sorties_attendues(out_dir, [float(sigma0 * 2.0**i) for i in range(n_levels)], "_pyr")
+    else:
+        sorties = sorties_attendues(out_dir, [float(sigma0 * sigma_mult**i) for i in range(n_levels)], "")
+    if manifeste.tous_a_jour(sorties, sig):
+        print(f"Piles à jour (rien à régénérer): {out_dir.resolve()}")
+        return
+
+    # Mode tuiles: les piles vivent dans des fichiers temporaires jusqu'à la fin de l'écriture
+    with Scratch() if TUILES else nullcontext() as scratch:
+        if scratch is not None:
+            charger = load_color_image_tuiles if couleur else load_gray_image_tuiles
+            img = charger(in_path, scratch)
+        else:
+            with span("chargement", fichier=in_path.name):
+                img = (load_color_array if couleur else load_gray_array)(lire(in_path))
+        montage_path, sigmas = generer(img, out_dir, n_levels, sigma0, sigma_mult, scratch, n_workers)
+
+    # generer() lève ErreurEcriture si un PNG n'a pas pu être écrit: ici tout est écrit
+    for sortie in sorties:
+        manifeste.enregistrer(sortie, sig)
+    manifeste.sauver()
 
     print("Piles + montage générés:")
     print(f" - Input : {in_path}")
     print(f" - Output: {out_dir.resolve()}")
     print(f" - Montage: {montage_path.resolve()}")
+    print(f" - Mode   : {MODE}{' (tuiles)' if TUILES else ''}{' (couleur)' if couleur else ''}")
     print(f" - Niveaux: {n_levels}")
     print(f" - Sigmas : {sigmas}")
 
 
+def main() -> None:
+    # Paramètres
+    with bilan_ecritures("pile"):
+        empiler(Path("web/images/data/Partie2.jpg"), Path("web/images/pile/"), n_levels=6, sigma0=2.0,
+                sigma_mult=2.0, n_workers=N_WORKERS, couleur=COULEUR)
+
+
 if __name__ == "__main__":
     main()
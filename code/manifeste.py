@@ -0,0 +1,126 @@
+# manifeste.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+# Manifeste de build: pour chaque fichier généré sous web/images, la signature
+# (entrées + paramètres + version du code) qui l'a produit, et sa taille/date au moment
+# de l'écriture. Un fichier dont la signature n'a pas changé et qui n'a pas été
+# modifié depuis n'est pas régénéré.
+CHEMIN_MANIFESTE = Path("web/images/manifeste.json")
+
+# Dossier "code": les sources de version_code() sont relatives à lui
+CODE_DIR = Path(__file__).resolve().parent
+
+
+def _hash(*morceaux: bytes) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for m in morceaux:
+        h.update(m)
+    return h.hexdigest()
+
+
+def empreinte_fichier(chemin: str | Path) -> str:
+    # Hash du contenu d'un fichier d'entrée (par blocs: pas de copie complète en mémoire)
+    h = hashlib.blake2b(digest_size=16)
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def empreinte_tableau(img: np.ndarray) -> str:
+    # Hash des pixels (ex: paire alignée), avec la forme et le type
+    return _hash(f"{img.shape}|{img.dtype.str}".encode(), np.ascontiguousarray(img).data)
+
+
+def version_code(*sources: str) -> str:
+    # Version du code = hash des sources qui influencent le résultat
+    # ex: version_code("main_pile.py", "gauss_backend.py", "hybrid_python/hybrid_image.py")
+    return _hash(*((CODE_DIR / s).read_bytes() for s in sources))
+
+
+def signature(**parties: Any) -> str:
+    # Signature d'une sortie: n'importe quelles valeurs sérialisables (ordre des clés ignoré)
+    return _hash(json.dumps(parties, sort_keys=True, default=str).encode("utf-8"))
+
+
+class Manifeste:
+    # manifeste = Manifeste()
+    # if not manifeste.a_jour(chemin, sig): ... écrire chemin ...; manifeste.enregistrer(chemin, sig)
+    # manifeste.sauver()
+
+    def __init__(self, chemin: str | Path = CHEMIN_MANIFESTE) -> None:
+        self.chemin = Path(chemin)
+        self.entrees: dict[str, dict[str, Any]] = self._lire()
+        self._modifiees: dict[str, dict[str, Any] | None] = {}
+
+    def _lire(self) -> dict[str, dict[str, Any]]:
+        if not self.chemin.is_file():
+            return {}
+        try:
+            return json.loads(self.chemin.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # Manifeste illisible: tout sera régénéré
+            return {}
+
+    @staticmethod
+    def cle(sortie: str | Path) -> str:
+        return Path(sortie).as_posix()
+
+    def etat(self, sortie: str | Path, sig: str | None = None) -> str:
+        # "ok", "manquant" (pas de fichier), "inconnu" (pas dans le manifeste),
+        # "modifie" (fichier changé depuis l'écriture) ou "perime" (signature différente)
+        sortie = Path(sortie)
+        if not sortie.is_file():
+            return "manquant"
+        entree = self.entrees.get(self.cle(sortie))
+        if entree is None:
+            return "inconnu"
+        st = sortie.stat()
+        if st.st_size != entree["octets"] or st.st_mtime_ns != entree["mtime_ns"]:
+            return "modifie"
+        if sig is not None and entree["signature"] != sig:
+            return "perime"
+        return "ok"
+
+    def a_jour(self, sortie: str | Path, sig: str) -> bool:
+        return self.etat(sortie, sig) == "ok"
+
+    def tous_a_jour(self, sorties: Iterable[str | Path], sig: str) -> bool:
+        return all(self.a_jour(s, sig) for s in sorties)
+
+    def enregistrer(self, sortie: str | Path, sig: str) -> None:
+        # À appeler une fois le fichier complètement écrit
+        st = Path(sortie).stat()
+        entree = {"signature": sig, "octets": st.st_size, "mtime_ns": st.st_mtime_ns}
+        self.entrees[self.cle(sortie)] = entree
+        self._modifiees[self.cle(sortie)] = entree
+
+    def oublier(self, sortie: str | Path) -> None:
+        # Écriture échouée: la sortie sera régénérée au prochain passage
+        self.entrees.pop(self.cle(sortie), None)
+        self._modifiees[self.cle(sortie)] = None
+
+    def sauver(self) -> None:
+        # Relit le fichier avant d'écrire: les entrées des autres scripts sont conservées
+        if not self._modifiees:
+            return
+        entrees = self._lire()
+        for cle, entree in self._modifiees.items():
+            if entree is None:
+                entrees.pop(cle, None)
+            else:
+                entrees[cle] = entree
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.chemin.with_name(self.chemin.name + ".tmp")
+        tmp.write_text(json.dumps(entrees, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.chemin)
+        self.entrees = entrees
+        self._modifiees.clear()
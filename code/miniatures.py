@@ -0,0 +1,258 @@
+# miniatures.py
+from __future__ import annotations
+
+import base64
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from fichiers_image import compter_ecriture, ecrire_image, encoder_image, extension, get_encodage, lire_image
+from manifeste import Manifeste, empreinte_fichier, signature, version_code
+from montage import reduire
+from traces import span
+
+# Miniatures du rapport HTML: chaque image affichée est réduite à quelques largeurs
+# (srcset), l'original ne sert qu'à la lightbox (data-fullsize).
+#
+# Cache à deux niveaux:
+# - index des sources (DOSSIER_MINIATURES/sources.json): date/taille -> empreinte et
+#   dimensions. Source inchangée (même mtime_ns et taille): ni hash ni décodage.
+#   Date changée mais même contenu (copie, checkout): un hash, pas de réduction.
+# - manifeste de build pour les miniatures elles-mêmes: signature = empreinte de la
+#   source + largeur + version de ce fichier.
+# L'aperçu flou (data URI affiché pendant le chargement) est gardé dans l'index des sources,
+# avec la même signature: calculé une fois par contenu de source.
+# Miniatures et aperçus passent par fichiers_image (profil d'encodage, format, octets comptés):
+# sources PNG/WebP -> format des sorties (extension()), JPEG -> JPEG.
+DOSSIER_MINIATURES = Path("web/images/miniatures")
+LARGEURS_MINIATURES = (320, 640, 1280)
+
+# Aperçu: ~32 px de large (réduction par blocs), flou gaussien du projet, en base64 (~1-2 Ko)
+LARGEUR_APERCU = 32
+SIGMA_APERCU = 1.0
+
+# Les chemins des miniatures reprennent ceux des sources sous web/images
+RACINE_IMAGES = Path("web/images")
+
+
+@dataclass(frozen=True)
+class Miniatures:
+    source: Path
+    largeur: int
+    hauteur: int
+    # (largeur, chemin) par largeur croissante; peut être vide (source déjà petite)
+    variantes: tuple[tuple[int, Path], ...]
+    # Source pas plus large que la plus grande miniature demandée: l'original complète srcset
+    avec_original: bool = False
+    # data:image/png;base64,... ou data:image/webp;... (None si l'aperçu n'a pas pu être calculé)
+    apercu: str | None = None
+
+    def srcset(self) -> list[tuple[int, Path]]:
+        # Candidats (largeur, chemin) pour l'attribut srcset
+        if self.avec_original or not self.variantes:
+            return [*self.variantes, (self.largeur, self.source)]
+        return list(self.variantes)
+
+
+def chemin_miniature(source: Path, largeur: int, dossier: Path = DOSSIER_MINIATURES) -> Path:
+    # web/images/data/Iris.png -> web/images/miniatures/data/Iris_640w.png (.webp selon le format)
+    try:
+        rel = source.relative_to(RACINE_IMAGES)
+    except ValueError:
+        rel = Path("_".join(p for p in source.parts if p not in ("/", "..")))
+    suffixe = extension() if rel.suffix.lower() in (".png", ".webp") else rel.suffix
+    return dossier / rel.parent / f"{rel.stem}_{largeur}w{suffixe}"
+
+
+class IndexSources:
+    # Index date/taille -> empreinte et dimensions des images sources
+
+    def __init__(self, chemin: Path) -> None:
+        self.chemin = chemin
+        self.entrees: dict[str, dict[str, Any]] = {}
+        if chemin.is_file():
+            try:
+                self.entrees = json.loads(chemin.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                # Index illisible: les sources seront rehashées
+                self.entrees = {}
+        self.modifie = False
+
+    def connu(self, source: Path) -> dict[str, Any] | None:
+        # Entrée valide seulement si la source n'a pas bougé depuis
+        entree = self.entrees.get(source.as_posix())
+        st = source.stat()
+        if entree is None or entree["octets"] != st.st_size or entree["mtime_ns"] != st.st_mtime_ns:
+            return None
+        return entree
+
+    def precedent(self, source: Path) -> dict[str, Any] | None:
+        return self.entrees.get(source.as_posix())
+
+    def mettre_a_jour(self, source: Path, entree: dict[str, Any]) -> None:
+        if self.entrees.get(source.as_posix()) != entree:
+            self.entrees[source.as_posix()] = entree
+            self.modifie = True
+
+    def sauver(self) -> None:
+        if not self.modifie:
+            return
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.chemin.with_name(self.chemin.name + ".tmp")
+        tmp.write_text(json.dumps(self.entrees, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.chemin)
+        self.modifie = False
+
+
+def _dimensions(source: Path) -> tuple[int, int]:
+    # Lit seulement l'en-tête (pas de décodage des pixels)
+    from PIL import Image
+
+    with Image.open(source) as im:
+        return im.size
+
+
+def apercu_flou(chemin: Path) -> str:
+    # Aperçu ~LARGEUR_APERCU px: moyenne par blocs puis flou gaussien, en data URI PNG
+    from gauss_backend import gaussian  # skimage.filters: seulement si un aperçu manque
+
+    img = lire_image(chemin)
+    if img.dtype != np.uint8:
+        from skimage.util import img_as_ubyte
+        img = img_as_ubyte(img)
+    if img.ndim == 3:
+        img = img[:, :, :4]
+    petit = reduire(img, max(1, -(-img.shape[1] // LARGEUR_APERCU)))
+    flou = gaussian(petit.astype(np.float32), SIGMA_APERCU, channel_axis=-1 if petit.ndim == 3 else None)
+    flou += 0.5
+    u8 = np.clip(flou, 0, 255).astype(np.uint8)
+    # Octets comptés sans fichier: l'aperçu est intégré au HTML
+    donnees = encoder_image(u8, extension())
+    compter_ecriture(len(donnees), fichiers=0)
+    return f"data:image/{extension()[1:]};base64," + base64.b64encode(donnees).decode("ascii")
+
+
+def _reduire(source: Path, cibles: list[tuple[int, Path]], hauteur_source: int, largeur_source: int) -> None:
+    # Un seul décodage de la source pour toutes ses largeurs (threads: PIL relâche le GIL)
+    from PIL import Image
+
+    with span("miniatures", fichier=source.name, n=len(cibles)):
+        with Image.open(source) as im:
+            im.load()
+            # Palette, 16 bits, gris + alpha...: vers des pixels que ecrire_image sait encoder
+            if im.mode not in ("L", "RGB", "RGBA"):
+                im = im.convert("RGBA" if "A" in im.mode or "transparency" in im.info else "RGB")
+            for largeur, chemin in cibles:
+                hauteur = max(1, round(hauteur_source * largeur / largeur_source))
+                chemin.parent.mkdir(parents=True, exist_ok=True)
+                petite = im.resize((largeur, hauteur), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                ecrire_image(chemin, np.asarray(petite))
+
+
+def preparer_miniatures(
+    sources: Iterable[Path],
+    largeurs: Iterable[int] = LARGEURS_MINIATURES,
+    dossier: Path = DOSSIER_MINIATURES,
+    n_workers: int | None = None,
+) -> dict[Path, Miniatures]:
+    # Miniatures à jour pour chaque source existante (les sources manquantes sont ignorées)
+    largeurs = sorted(set(largeurs))
+    index = IndexSources(dossier / "sources.json")
+    manifeste = Manifeste()
+    version = version_code("miniatures.py", "fichiers_image.py")
+
+    # Empreinte et dimensions: depuis l'index si la source n'a pas bougé
+    infos: dict[Path, dict[str, Any]] = {}
+    a_hasher: list[Path] = []
+    for source in dict.fromkeys(Path(s) for s in sources):
+        if not source.is_file():
+            continue
+        entree = index.connu(source)
+        if entree is not None:
+            infos[source] = entree
+        else:
+            a_hasher.append(source)
+
+    def _infos(source: Path) -> dict[str, Any]:
+        st = source.stat()
+        empreinte = empreinte_fichier(source)
+        entree = {"octets": st.st_size, "mtime_ns": st.st_mtime_ns, "empreinte": empreinte}
+        precedent = index.precedent(source)
+        if precedent is not None and precedent["empreinte"] == empreinte:
+            # Même contenu: dimensions et aperçu toujours valides
+            return {**precedent, **entree}
+        largeur, hauteur = _dimensions(source)
+        return {**entree, "largeur": largeur, "hauteur": hauteur}
+
+    with ThreadPoolExecutor(max_workers=n_workers or os.cpu_count() or 1) as pool:
+        for source, entree in zip(a_hasher, pool.map(_infos, a_hasher)):
+            index.mettre_a_jour(source, entree)
+            infos[source] = entree
+
+        # Miniatures à (re)générer: seulement les largeurs plus petites que la source
+        resultats: dict[Path, Miniatures] = {}
+        travaux: list[tuple[Path, list[tuple[int, Path]], list[tuple[Path, str]]]] = []
+        en_cache = 0
+        for source, entree in infos.items():
+            variantes = tuple(
+                (w, chemin_miniature(source, w, dossier)) for w in largeurs if w < entree["largeur"]
+            )
+            resultats[source] = Miniatures(source, entree["largeur"], entree["hauteur"], variantes,
+                                           avec_original=len(variantes) < len(largeurs))
+            cibles, sigs = [], []
+            for w, chemin in variantes:
+                sig = signature(source=entree["empreinte"], largeur=w, encodage=get_encodage(), code=version)
+                if not manifeste.a_jour(chemin, sig):
+                    cibles.append((w, chemin))
+                    sigs.append((chemin, sig))
+            en_cache += len(variantes) - len(cibles)
+            if cibles:
+                travaux.append((source, cibles, sigs))
+
+        futures = [
+            (source, pool.submit(_reduire, source, cibles, infos[source]["hauteur"], infos[source]["largeur"]), sigs)
+            for source, cibles, sigs in travaux
+        ]
+        for source, future, sigs in futures:
+            try:
+                future.result()
+            except Exception as e:
+                # Le rapport pointera sur l'original pour cette image
+                print(f"[ATTENTION] Miniatures de {source} non générées: {type(e).__name__}: {e}")
+                for chemin, _ in sigs:
+                    manifeste.oublier(chemin)
+                resultats[source] = replace(resultats[source], variantes=())
+                continue
+            for chemin, sig in sigs:
+                manifeste.enregistrer(chemin, sig)
+
+        # Aperçus flous: depuis l'index, sinon calculés depuis la plus petite miniature
+        a_calculer = []
+        for source, m in resultats.items():
+            sig = signature(source=infos[source]["empreinte"], largeur=LARGEUR_APERCU,
+                            sigma=SIGMA_APERCU, encodage=get_encodage(), code=version)
+            apercu = infos[source].get("apercu")
+            if apercu is not None and apercu[0] == sig:
+                resultats[source] = replace(m, apercu=apercu[1])
+            else:
+                a_calculer.append((source, sig, m.variantes[0][1] if m.variantes else source))
+        futures = [(source, sig, pool.submit(apercu_flou, chemin)) for source, sig, chemin in a_calculer]
+        for source, sig, future in futures:
+            try:
+                uri = future.result()
+            except Exception as e:
+                print(f"[ATTENTION] Aperçu de {source} non calculé: {type(e).__name__}: {e}")
+                continue
+            resultats[source] = replace(resultats[source], apercu=uri)
+            index.mettre_a_jour(source, {**infos[source], "apercu": [sig, uri]})
+
+    index.sauver()
+    manifeste.sauver()
+    print(f"[OK] Miniatures: {sum(len(c) for _, c, _ in travaux)} générée(s), {en_cache} en cache; "
+          f"{len(a_calculer)} aperçu(s) calculé(s)")
+    return resultats
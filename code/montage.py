@@ -0,0 +1,290 @@
+# montage.py
+from __future__ import annotations
+
+import unicodedata
+from typing import Sequence
+
+import numpy as np
+
+# Montages (grilles d'images avec étiquettes) écrits directement dans un canevas uint8
+# préalloué: pas de figure matplotlib, pas de copie de la grille complète.
+#
+#   canevas = montage(images, n_cols=6, etiquettes=["σ = 2", ...], titre="Iris", reduction=2)
+#
+# ou, pour remplir la grille au fur et à mesure (une tuile en mémoire à la fois):
+#
+#   planche = Planche(64, n_cols=8, taille_case=(H, W), canaux=3, etiquettes=True)
+#   planche.placer(i, image, "5 / 10")
+#
+# Tuiles en gris (H, W), RGB ou RGBA (H, W, 3|4), uint8. Le canevas a le plus grand nombre
+# de canaux des tuiles: une tuile grise est recopiée sur R, G et B, l'alpha d'une tuile
+# RGB est opaque (canaux au-delà du 4e ignorés, ex: hybride avec les alphas des deux
+# images). Texte: police bitmap 5x7 intégrée, agrandie d'un facteur entier.
+
+# Police 5x7: 7 lignes de 5 colonnes par caractère ('#' = pixel allumé)
+_POLICE_TEXTE = {
+    "0": (".###.", "#...#", "#..##", "#.#.#", "##..#", "#...#", ".###."),
+    "1": ("..#..", ".##..", "..#..", "..#..", "..#..", "..#..", ".###."),
+    "2": (".###.", "#...#", "....#", "...#.", "..#..", ".#...", "#####"),
+    "3": ("#####", "...#.", "..#..", "...#.", "....#", "#...#", ".###."),
+    "4": ("...#.", "..##.", ".#.#.", "#..#.", "#####", "...#.", "...#."),
+    "5": ("#####", "#....", "####.", "....#", "....#", "#...#", ".###."),
+    "6": ("..##.", ".#...", "#....", "####.", "#...#", "#...#", ".###."),
+    "7": ("#####", "....#", "...#.", "..#..", ".#...", ".#...", ".#..."),
+    "8": (".###.", "#...#", "#...#", ".###.", "#...#", "#...#", ".###."),
+    "9": (".###.", "#...#", "#...#", ".####", "....#", "...#.", ".##.."),
+    "A": (".###.", "#...#", "#...#", "#####", "#...#", "#...#", "#...#"),
+    "B": ("####.", "#...#", "#...#", "####.", "#...#", "#...#", "####."),
+    "C": (".###.", "#...#", "#....", "#....", "#....", "#...#", ".###."),
+    "D": ("###..", "#..#.", "#...#", "#...#", "#...#", "#..#.", "###.."),
+    "E": ("#####", "#....", "#....", "####.", "#....", "#....", "#####"),
+    "F": ("#####", "#....", "#....", "####.", "#....", "#....", "#...."),
+    "G": (".###.", "#...#", "#....", "#.###", "#...#", "#...#", ".####"),
+    "H": ("#...#", "#...#", "#...#", "#####", "#...#", "#...#", "#...#"),
+    "I": (".###.", "..#..", "..#..", "..#..", "..#..", "..#..", ".###."),
+    "J": ("..###", "...#.", "...#.", "...#.", "...#.", "#..#.", ".##.."),
+    "K": ("#...#", "#..#.", "#.#..", "##...", "#.#..", "#..#.", "#...#"),
+    "L": ("#....", "#....", "#....", "#....", "#....", "#....", "#####"),
+    "M": ("#...#", "##.##", "#.#.#", "#.#.#", "#...#", "#...#", "#...#"),
+    "N": ("#...#", "#...#", "##..#", "#.#.#", "#..##", "#...#", "#...#"),
+    "O": (".###.", "#...#", "#...#", "#...#", "#...#", "#...#", ".###."),
+    "P": ("####.", "#...#", "#...#", "####.", "#....", "#....", "#...."),
+    "Q": (".###.", "#...#", "#...#", "#...#", "#.#.#", "#..#.", ".##.#"),
+    "R": ("####.", "#...#", "#...#", "####.", "#.#..", "#..#.", "#...#"),
+    "S": (".####", "#....", "#....", ".###.", "....#", "....#", "####."),
+    "T": ("#####", "..#..", "..#..", "..#..", "..#..", "..#..", "..#.."),
+    "U": ("#...#", "#...#", "#...#", "#...#", "#...#", "#...#", ".###."),
+    "V": ("#...#", "#...#", "#...#", "#...#", "#...#", ".#.#.", "..#.."),
+    "W": ("#...#", "#...#", "#...#", "#.#.#", "#.#.#", "#.#.#", ".#.#."),
+    "X": ("#...#", "#...#", ".#.#.", "..#..", ".#.#.", "#...#", "#...#"),
+    "Y": ("#...#", "#...#", ".#.#.", "..#..", "..#..", "..#..", "..#.."),
+    "Z": ("#####", "....#", "...#.", "..#..", ".#...", "#....", "#####"),
+    "a": (".....", ".....", ".###.", "....#", ".####", "#...#", ".####"),
+    "b": ("#....", "#....", "#.##.", "##..#", "#...#", "#...#", "####."),
+    "c": (".....", ".....", ".###.", "#....", "#....", "#...#", ".###."),
+    "d": ("....#", "....#", ".##.#", "#..##", "#...#", "#...#", ".####"),
+    "e": (".....", ".....", ".###.", "#...#", "#####", "#....", ".###."),
+    "f": ("..##.", ".#..#", ".#...", "###..", ".#...", ".#...", ".#..."),
+    "g": (".....", ".####", "#...#", "#...#", ".####", "....#", ".###."),
+    "h": ("#....", "#....", "#.##.", "##..#", "#...#", "#...#", "#...#"),
+    "i": ("..#..", ".....", ".##..", "..#..", "..#..", "..#..", ".###."),
+    "j": ("...#.", ".....", "..##.", "...#.", "...#.", "#..#.", ".##.."),
+    "k": ("#....", "#....", "#..#.", "#.#..", "##...", "#.#..", "#..#."),
+    "l": (".##..", "..#..", "..#..", "..#..", "..#..", "..#..", ".###."),
+    "m": (".....", ".....", "##.#.", "#.#.#", "#.#.#", "#...#", "#...#"),
+    "n": (".....", ".....", "#.##.", "##..#", "#...#", "#...#", "#...#"),
+    "o": (".....", ".....", ".###.", "#...#", "#...#", "#...#", ".###."),
+    "p": (".....", ".....", "####.", "#...#", "####.", "#....", "#...."),
+    "q": (".....", ".....", ".##.#", "#..##", ".####", "....#", "....#"),
+    "r": (".....", ".....", "#.##.", "##..#", "#....", "#....", "#...."),
+    "s": (".....", ".....", ".###.", "#....", ".###.", "....#", "####."),
+    "t": (".#...", ".#...", "###..", ".#...", ".#...", ".#..#", "..##."),
+    "u": (".....", ".....", "#...#", "#...#", "#...#", "#..##", ".##.#"),
+    "v": (".....", ".....", "#...#", "#...#", "#...#", ".#.#.", "..#.."),
+    "w": (".....", ".....", "#...#", "#...#", "#.#.#", "#.#.#", ".#.#."),
+    "x": (".....", ".....", "#...#", ".#.#.", "..#..", ".#.#.", "#...#"),
+    "y": (".....", ".....", "#...#", "#...#", ".####", "....#", ".###."),
+    "z": (".....", ".....", "#####", "...#.", "..#..", ".#...", "#####"),
+    " ": (".....", ".....", ".....", ".....", ".....", ".....", "....."),
+    ".": (".....", ".....", ".....", ".....", ".....", ".##..", ".##.."),
+    ",": (".....", ".....", ".....", ".....", ".##..", "..#..", ".#..."),
+    ":": (".....", ".##..", ".##..", ".....", ".##..", ".##..", "....."),
+    "-": (".....", ".....", ".....", "#####", ".....", ".....", "....."),
+    "+": (".....", "..#..", "..#..", "#####", "..#..", "..#..", "....."),
+    "=": (".....", ".....", "#####", ".....", "#####", ".....", "....."),
+    "_": (".....", ".....", ".....", ".....", ".....", ".....", "#####"),
+    "/": (".....", "....#", "...#.", "..#..", ".#...", "#....", "....."),
+    "(": ("...#.", "..#..", ".#...", ".#...", ".#...", "..#..", "...#."),
+    ")": (".#...", "..#..", "...#.", "...#.", "...#.", "..#..", ".#..."),
+    "%": ("##..#", "##.#.", "...#.", "..#..", ".#...", ".#.##", "#..##"),
+    "×": (".....", "#...#", ".#.#.", "..#..", ".#.#.", "#...#", "....."),
+    "σ": (".....", ".....", ".####", "#..#.", "#...#", "#...#", ".###."),
+    "?": (".###.", "#...#", "....#", "...#.", "..#..", ".....", "..#.."),
+}
+
+HAUTEUR_GLYPHE, LARGEUR_GLYPHE = 7, 5
+
+# Glyphes en tableaux booléens (7, 5), construits une fois
+POLICE = {c: np.array([[p == "#" for p in ligne] for ligne in g]) for c, g in _POLICE_TEXTE.items()}
+
+
+def _glyphe(c: str) -> np.ndarray:
+    # Lettres accentuées -> lettre de base (é -> e); caractère inconnu -> "?"
+    if c not in POLICE:
+        c = unicodedata.normalize("NFKD", c)[0]
+    return POLICE.get(c, POLICE["?"])
+
+
+def taille_texte(texte: str, echelle: int = 1) -> tuple[int, int]:
+    # (hauteur, largeur) en pixels: 1 colonne d'espace entre les caractères
+    if not texte:
+        return 0, 0
+    return HAUTEUR_GLYPHE * echelle, (len(texte) * (LARGEUR_GLYPHE + 1) - 1) * echelle
+
+
+def masque_texte(texte: str, echelle: int = 1) -> np.ndarray:
+    # Texte -> masque booléen (hauteur, largeur), agrandi d'un facteur entier (plus proche voisin)
+    h, w = taille_texte(texte, 1)
+    masque = np.zeros((h, w), dtype=bool)
+    for k, c in enumerate(texte):
+        x = k * (LARGEUR_GLYPHE + 1)
+        masque[:, x:x + LARGEUR_GLYPHE] = _glyphe(c)
+    if echelle > 1:
+        masque = masque.repeat(echelle, axis=0).repeat(echelle, axis=1)
+    return masque
+
+
+def dessiner_texte(
+    canevas: np.ndarray,
+    texte: str,
+    y: int,
+    x: int,
+    couleur: int | Sequence[int] = 255,
+    echelle: int = 1,
+) -> None:
+    # Écrit le texte en place, coin haut-gauche en (y, x); ce qui dépasse du canevas est coupé
+    masque = masque_texte(texte, echelle)
+    H, W = canevas.shape[:2]
+    y0, x0 = max(y, 0), max(x, 0)
+    y1, x1 = min(y + masque.shape[0], H), min(x + masque.shape[1], W)
+    if y1 <= y0 or x1 <= x0:
+        return
+    zone = canevas[y0:y1, x0:x1]
+    zone[masque[y0 - y:y1 - y, x0 - x:x1 - x]] = couleur
+
+
+def reduire(image: np.ndarray, k: int) -> np.ndarray:
+    # Réduction d'un facteur entier k (moyenne par blocs k x k, arrondie), même type uint8.
+    # Somme de k² sous-échantillonnages décalés (comme align_images._reduire)
+    if k <= 1:
+        return image
+    H, W = image.shape[0] // k * k, image.shape[1] // k * k
+    acc = np.zeros((H // k, W // k) + image.shape[2:], dtype=np.float32)
+    for i in range(k):
+        for j in range(k):
+            acc += image[i:H:k, j:W:k]
+    acc *= 1.0 / (k * k)
+    acc += 0.5
+    return acc.astype(np.uint8)
+
+
+def reduction_pour(largeur: int, n_cols: int, largeur_max: int) -> int:
+    # Plus petit facteur entier qui garde n_cols tuiles de cette largeur sous largeur_max
+    return max(1, -(-largeur * n_cols // largeur_max))
+
+
+class Planche:
+    # Grille de n_cases cases (h, w) sur n_cols colonnes, dans un canevas uint8 alloué une fois.
+    #
+    # - taille_case: taille des tuiles avant réduction (les tuiles plus petites sont centrées)
+    # - canaux: 0 (gris), 3 (RGB) ou 4 (RGBA)
+    # - pad: espace entre les cases (pas autour de la grille), de couleur fond
+    # - etiquettes: réserve une bande de texte sous chaque case
+    # - titre: bande de texte au-dessus de la grille (texte deux fois plus grand)
+    # - echelle_texte: facteur de la police 5x7 (défaut: selon la largeur des cases)
+
+    def __init__(
+        self,
+        n_cases: int,
+        n_cols: int,
+        taille_case: tuple[int, int],
+        canaux: int = 0,
+        pad: int = 8,
+        fond: int = 0,
+        reduction: int = 1,
+        etiquettes: bool = False,
+        titre: str | None = None,
+        echelle_texte: int | None = None,
+        couleur_texte: int | None = None,
+    ) -> None:
+        if n_cases <= 0:
+            raise ValueError("Planche vide")
+        if canaux not in (0, 3, 4):
+            raise ValueError(f"canaux={canaux}: 0 (gris), 3 (RGB) ou 4 (RGBA)")
+        self.n_cols = n_cols
+        self.n_lignes = -(-n_cases // self.n_cols)
+        self.n_cases = n_cases
+        self.reduction = max(1, int(reduction))
+        self.h, self.w = taille_case[0] // self.reduction, taille_case[1] // self.reduction
+        self.pad = pad
+        self.echelle = echelle_texte or max(1, round(self.w / 160))
+        self.couleur_texte = couleur_texte if couleur_texte is not None else (0 if fond > 127 else 255)
+        self.canaux = canaux
+
+        marge = 2 * self.echelle
+        self.h_etiquette = HAUTEUR_GLYPHE * self.echelle + 2 * marge if etiquettes else 0
+        self.h_titre = HAUTEUR_GLYPHE * 2 * self.echelle + 2 * marge if titre else 0
+
+        # Pas vertical d'une ligne de cases (case + bande d'étiquette)
+        self.pas_y = self.h + self.h_etiquette + pad
+        self.pas_x = self.w + pad
+        hauteur = self.h_titre + self.n_lignes * self.pas_y - pad
+        largeur = self.n_cols * self.pas_x - pad
+
+        forme = (hauteur, largeur) if canaux == 0 else (hauteur, largeur, canaux)
+        self.canevas = np.full(forme, fond, dtype=np.uint8)
+        if canaux == 4:
+            self.canevas[:, :, 3] = 255
+
+        if titre:
+            self._centrer(titre, 0, 0, largeur, self.h_titre, 2 * self.echelle)
+
+    def _couleur(self) -> int | tuple[int, ...]:
+        c = self.couleur_texte
+        return c if self.canaux == 0 else (c, c, c, 255)[: self.canaux]
+
+    def _centrer(self, texte: str, y: int, x: int, largeur: int, hauteur: int, echelle: int) -> None:
+        th, tw = taille_texte(texte, echelle)
+        dessiner_texte(self.canevas, texte, y + (hauteur - th) // 2, x + max((largeur - tw) // 2, 0),
+                       self._couleur(), echelle)
+
+    def case(self, i: int) -> tuple[int, int]:
+        # Coin haut-gauche (y, x) de la case i (ordre ligne par ligne)
+        r, c = divmod(i, self.n_cols)
+        return self.h_titre + r * self.pas_y, c * self.pas_x
+
+    def placer(self, i: int, tuile: np.ndarray, etiquette: str | None = None) -> None:
+        # Réduit la tuile et la copie dans sa case (centrée si plus petite que la case)
+        if not 0 <= i < self.n_cases:
+            raise IndexError(f"Case {i} hors de la planche ({self.n_cases} cases)")
+        tuile = reduire(tuile, self.reduction)
+        h, w = tuile.shape[:2]
+        if h > self.h or w > self.w:
+            raise ValueError(f"Tuile {tuile.shape[:2]} plus grande que la case {(self.h, self.w)}")
+
+        y, x = self.case(i)
+        y0, x0 = y + (self.h - h) // 2, x + (self.w - w) // 2
+        zone = self.canevas[y0:y0 + h, x0:x0 + w]
+        if self.canaux == 0:
+            if tuile.ndim == 3:
+                raise ValueError("Tuile couleur dans une planche en gris (canaux=0)")
+            zone[...] = tuile
+        elif tuile.ndim == 2:
+            zone[:, :, :3] = tuile[:, :, None]
+        else:
+            c = min(tuile.shape[2], self.canaux)
+            zone[:, :, :c] = tuile[:, :, :c]
+
+        if etiquette and self.h_etiquette:
+            self._centrer(etiquette, y + self.h, x, self.w, self.h_etiquette, self.echelle)
+
+
+def montage(
+    tuiles: Sequence[np.ndarray],
+    n_cols: int,
+    etiquettes: Sequence[str] | None = None,
+    **options,
+) -> np.ndarray:
+    # Grille de tuiles uint8 (toutes en mémoire); options: voir Planche.
+    # Cases de la taille de la plus grande tuile, canevas avec le plus de canaux
+    if len(tuiles) == 0:
+        raise ValueError("Liste vide pour montage()")
+    taille = (max(t.shape[0] for t in tuiles), max(t.shape[1] for t in tuiles))
+    canaux = min(max(t.shape[2] if t.ndim == 3 else 0 for t in tuiles), 4)
+    if canaux in (1, 2):
+        raise ValueError(f"Tuiles à {canaux} canal/canaux non supportées (gris, RGB ou RGBA)")
+
+    planche = Planche(len(tuiles), n_cols, taille, canaux=canaux, etiquettes=etiquettes is not None, **options)
+    for i, tuile in enumerate(tuiles):
+        planche.placer(i, tuile, etiquettes[i] if etiquettes is not None else None)
+    return planche.canevas
@@ -0,0 +1,138 @@
+# precision.py
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+
+# Précision flottante de tout le pipeline (chargement, filtres, combinaisons, spectres).
+# float32 divise par 2 la mémoire et le trafic mémoire; float64 reste la référence.
+# Peut être choisie sans toucher au code: TP2_PRECISION=float32 python code/main_xxx.py
+PRECISIONS = {"float32": np.float32, "float64": np.float64}
+
+_DTYPE = np.dtype(np.float64)
+
+
+def set_precision(nom: str) -> None:
+    global _DTYPE
+    if nom not in PRECISIONS:
+        raise ValueError(f"Précision inconnue: {nom!r} (attendu un de {list(PRECISIONS)})")
+    _DTYPE = np.dtype(PRECISIONS[nom])
+
+
+# Même validation que set_precision(): une valeur inconnue donne une ValueError explicite
+set_precision(os.environ.get("TP2_PRECISION", "float64"))
+
+
+def get_precision() -> str:
+    return _DTYPE.name
+
+
+def dtype_calcul() -> np.dtype:
+    return _DTYPE
+
+
+@contextmanager
+def precision(nom: str) -> Iterator[None]:
+    # with precision("float32"): ... puis retour à la précision d'avant
+    avant = get_precision()
+    set_precision(nom)
+    try:
+        yield
+    finally:
+        set_precision(avant)
+
+
+def en_float(img: np.ndarray) -> np.ndarray:
+    # Conversion vers la précision du pipeline (sans copie si déjà le bon type)
+    return img.astype(_DTYPE, copy=False)
+
+
+def _ecart_uint8(a: np.ndarray, b: np.ndarray) -> int:
+    return int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+
+
+def _verifier_dtype(tab: np.ndarray, etape: str, attendu: np.dtype | type | None = None) -> None:
+    # Une étape qui repasse en float64 (ou reste en float32) trahit une conversion oubliée.
+    # attendu: type fixe de l'étape (piles et mélange: float32, hybride: uint8), sinon la précision
+    attendu = _DTYPE if attendu is None else np.dtype(attendu)
+    if tab.dtype != attendu:
+        raise TypeError(f"{etape}: résultat en {tab.dtype}, attendu {attendu}")
+
+
+def verifier_float32(img1: np.ndarray, img2: np.ndarray) -> dict[str, int]:
+    # Écart max (en niveaux uint8) entre float32 et float64 pour chaque étape du pipeline
+    from accentuation import accentuation_sigmas
+    from blur_bank import BlurBank
+    from conversions import mettre_float01, to_gray
+    from hybrid_python.hybrid_image import hybrid_image
+    from main_hybride import fft_log_amplitude
+    from main_melange import masque_vertical, melange
+    from main_pile import gaussian_stack, laplacian_stack, normalize_for_save
+    from skimage.util import img_as_ubyte
+
+    def etapes() -> dict[str, np.ndarray]:
+        sorties: dict[str, np.ndarray] = {}
+        f1 = mettre_float01(img1)
+        for s, sharp in accentuation_sigmas(f1[..., :3] if f1.ndim == 3 else f1, [0.5, 1.0, 2.5]):
+            _verifier_dtype(sharp, f"accentuation sigma={s}")
+            sorties[f"accentuation_sigma{s:g}"] = np.clip(sharp * 255.0, 0, 255).astype(np.uint8)
+
+        # Hybride avec une banque: les flous float qui l'ont produit y sont relus
+        bank = BlurBank()
+        sorties["hybride"] = hybrid_image(img1, img2, 5.0, 3.0, bank=bank)
+        _verifier_dtype(sorties["hybride"], "hybride", np.uint8)
+        _verifier_dtype(bank.flou(img1, 5.0), "hybride low")
+        _verifier_dtype(bank.source(img2), "hybride image 2")
+        _verifier_dtype(bank.flou(img2, 3.0), "hybride high")
+
+        amp = fft_log_amplitude(img1)
+        _verifier_dtype(amp, "spectre")
+        sorties["spectre"] = normalize_for_save(amp)
+
+        gris = en_float(np.clip(mettre_float01(to_gray(img1)), 0.0, 1.0))
+        g, _ = gaussian_stack(gris, n_levels=4)
+        lap = laplacian_stack(g)
+        for i in range(g.shape[0]):
+            _verifier_dtype(g[i], f"pile gaussienne niveau {i}", np.float32)
+            _verifier_dtype(lap[i], f"pile laplacienne niveau {i}", np.float32)
+            sorties[f"gauss_lvl{i}"] = img_as_ubyte(np.clip(g[i], 0.0, 1.0))
+            sorties[f"lap_lvl{i}"] = normalize_for_save(lap[i])
+
+        m = melange(img1, img2, masque_vertical(img1.shape), n_levels=4)
+        _verifier_dtype(m, "mélange", np.float32)
+        sorties["melange"] = img_as_ubyte(m)
+        return sorties
+
+    with precision("float64"):
+        ref = etapes()
+    with precision("float32"):
+        f32 = etapes()
+    return {k: _ecart_uint8(ref[k], f32[k]) for k in ref}
+
+
+if __name__ == "__main__":
+    # python code/precision.py [img1 img2] -> écarts uint8 float32 vs float64
+    import sys
+    from contextlib import redirect_stdout
+    from io import StringIO
+
+    from skimage import io
+
+    if len(sys.argv) >= 3:
+        im1, im2 = io.imread(sys.argv[1]), io.imread(sys.argv[2])
+    else:
+        rng = np.random.default_rng(0)
+        im1 = (rng.random((512, 512, 3)) * 255).astype(np.uint8)
+        im2 = (rng.random((512, 512, 3)) * 255).astype(np.uint8)
+
+    # Passer par le module importé: c'est lui que le reste du pipeline consulte
+    import precision as module_precision
+
+    with redirect_stdout(StringIO()):
+        ecarts = module_precision.verifier_float32(im1, im2)
+    for nom, ecart in ecarts.items():
+        print(f"{nom:24s} écart max uint8 = {ecart}")
+    print(f"Écart max global: {max(ecarts.values())}")
@@ -0,0 +1,78 @@
+# spectre.py
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import scipy.fft as sfft
+
+from fichiers_image import ecrire_image
+
+# Spectres d'amplitude d'images réelles.
+#
+# - rfft2: seulement les W//2+1 premières colonnes de fréquences (les autres sont
+#   conjuguées par symétrie hermitienne), deux fois moins de calcul et de mémoire
+# - le log, la normalisation et la conversion uint8 se font sur ce demi-spectre
+# - le spectre complet centré (comme fftshift(fft2)) n'est déplié qu'à l'écriture
+#
+# La FFT est linéaire: le spectre de low + high est la somme de leurs spectres,
+# qu'on peut donc garder en cache (voir BlurBank.spectre) au lieu de refaire la FFT.
+
+# Ajouté à |F| avant le log (évite log(0))
+EPS_LOG = 1e-8
+
+# Table de la colormap "gray" de matplotlib en 8 bits (quelques niveaux arrondis vers le bas)
+LUT_GRIS = (np.linspace(0.0, 1.0, 256) * 255).astype(np.uint8)
+
+
+def rfft2_reel(img: np.ndarray) -> np.ndarray:
+    # (H, W[, C]) réel -> (H, W//2+1[, C]) complexe; scipy garde la précision (float32 -> complex64)
+    return sfft.rfft2(img, axes=(0, 1))
+
+
+def log_amplitude(demi: np.ndarray) -> np.ndarray:
+    # log(|F| + eps), calculé en place sur le tableau des amplitudes
+    amp = np.abs(demi)
+    amp += EPS_LOG
+    return np.log(amp, out=amp)
+
+
+def normaliser_u8(amp: np.ndarray) -> np.ndarray:
+    # [min, max] -> uint8, même quantification que plt.imsave(cmap="gray")
+    # (LUT de 256 niveaux: niveau = floor(256 * x), 1.0 -> 255)
+    amin, amax = amp.min(), amp.max()
+    if np.isclose(amax - amin, 0.0):
+        return np.zeros(amp.shape, dtype=np.uint8)
+    x = amp - amin
+    x /= amax - amin
+    x *= 256
+    np.minimum(x, 255, out=x)
+    return LUT_GRIS[x.astype(np.uint8)]
+
+
+def deplier(demi: np.ndarray, largeur: int) -> np.ndarray:
+    # Demi-spectre (H, W//2+1) d'une grandeur symétrique (|F|, log|F|, uint8...)
+    # -> spectre complet (H, W) centré, identique à fftshift() du spectre fft2.
+    # Colonne k2 > W//2: valeur de la fréquence opposée (-k1, W - k2).
+    H, W = demi.shape[0], largeur
+    if demi.shape[1] != W // 2 + 1:
+        raise ValueError(f"Demi-spectre {demi.shape} incompatible avec la largeur {W}")
+    k1 = (np.arange(H) - H // 2) % H
+    k2 = (np.arange(W) - W // 2) % W
+    direct = k2 <= W // 2
+
+    sortie = np.empty((H, W), dtype=demi.dtype)
+    sortie[:, direct] = demi[k1][:, k2[direct]]
+    sortie[:, ~direct] = demi[(-k1) % H][:, W - k2[~direct]]
+    return sortie
+
+
+def amplitude_u8(demi: np.ndarray) -> np.ndarray:
+    # Demi-spectre complexe -> demi-image d'amplitude prête à écrire (log + normalisation)
+    return normaliser_u8(log_amplitude(demi))
+
+
+def imsave_spectre(chemin: Path, demi_u8: np.ndarray, largeur: int) -> None:
+    # Fonction d'écriture pour ImageWriter.soumettre(..., imsave_spectre, largeur=W):
+    # le dépliage se fait dans le thread d'écriture. PNG 8 bits en niveaux de gris.
+    ecrire_image(chemin, deplier(demi_u8, largeur))
@@ -0,0 +1,125 @@
+# sweep.py
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Iterable, Sequence
+
+import traces
+from fichiers_image import compter_ecriture, ecritures, get_encodage, set_encodage
+from precision import get_precision, set_precision
+from writer import ErreurEcriture
+
+# Entrées du sweep, envoyées une seule fois à chaque worker (initializer)
+_ENTREES: Any = None
+
+# Objets construits à partir des entrées et gardés pour la vie du worker (ex: BlurBank)
+_CACHE_WORKER: dict[str, Any] = {}
+
+
+def _init_worker(
+    entrees: Any,
+    nom_precision: str | None = None,
+    trace: bool = False,
+    encodage: tuple[str, str] | None = None,
+) -> None:
+    global _ENTREES
+    _ENTREES = entrees
+    _vider_cache_worker()
+    # Même précision et même encodage des sorties que le processus parent (utile avec 'spawn')
+    if nom_precision is not None:
+        set_precision(nom_precision)
+    if encodage is not None:
+        set_encodage(*encodage)
+    if trace:
+        traces.activer()
+        # Spans hérités du parent (fork): déjà comptés chez lui
+        traces.vider()
+
+
+def _appel(fonction: Callable[[Any, Any], Any], params: Any) -> tuple[Any, list | None, tuple[int, int]]:
+    # Les spans du worker et ses écritures (fichiers, octets) voyagent avec le résultat
+    # (voir executer_sweep)
+    f0, o0 = ecritures()
+    resultat = fonction(_ENTREES, params)
+    f1, o1 = ecritures()
+    return resultat, traces.vider() if traces.actif() else None, (f1 - f0, o1 - o0)
+
+
+def _vider_cache_worker() -> None:
+    # Ferme les objets du cache qui ont close() (ex. ImageWriter: son pool de threads ne doit
+    # plus tourner au prochain fork), puis vide le cache
+    objets = list(_CACHE_WORKER.values())
+    _CACHE_WORKER.clear()
+    for obj in objets:
+        fermer = getattr(obj, "close", None)
+        if fermer is None:
+            continue
+        try:
+            fermer()
+        except ErreurEcriture:
+            # Échecs déjà rapportés aux tâches par flush()
+            pass
+
+
+def cache_worker(nom: str, fabrique: Callable[[], Any]) -> Any:
+    # Objet partagé par toutes les tâches d'un même worker (construit au premier appel)
+    if nom not in _CACHE_WORKER:
+        _CACHE_WORKER[nom] = fabrique()
+    return _CACHE_WORKER[nom]
+
+
+def nombre_workers(max_workers: int | None, n_taches: int) -> int:
+    # None -> tous les coeurs, jamais plus de workers que de tâches
+    n = max_workers if max_workers is not None else (os.cpu_count() or 1)
+    return max(1, min(n, n_taches))
+
+
+def decouper(seq: Sequence[Any], n_blocs: int) -> list[list[Any]]:
+    # n blocs contigus de tailles presque égales (l'ordre est conservé)
+    n_blocs = max(1, min(n_blocs, len(seq)))
+    taille, reste = divmod(len(seq), n_blocs)
+    blocs, debut = [], 0
+    for i in range(n_blocs):
+        fin = debut + taille + (1 if i < reste else 0)
+        blocs.append(list(seq[debut:fin]))
+        debut = fin
+    return blocs
+
+
+def executer_sweep(
+    fonction: Callable[[Any, Any], Any],
+    params: Iterable[Any],
+    entrees: Any = None,
+    max_workers: int | None = None,
+    chunksize: int = 1,
+) -> list[Any]:
+    # Appelle fonction(entrees, p) pour chaque p de params, sur un pool de processus.
+    #
+    # - entrees (ex: la paire d'images décodées) est envoyée une fois par worker
+    # - les résultats reviennent dans l'ordre de params, peu importe le worker
+    # - fonction doit être définie au niveau module (picklable); elle nomme ses
+    #   fichiers de sortie à partir de p seulement, donc la sortie est déterministe
+    # - chunksize > 1 garde des params voisins sur le même worker (réutilise son cache)
+    # - aucun thread (ex: ImageWriter) ne doit travailler dans l'appelant pendant l'appel:
+    #   les workers sont créés par fork et hériteraient de ses verrous (import, etc.)
+    params = list(params)
+    n = nombre_workers(max_workers, len(params))
+
+    if n == 1:
+        # Même chemin, sans processus: pratique pour déboguer
+        _init_worker(entrees)
+        try:
+            return [fonction(entrees, p) for p in params]
+        finally:
+            _init_worker(None)
+
+    with ProcessPoolExecutor(max_workers=n, initializer=_init_worker,
+                             initargs=(entrees, get_precision(), traces.actif(), get_encodage())) as ex:
+        resultats = list(ex.map(partial(_appel, fonction), params, chunksize=max(1, chunksize)))
+    for _, spans, (fichiers, octets) in resultats:
+        if spans is not None:
+            traces.ajouter(spans)
+        compter_ecriture(octets, fichiers)
+    return [r for r, _, _ in resultats]
@@ -0,0 +1,192 @@
+# traces.py
+from __future__ import annotations
+
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable
+
+# Mesures par étape (span): durée, octets traités, pic mémoire (tracemalloc).
+#
+#   with span("filtre", octets=img.nbytes, sigma=s):
+#       ...
+#
+#   @trace("alignement")
+#   def align_images(...): ...
+#
+# Désactivé par défaut: span() retourne alors un contexte vide partagé (pas d'horloge,
+# pas de tracemalloc), le coût est celui d'un appel de fonction. Pour activer:
+#
+#   TP2_TRACE=trace.json python code/main_hybride.py
+#
+# La trace (JSON) est écrite à la fin du processus principal. Les spans des workers
+# d'un sweep reviennent avec leurs résultats (voir sweep.py).
+#
+# Le pic mémoire d'un span = pic des allocations suivies par tracemalloc (numpy inclus)
+# pendant le span, au-dessus de la mémoire déjà allouée à son début. tracemalloc est
+# global au processus: les spans de threads concurrents (écriture PNG) se chevauchent.
+
+VARIABLE_ENV = "TP2_TRACE"
+
+_ACTIF = False
+_MEMOIRE = True
+_T0 = time.perf_counter()
+_PID_PRINCIPAL: int | None = None
+_SPANS: list[dict[str, Any]] = []
+_LOCAL = threading.local()
+_NUL = nullcontext()
+
+
+def actif() -> bool:
+    return _ACTIF
+
+
+def activer(memoire: bool = True) -> None:
+    # memoire=False: durées seulement (tracemalloc ralentit les allocations Python)
+    global _ACTIF, _MEMOIRE
+    _ACTIF = True
+    _MEMOIRE = memoire
+    if memoire and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def desactiver() -> None:
+    global _ACTIF
+    _ACTIF = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _pile() -> list[_Span]:
+    pile = getattr(_LOCAL, "pile", None)
+    if pile is None:
+        pile = _LOCAL.pile = []
+    return pile
+
+
+class _Span:
+    __slots__ = ("nom", "octets", "attributs", "_debut", "_memoire_debut", "pic_enfants")
+
+    def __init__(self, nom: str, octets: int, attributs: dict[str, Any]) -> None:
+        self.nom = nom
+        self.octets = int(octets)
+        self.attributs = attributs
+        self.pic_enfants = 0
+
+    def __enter__(self) -> _Span:
+        pile = _pile()
+        if _MEMOIRE and tracemalloc.is_tracing():
+            courant, pic = tracemalloc.get_traced_memory()
+            if pile:
+                # Le pic du parent jusqu'ici est conservé avant la remise à zéro
+                pile[-1].pic_enfants = max(pile[-1].pic_enfants, pic)
+            tracemalloc.reset_peak()
+            self._memoire_debut = courant
+        else:
+            self._memoire_debut = None
+        pile.append(self)
+        self._debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        fin = time.perf_counter()
+        pile = _pile()
+        pile.pop()
+
+        enregistrement = {
+            "nom": self.nom,
+            "parent": pile[-1].nom if pile else None,
+            "profondeur": len(pile),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "debut": self._debut - _T0,
+            "duree": fin - self._debut,
+            "octets": self.octets,
+        }
+        if self._memoire_debut is not None and tracemalloc.is_tracing():
+            pic = max(tracemalloc.get_traced_memory()[1], self.pic_enfants)
+            enregistrement["pic_octets"] = max(pic - self._memoire_debut, 0)
+            if pile:
+                pile[-1].pic_enfants = max(pile[-1].pic_enfants, pic)
+        if exc[0] is not None:
+            enregistrement["erreur"] = exc[0].__name__
+        enregistrement.update(self.attributs)
+        _SPANS.append(enregistrement)
+
+
+def span(nom: str, octets: int = 0, **attributs: Any) -> Any:
+    # Contexte mesuré; octets = taille des données traitées (ex: img.nbytes)
+    if not _ACTIF:
+        return _NUL
+    return _Span(nom, octets, attributs)
+
+
+def trace(nom: str | None = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    # Décorateur: un span par appel (nom par défaut: nom de la fonction).
+    # octets = taille du premier argument numpy (l'image traitée)
+    def decorateur(fonction: Callable[..., Any]) -> Callable[..., Any]:
+        nom_span = nom or fonction.__name__
+
+        @functools.wraps(fonction)
+        def enveloppe(*args: Any, **kwargs: Any) -> Any:
+            if not _ACTIF:
+                return fonction(*args, **kwargs)
+            octets = next((a.nbytes for a in args if hasattr(a, "nbytes")), 0)
+            with _Span(nom_span, octets, {"fonction": fonction.__qualname__}):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return decorateur
+
+
+def vider() -> list[dict[str, Any]]:
+    # Spans enregistrés depuis le dernier appel (retirés du tampon)
+    spans = _SPANS[:]
+    del _SPANS[: len(spans)]
+    return spans
+
+
+def ajouter(spans: list[dict[str, Any]]) -> None:
+    # Spans venus d'un autre processus (workers d'un sweep)
+    _SPANS.extend(spans)
+
+
+def resume(spans: list[dict[str, Any]]) -> dict[str, dict[str, float]]:
+    # Total par nom de span: nombre, durée, octets, pic mémoire max
+    totaux: dict[str, dict[str, float]] = {}
+    for s in spans:
+        t = totaux.setdefault(s["nom"], {"n": 0, "duree": 0.0, "octets": 0, "pic_octets": 0})
+        t["n"] += 1
+        t["duree"] += s["duree"]
+        t["octets"] += s["octets"]
+        t["pic_octets"] = max(t["pic_octets"], s.get("pic_octets", 0))
+    return totaux
+
+
+def ecrire(chemin: str | Path) -> Path:
+    chemin = Path(chemin)
+    spans = sorted(vider(), key=lambda s: s["debut"])
+    contenu = {"pid": os.getpid(), "spans": spans, "resume": resume(spans)}
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    chemin.write_text(json.dumps(contenu, indent=1, default=str), encoding="utf-8")
+    return chemin
+
+
+def _ecrire_a_la_sortie(chemin: str) -> None:
+    # Seulement le processus qui a activé la trace (pas les workers forkés)
+    if os.getpid() == _PID_PRINCIPAL and _ACTIF:
+        print(f"Trace: {ecrire(chemin).resolve()}")
+
+
+# Pas dans les workers lancés en 'spawn' (ils réimportent ce module): leurs spans
+# reviennent au processus principal, qui seul écrit la trace
+if os.environ.get(VARIABLE_ENV) and multiprocessing.parent_process() is None:
+    _PID_PRINCIPAL = os.getpid()
+    activer(memoire=os.environ.get("TP2_TRACE_MEMOIRE", "1") != "0")
+    atexit.register(_ecrire_a_la_sortie, os.environ[VARIABLE_ENV])
@@ -0,0 +1,139 @@
+# tuiles.py
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Iterator, Sequence
+
+import numpy as np
+
+from gauss_backend import rayon_noyau
+
+# Exécution par tuiles pour les images plus grandes que la RAM.
+#
+# Chaque tuile est lue avec une bordure (halo) au moins aussi large que le rayon du
+# plus grand noyau gaussien. Au bord de l'image, le halo manquant est complété en mode
+# 'edge', ce qui reproduit le mode='nearest' de skimage/scipy: l'intérieur de chaque
+# tuile filtrée est donc identique au résultat calculé sur l'image entière.
+
+# Côté d'une tuile (sans le halo), en pixels
+TAILLE_TUILE = 1024
+
+
+def halo_gaussien(sigma_max: float, truncate: float = 4.0) -> int:
+    # Bordure nécessaire pour qu'un flou de sigma <= sigma_max soit exact dans la tuile
+    return rayon_noyau(sigma_max, truncate) if sigma_max > 0 else 0
+
+
+def decouper_tuiles(H: int, W: int, taille: int = TAILLE_TUILE) -> Iterator[tuple[slice, slice]]:
+    # Tuiles en ordre ligne par ligne (accès mémoire contigu dans les memmap)
+    for y0 in range(0, H, taille):
+        for x0 in range(0, W, taille):
+            yield slice(y0, min(y0 + taille, H)), slice(x0, min(x0 + taille, W))
+
+
+def lire_tuile(source: np.ndarray, ys: slice, xs: slice, halo: int) -> np.ndarray:
+    # Tuile + halo (complété en 'edge' hors de l'image), copiée en mémoire
+    H, W = source.shape[:2]
+    ya, yb = max(ys.start - halo, 0), min(ys.stop + halo, H)
+    xa, xb = max(xs.start - halo, 0), min(xs.stop + halo, W)
+    bloc = np.asarray(source[ya:yb, xa:xb])
+
+    pad = [(halo - (ys.start - ya), halo - (yb - ys.stop)), (halo - (xs.start - xa), halo - (xb - xs.stop))]
+    pad += [(0, 0)] * (bloc.ndim - 2)
+    if any(p != (0, 0) for p in pad):
+        return np.pad(bloc, pad, mode="edge")
+    return bloc.copy()
+
+
+def appliquer_par_tuiles(
+    fonction: Callable[..., np.ndarray | Sequence[np.ndarray]],
+    sources: Sequence[np.ndarray],
+    sorties: Sequence[np.ndarray],
+    halo: int = 0,
+    taille: int = TAILLE_TUILE,
+) -> None:
+    # Appelle fonction(*tuiles_avec_halo) pour chaque tuile et écrit l'intérieur de
+    # chaque résultat dans les sorties correspondantes (memmap ou tableaux en mémoire).
+    # Les sources et les sorties ont toutes les mêmes (H, W); le nombre de canaux peut changer.
+    H, W = sources[0].shape[:2]
+    for s in (*sources, *sorties):
+        if s.shape[:2] != (H, W):
+            raise ValueError(f"Tailles incompatibles: {s.shape[:2]} vs {(H, W)}")
+
+    for ys, xs in decouper_tuiles(H, W, taille):
+        tuiles = [lire_tuile(s, ys, xs, halo) for s in sources]
+        resultats = fonction(*tuiles)
+        if isinstance(resultats, np.ndarray):
+            resultats = (resultats,)
+
+        h, w = ys.stop - ys.start, xs.stop - xs.start
+        for sortie, r in zip(sorties, resultats):
+            sortie[ys, xs] = r[halo : halo + h, halo : halo + w]
+
+    for sortie in sorties:
+        if isinstance(sortie, np.memmap):
+            sortie.flush()
+
+
+def maximum_par_tuiles(source: np.ndarray, taille: int = TAILLE_TUILE) -> float:
+    # Max global sans charger l'image en entier (bandes de lignes)
+    H = source.shape[0]
+    return max((float(np.max(source[y : y + taille])) for y in range(0, H, taille)), default=0.0)
+
+
+def bornes_par_tuiles(source: np.ndarray, taille: int = TAILLE_TUILE) -> tuple[float, float]:
+    # (min, max) globaux sans charger l'image en entier (bandes de lignes)
+    bandes = [source[y : y + taille] for y in range(0, source.shape[0], taille)]
+    return min(float(np.min(b)) for b in bandes), max(float(np.max(b)) for b in bandes)
+
+
+class Scratch:
+    # Dossier temporaire de fichiers .npy mappés en mémoire, supprimé à la fermeture.
+    #
+    #   with Scratch() as scratch:
+    #       sortie = scratch.tableau("hybride", (H, W, 3), np.uint8)
+    #
+    # dossier: où créer les fichiers (disque local rapide de préférence)
+
+    def __init__(self, dossier: str | Path | None = None) -> None:
+        self._tmp = tempfile.TemporaryDirectory(prefix="tp2_tuiles_", dir=dossier,
+                                                ignore_cleanup_errors=True)
+        self.dossier = Path(self._tmp.name)
+        self._tableaux: list[np.memmap] = []
+
+    def tableau(self, nom: str, shape: tuple[int, ...], dtype: Any) -> np.memmap:
+        chemin = self.dossier / f"{nom}_{len(self._tableaux)}.npy"
+        tableau = np.lib.format.open_memmap(chemin, mode="w+", dtype=dtype, shape=shape)
+        self._tableaux.append(tableau)
+        return tableau
+
+    def image(self, chemin: str | Path) -> np.memmap:
+        # Décode une image une seule fois vers un memmap (type d'origine, ex: uint8):
+        # les copies float ne sont ensuite faites que tuile par tuile.
+        # Limite: PNG/JPEG sont décodés en entier (imageio ne lit pas par bandes), donc
+        # l'image décodée (uint8, 4 à 8x plus petite que ses copies float) doit tenir en RAM
+        # une fois. Un tableau .npy est ouvert directement en memmap (lecture seule), sans
+        # décodage: c'est le format d'entrée pour les images vraiment plus grandes que la RAM.
+        if Path(chemin).suffix == ".npy":
+            return np.load(chemin, mmap_mode="r")
+
+        from fichiers_image import lire_image
+
+        img = lire_image(chemin)
+        tableau = self.tableau(Path(chemin).stem, img.shape, img.dtype)
+        tableau[...] = img
+        del img
+        tableau.flush()
+        return tableau
+
+    def close(self) -> None:
+        # Les résultats doivent être écrits (ou copiés) avant: les fichiers disparaissent
+        self._tableaux.clear()
+        self._tmp.cleanup()
+
+    def __enter__(self) -> Scratch:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,99 @@
+# writer.py
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from fichiers_image import ecrire_image
+from traces import span
+
+
+@dataclass
+class ResultatEcriture:
+    chemin: Path
+    ok: bool
+    octets: int = 0
+    erreur: str | None = None
+
+
+class ErreurEcriture(RuntimeError):
+    # Levée par ImageWriter.close() si au moins un fichier n'a pas pu être écrit
+    def __init__(self, echecs: list[ResultatEcriture]) -> None:
+        self.echecs = echecs
+        details = "\n".join(f" - {r.chemin}: {r.erreur}" for r in echecs)
+        super().__init__(f"{len(echecs)} image(s) non sauvegardée(s):\n{details}")
+
+
+class ImageWriter:
+    # Encodage/écriture des images en arrière-plan (pool de threads).
+    #
+    # - soumettre() bloque quand max_en_attente images sont déjà en file:
+    #   la mémoire reste bornée même si le calcul va plus vite que zlib
+    # - flush() attend toutes les écritures et retourne leurs résultats (ordre de soumission)
+    # - close() fait un flush et lève ErreurEcriture s'il y a eu des échecs
+    #
+    # L'image soumise ne doit plus être modifiée par l'appelant.
+
+    def __init__(self, max_workers: int = 4, max_en_attente: int = 16) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="writer")
+        self._places = threading.BoundedSemaphore(max_en_attente)
+        self._en_cours: list[Future] = []
+        self.resultats: list[ResultatEcriture] = []
+
+    def _ecrire(self, chemin: Path, image: np.ndarray, fonction: Callable[..., Any], kwargs: dict) -> ResultatEcriture:
+        try:
+            chemin.parent.mkdir(parents=True, exist_ok=True)
+            with span("encodage", octets=image.nbytes, fichier=chemin.name):
+                fonction(chemin, image, **kwargs)
+            res = ResultatEcriture(chemin, True, chemin.stat().st_size)
+        except Exception as e:
+            res = ResultatEcriture(chemin, False, erreur=f"{type(e).__name__}: {e}")
+        finally:
+            self._places.release()
+        return res
+
+    def soumettre(
+        self,
+        chemin: str | Path,
+        image: np.ndarray,
+        fonction: Callable[..., Any] = ecrire_image,
+        **kwargs: Any,
+    ) -> Future:
+        # fonction(chemin, image, **kwargs) fait l'encodage (ecrire_image par défaut: format
+        # selon l'extension, profil d'encodage courant; voir fichiers_image.py)
+        self._places.acquire()
+        fut = self._pool.submit(self._ecrire, Path(chemin), image, fonction, kwargs)
+        self._en_cours.append(fut)
+        return fut
+
+    def flush(self) -> list[ResultatEcriture]:
+        # Attend toutes les écritures soumises depuis le dernier flush
+        en_cours, self._en_cours = self._en_cours, []
+        resultats = [f.result() for f in en_cours]
+        self.resultats.extend(resultats)
+        return resultats
+
+    def close(self) -> list[ResultatEcriture]:
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
+        echecs = [r for r in self.resultats if not r.ok]
+        if echecs:
+            raise ErreurEcriture(echecs)
+        return self.resultats
+
+    def __enter__(self) -> "ImageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Ne pas masquer l'exception d'origine
+            self._pool.shutdown(wait=True)
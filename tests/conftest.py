@@ -0,0 +1,9 @@
+# conftest.py
+import sys
+from pathlib import Path
+
+# Les modules du TP sont des fichiers plats dans code/ (plus le paquet hybrid_python),
+# importés comme par les scripts main_*
+CODE = Path(__file__).resolve().parent.parent / "code"
+if str(CODE) not in sys.path:
+    sys.path.insert(0, str(CODE))
@@ -0,0 +1,52 @@
+# test_accentuation.py
+import numpy as np
+import pytest
+
+import traces
+from accentuation import SIGMA_MIN_COMPOSE, accentuation_sigmas, flous_incrementaux
+from gauss_backend import gaussian
+
+# Autour de SIGMA_MIN_COMPOSE (1.0): flous directs en dessous, composés au-dessus dès que
+# l'incrément en quadrature atteint 1; puis des sigmas décroissants (on repart de l'image)
+SIGMAS = [0, 0.5, 0.99, 1.0, 1.01, 1.2, 1.5, 1.75, 2.0, 2.5, 3.0, 5.0, 8.0, 1.5, 1.0]
+
+
+def _image(forme, graine=0):
+    # Image lisse (pas du bruit blanc) en float [0, 1]
+    rng = np.random.default_rng(graine)
+    petit = rng.random((forme[0] // 8 + 1, forme[1] // 8 + 1) + forme[2:])
+    return np.repeat(np.repeat(petit, 8, axis=0), 8, axis=1)[: forme[0], : forme[1]]
+
+
+def _flou_direct(img, s):
+    return gaussian(img, s, channel_axis=-1 if img.ndim == 3 else None) if s > 0 else img
+
+
+@pytest.mark.parametrize("forme", [(113, 105), (113, 105, 3)])
+def test_flous_incrementaux_egaux_aux_flous_directs(forme):
+    img = _image(forme)
+    traces.activer(memoire=False)
+    try:
+        flous = list(flous_incrementaux(img, SIGMAS))
+    finally:
+        spans = [s for s in traces.vider() if s["nom"] == "filtre"]
+        traces.desactiver()
+
+    assert [s for s, _ in flous] == SIGMAS
+    for s, flou in flous:
+        assert flou.shape == img.shape
+        np.testing.assert_allclose(flou, _flou_direct(img, s), atol=1e-4, err_msg=f"sigma={s}")
+
+    # Le chemin composé sert vraiment, jamais sous SIGMA_MIN_COMPOSE
+    composes = [s["sigma"] for s in spans if s["incremental"]]
+    assert composes
+    assert min(composes) >= SIGMA_MIN_COMPOSE
+
+
+def test_accentuation_sigmas_a_un_niveau_pres_des_flous_directs():
+    img = _image((113, 105, 3), graine=1)
+    for s, sharp in accentuation_sigmas(img, SIGMAS):
+        ref = img + s * (img - _flou_direct(img, s))
+        ecart = np.abs(np.clip(sharp * 255, 0, 255).astype(np.uint8).astype(int)
+                       - np.clip(ref * 255, 0, 255).astype(np.uint8))
+        assert ecart.max() <= 1, f"sigma={s}"
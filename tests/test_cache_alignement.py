@@ -0,0 +1,32 @@
+# test_cache_alignement.py
+import numpy as np
+
+from hybrid_python import cache_alignement
+
+
+def test_cache_par_mode(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    img1 = (rng.random((60, 80)) * 255).astype(np.uint8)
+    img2 = (rng.random((60, 80)) * 255).astype(np.uint8)
+
+    appels = []
+
+    def choisir_points(a, b, auto=False):
+        appels.append(auto)
+        # (x1, y1, x2, y2): deux points par image, ici sans déplacement
+        x, y = np.array([10.0, 50.0]), np.array([10.0, 40.0])
+        return x, y, x, y
+
+    monkeypatch.setattr(cache_alignement, "choisir_points", choisir_points)
+
+    cache_alignement.aligner_avec_cache(img1, img2, auto=True, dossier=tmp_path)
+    cache_alignement.aligner_avec_cache(img1, img2, auto=True, dossier=tmp_path)
+    assert appels == [True]
+
+    # Un alignement auto en cache n'est pas relu pour une demande de clics
+    cache_alignement.aligner_avec_cache(img1, img2, auto=False, dossier=tmp_path)
+    assert appels == [True, False]
+
+
+def test_dossier_independant_du_dossier_courant():
+    assert cache_alignement.DOSSIER_CACHE.is_absolute()
@@ -0,0 +1,42 @@
+# test_gauss_backend.py
+import numpy as np
+import pytest
+
+from gauss_backend import GaussianMultiSigma, gaussian
+from precision import precision
+
+SIGMAS = [0.5, 2.0, 6.0]
+
+
+def _image(forme, graine=0):
+    rng = np.random.default_rng(graine)
+    return rng.random(forme)
+
+
+@pytest.mark.parametrize("forme", [(97, 130), (97, 130, 3)])
+@pytest.mark.parametrize("sigma", SIGMAS)
+def test_fft_egale_spatial(forme, sigma):
+    # Padding 'edge' du chemin FFT == mode 'nearest' de skimage (à l'arrondi près)
+    img = _image(forme)
+    axe = -1 if img.ndim == 3 else None
+    fft = gaussian(img, sigma, channel_axis=axe, methode="fft")
+    spatial = gaussian(img, sigma, channel_axis=axe, methode="spatial")
+    assert fft.shape == spatial.shape
+    np.testing.assert_allclose(fft, spatial, atol=1e-6)
+
+
+def test_multi_sigma_reutilise_la_fft_sans_changer_le_resultat():
+    # Sigmas croissants puis décroissants: FFT directe refaite ou réutilisée selon le padding
+    img = _image((80, 90, 3), graine=1)
+    multi = GaussianMultiSigma(img, channel_axis=-1)
+    for sigma in SIGMAS + SIGMAS[::-1]:
+        ref = gaussian(img, sigma, channel_axis=-1, methode="spatial")
+        np.testing.assert_allclose(multi.filtre(sigma, methode="fft"), ref, atol=1e-6)
+
+
+def test_fft_float32_reste_en_float32():
+    with precision("float32"):
+        img = _image((64, 64)).astype(np.float32)
+        fft = gaussian(img, 3.0, methode="fft")
+    assert fft.dtype == np.float32
+    np.testing.assert_allclose(fft, gaussian(img.astype(np.float64), 3.0, methode="spatial"), atol=1e-5)
@@ -0,0 +1,49 @@
+# test_hybride.py
+import numpy as np
+import pytest
+
+import gauss_backend
+from blur_bank import BlurBank
+from hybrid_python.hybrid_image import hybrid_image, hybrid_image_tuiles
+
+
+def _paire(sombre):
+    # Paire RGBA; sombre=True: couleurs de im1 dans {0, 1} (uint8) sous un alpha à 255,
+    # le cas où le max de toute l'image (alpha compris) et celui des couleurs diffèrent
+    rng = np.random.default_rng(0)
+    im1 = (rng.random((64, 80, 4)) * 255).astype(np.uint8)
+    im2 = (rng.random((64, 80, 4)) * 255).astype(np.uint8)
+    if sombre:
+        im1[:, :, :3] = rng.random((64, 80, 3)) < 0.5
+    im1[:, :, 3] = 255
+    return im1, im2
+
+
+@pytest.mark.parametrize("sombre", [False, True])
+def test_hybride_meme_normalisation_avec_ou_sans_banque(sombre):
+    im1, im2 = _paire(sombre)
+    ref = hybrid_image(im1, im2, 3.0, 2.0)
+    np.testing.assert_array_equal(hybrid_image(im1, im2, 3.0, 2.0, bank=BlurBank()), ref)
+    np.testing.assert_array_equal(hybrid_image_tuiles(im1, im2, 3.0, 2.0, taille=16), ref)
+    np.testing.assert_array_equal(ref[:, :, 3], im1[:, :, 3])
+
+
+def test_banque_budget_compte_sources_et_filtres(monkeypatch):
+    # Chemin FFT forcé: chaque filtre garde une FFT directe paddée
+    monkeypatch.setattr(gauss_backend, "choisir_methode", lambda *a, **k: "fft")
+    im1, im2 = _paire(False)
+    sans_limite = BlurBank(sigma_max=8.0)
+    bank = BlurBank(max_bytes=200_000, sigma_max=8.0)
+    for s in (1.0, 2.0, 4.0, 8.0):
+        for im in (im1, im2):
+            for mode in ("rgb", "gray"):
+                np.testing.assert_array_equal(bank.flou(im, s, mode), sans_limite.flou(im, s, mode))
+                np.testing.assert_array_equal(bank.spectre(im, s, mode), sans_limite.spectre(im, s, mode))
+                assert bank.nbytes <= bank.max_bytes
+
+    # nbytes couvre tout ce que la banque garde: flous, spectres, sources et FFT des filtres
+    assert bank.nbytes == sum(v.nbytes for v in bank._cache.values())
+    assert any(k[-1] == "filtre" and v.nbytes > 0 for k, v in sans_limite._cache.items())
+    assert sans_limite.nbytes == sum(v.nbytes for v in sans_limite._cache.values())
+    assert sans_limite.nbytes > bank.max_bytes
+    assert bank.evinces > 0
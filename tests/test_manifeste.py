@@ -0,0 +1,92 @@
+# test_manifeste.py
+import os
+
+import numpy as np
+
+import main_accentuation
+from fichiers_image import ecrire_image, ecritures
+from manifeste import Manifeste, signature
+
+
+def _image(forme, graine=0):
+    rng = np.random.default_rng(graine)
+    return (rng.random(forme) * 255).astype(np.uint8)
+
+
+def _etat_sorties(dossier):
+    # {nom: (mtime_ns, contenu)} de tous les fichiers écrits
+    return {p.name: (p.stat().st_mtime_ns, p.read_bytes()) for p in sorted(dossier.iterdir())}
+
+
+def test_etats_du_manifeste(tmp_path):
+    sortie = tmp_path / "a.png"
+    ecrire_image(sortie, _image((8, 8)))
+    sig = signature(sigma=1.0)
+
+    manifeste = Manifeste(tmp_path / "manifeste.json")
+    assert manifeste.etat(sortie, sig) == "inconnu"
+    manifeste.enregistrer(sortie, sig)
+    manifeste.sauver()
+
+    # Relu d'un autre processus (nouvelle instance)
+    manifeste = Manifeste(tmp_path / "manifeste.json")
+    assert manifeste.etat(sortie, sig) == "ok"
+    assert manifeste.etat(sortie, signature(sigma=2.0)) == "perime"
+    st = sortie.stat()
+    os.utime(sortie, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert manifeste.etat(sortie, sig) == "modifie"
+    sortie.unlink()
+    assert manifeste.etat(sortie, sig) == "manquant"
+
+
+def test_sauver_garde_les_entrees_des_autres_scripts(tmp_path):
+    a, b = tmp_path / "a.png", tmp_path / "b.png"
+    for p in (a, b):
+        ecrire_image(p, _image((8, 8)))
+    m1 = Manifeste(tmp_path / "manifeste.json")
+    m2 = Manifeste(tmp_path / "manifeste.json")
+    m1.enregistrer(a, "sig_a")
+    m2.enregistrer(b, "sig_b")
+    m1.sauver()
+    m2.sauver()
+
+    relu = Manifeste(tmp_path / "manifeste.json")
+    assert relu.a_jour(a, "sig_a") and relu.a_jour(b, "sig_b")
+
+
+def test_reconstruction_incrementale(tmp_path, monkeypatch):
+    # Seules les sorties manquantes ou périmées sont recalculées, avec le même contenu
+    # qu'une reconstruction complète
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "img.png"
+    ecrire_image(source, _image((40, 50, 3)))
+    out_dir = tmp_path / "out"
+    sigmas = [0.5, 1.0, 2.0]
+
+    def accentuer(sigmas):
+        avant = ecritures()[0]
+        main_accentuation.accentuer([source], sigmas, out_dir=out_dir, n_workers=1)
+        return ecritures()[0] - avant
+
+    assert accentuer(sigmas) == len(sigmas) + 1   # + le montage
+    complet = _etat_sorties(out_dir)
+
+    # Rien n'a changé: aucune écriture
+    assert accentuer(sigmas) == 0
+    assert _etat_sorties(out_dir) == complet
+
+    # Une sortie supprimée: elle seule est réécrite, à l'identique (montage encore à jour)
+    chemin = main_accentuation.chemins_sorties("img", [1.0], out_dir)[0]
+    os.remove(chemin)
+    assert accentuer(sigmas) == 1
+    apres = _etat_sorties(out_dir)
+    nom = os.path.basename(chemin)
+    assert apres[nom][1] == complet[nom][1]
+    assert {k: v for k, v in apres.items() if k != nom} == {k: v for k, v in complet.items() if k != nom}
+
+    # Un sigma de plus: sa sortie et le montage seulement
+    assert accentuer(sigmas + [3.0]) == 2
+
+    # Source modifiée: tout est périmé
+    ecrire_image(source, _image((40, 50, 3), graine=1))
+    assert accentuer(sigmas + [3.0]) == len(sigmas) + 2
@@ -0,0 +1,33 @@
+# test_melange.py
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from main_melange import masque_vertical, melange, melange_piles
+
+
+def _pic(fonction, *args):
+    # (résultat, pic tracemalloc en octets)
+    tracemalloc.start()
+    try:
+        resultat = fonction(*args)
+        return resultat, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("canaux", [0, 3])
+def test_melange_egal_piles_avec_pic_plus_bas(canaux):
+    rng = np.random.default_rng(0)
+    forme = (384, 384, canaux) if canaux else (384, 384)
+    a = (rng.random(forme) * 255).astype(np.uint8)
+    b = (rng.random(forme) * 255).astype(np.uint8)
+    m = masque_vertical(forme)
+
+    flux, pic_flux = _pic(melange, a, b, m)
+    ref, pic_ref = _pic(melange_piles, a, b, m)
+
+    assert flux.shape == ref.shape
+    np.testing.assert_allclose(flux, ref, atol=1e-5)
+    assert pic_flux < pic_ref
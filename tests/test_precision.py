@@ -0,0 +1,37 @@
+# test_precision.py
+import numpy as np
+import pytest
+
+import main_melange
+from precision import get_precision, set_precision, verifier_float32
+
+
+def _image(forme, graine):
+    # Bruit uint8 (comme python code/precision.py). Pas de blocs constants: leur spectre a
+    # des zéros exacts, dont le log ne se compare pas entre float32 et float64
+    rng = np.random.default_rng(graine)
+    return (rng.random(forme) * 255).astype(np.uint8)
+
+
+def test_float32_a_un_niveau_pres_de_float64():
+    # Chaque étape du pipeline (accentuation, hybride, spectre, piles, mélange) en float32 donne
+    # les mêmes uint8 que float64, à 1 niveau près (arrondis de la conversion finale)
+    ecarts = verifier_float32(_image((96, 128, 3), 0), _image((96, 128, 3), 1))
+    assert {"hybride", "spectre", "gauss_lvl3", "lap_lvl3", "melange"} <= set(ecarts)
+    assert max(ecarts.values()) <= 1, ecarts
+    assert get_precision() == "float64"
+
+
+def test_type_inattendu_detecte(monkeypatch):
+    # Une étape qui repasse en float64 est signalée, pas seulement comparée
+    melange = main_melange.melange
+    monkeypatch.setattr(main_melange, "melange", lambda *a, **k: melange(*a, **k).astype(np.float64))
+    with pytest.raises(TypeError, match="mélange"):
+        verifier_float32(_image((32, 40, 3), 0), _image((32, 40, 3), 1))
+    assert get_precision() == "float64"
+
+
+def test_precision_inconnue():
+    with pytest.raises(ValueError, match="float16"):
+        set_precision("float16")
+    assert get_precision() == "float64"
@@ -0,0 +1,132 @@
+# test_tuiles.py
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import main_accentuation
+import main_hybride
+import main_pile
+from accentuation import accentuation_sigmas, accentuation_tuiles
+from fichiers_image import ecrire_image, lire_image
+from hybrid_python import align_images
+from main_pile import gaussian_stack, gaussian_stack_tuiles, laplacian_stack, laplacian_stack_tuiles
+from manifeste import Manifeste
+from tuiles import Scratch
+
+SIGMAS = [0, 0.5, 1.5, 2.5]
+
+
+def _image(forme, graine=0):
+    # Image lisse (pas du bruit blanc): proche des vraies photos pour les flous
+    rng = np.random.default_rng(graine)
+    petit = rng.random((forme[0] // 8 + 1, forme[1] // 8 + 1) + forme[2:])
+    grand = np.repeat(np.repeat(petit, 8, axis=0), 8, axis=1)[: forme[0], : forme[1]]
+    return (grand * 255).astype(np.uint8)
+
+
+def test_accentuation_tuiles_a_un_niveau_pres_du_mode_memoire():
+    img = _image((300, 260, 4))
+    sorties = [np.empty_like(img) for _ in SIGMAS]
+    accentuation_tuiles(img, SIGMAS, sorties, taille=128)
+
+    rgb = img[:, :, :3].astype(np.float64) / 255.0
+    for (s, sharp), tuile in zip(accentuation_sigmas(rgb, SIGMAS), sorties):
+        ref = np.clip(sharp * 255.0, 0, 255).astype(np.uint8)
+        assert np.abs(ref.astype(int) - tuile[:, :, :3]).max() <= 1, f"sigma={s}"
+        np.testing.assert_array_equal(tuile[:, :, 3], img[:, :, 3])
+
+
+@pytest.mark.parametrize("forme", [(200, 170), (200, 170, 3)])
+def test_piles_tuiles_egales_piles_en_memoire(forme):
+    img = _image(forme).astype(np.float32) / 255.0
+    g, sigmas = gaussian_stack(img, n_levels=4)
+    g_t, sigmas_t = gaussian_stack_tuiles(img, n_levels=4, taille=64)
+    assert sigmas == sigmas_t
+    np.testing.assert_allclose(g_t, g, atol=1e-6)
+
+    lap = laplacian_stack(g)
+    np.testing.assert_allclose(laplacian_stack_tuiles(g_t, sortie=g_t, taille=64), lap, atol=1e-6)
+
+
+@pytest.mark.parametrize("forme", [(400, 360), (400, 360, 4)])
+def test_generer_tuiles_sans_copie_pleine_resolution(forme, tmp_path, monkeypatch, capsys):
+    # Mêmes niveaux que generer() en mémoire (à 1 niveau uint8 près: spatial/FFT choisi par
+    # tuile), montage réduit, et pas de copie de la pile en mémoire pendant l'écriture
+    monkeypatch.setattr(main_pile, "LARGEUR_MONTAGE", 400)
+    img = _image(forme).astype(np.float32) / 255.0
+    main_pile.generer(img.copy(), tmp_path / "memoire", 4, 2.0, 2.0, None, 1)
+
+    with Scratch() as scratch:
+        source = scratch.tableau("img", img.shape, np.float32)
+        source[...] = img
+        pile = scratch.tableau("pile", (4, *img.shape), np.float32)
+        g, sigmas = gaussian_stack_tuiles(source, n_levels=4, sortie=pile, taille=128)
+        tracemalloc.start()
+        main_pile.ecrire_piles_tuiles(g, sigmas, tmp_path / "tuiles", tmp_path / "tuiles" / "montage.png",
+                                      scratch, taille=128)
+        pic = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    assert pic < pile.nbytes / 2
+
+    for chemin in sorted((tmp_path / "memoire").glob("*_lvl*")):
+        ref, tuile = lire_image(chemin), lire_image(tmp_path / "tuiles" / chemin.name)
+        assert np.abs(ref.astype(int) - tuile).max() <= 1, chemin.name
+    montage = lire_image(tmp_path / "tuiles" / "montage.png")
+    assert montage.shape[1] <= 400
+
+
+def test_accentuer_tuiles_par_lots(tmp_path, monkeypatch):
+    # Les lots de sigmas donnent les mêmes fichiers qu'un seul lot, avec leur propre signature
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "img.png"
+    ecrire_image(source, _image((90, 70, 3)))
+    sigmas = [0, 0.5, 1.0, 1.5, 2.0]
+
+    monkeypatch.setattr(main_accentuation, "TUILES", True)
+    resultats = {}
+    for par_lot in (2, len(sigmas)):
+        monkeypatch.setattr(main_accentuation, "SIGMAS_PAR_LOT", par_lot)
+        out_dir = tmp_path / f"lots_{par_lot}"
+        main_accentuation.accentuer([source], sigmas, out_dir=out_dir)
+        resultats[par_lot] = [lire_image(c) for c in main_accentuation.chemins_sorties("img", sigmas, out_dir)]
+    for a, b in zip(*resultats.values()):
+        np.testing.assert_array_equal(a, b)
+
+    # Les sorties du mode tuiles ne passent pas pour à jour en mode mémoire
+    chemins = main_accentuation.chemins_sorties("img", sigmas, tmp_path / "lots_2")
+    memoire = main_accentuation.signatures_sorties(source, sigmas)
+    assert main_accentuation.a_regenerer(Manifeste(), chemins, memoire) == list(range(len(sigmas)))
+
+
+@pytest.mark.parametrize("canaux", [(3, 3), (4, 3)])
+def test_hybrider_tuiles_a_un_niveau_pres_du_sweep(canaux, tmp_path, monkeypatch, capsys):
+    # hybrider(tuiles=True): mêmes hybrides que le sweep en mémoire (à 1 niveau uint8 près),
+    # sans amplitudes FFT, avec leur propre signature
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(align_images, "align_images", lambda im1, im2, **k: (im1, im2))
+    chemins = []
+    for k, c in enumerate(canaux):
+        chemins.append(tmp_path / f"img{k}.png")
+        ecrire_image(chemins[-1], _image((150, 130, c), graine=k))
+    lows, highs = [1.0, 4.0], [2.0, 6.0]
+
+    def hybrider(out_dir, tuiles):
+        main_hybride.hybrider(*chemins, out_dir=out_dir, out_amp_dir=out_dir / "amplitude", cutoff_lows=lows,
+                              cutoff_highs=highs, auto=True, cache=False, n_workers=1, tuiles=tuiles)
+        return capsys.readouterr().out
+
+    hybrider(tmp_path / "memoire", False)
+    assert "Combos à régénérer: 4/4" in hybrider(tmp_path / "tuiles", True)
+    for low in lows:
+        for high in highs:
+            nom = f"hybrid_cutoff{low}_{high}.png"
+            ref, tuile = lire_image(tmp_path / "memoire" / nom), lire_image(tmp_path / "tuiles" / nom)
+            assert ref.shape == tuile.shape
+            assert np.abs(ref.astype(int) - tuile).max() <= 1, nom
+    assert not list((tmp_path / "tuiles" / "amplitude").iterdir())
+    assert (tmp_path / "tuiles" / "planche_cutoffs.png").is_file()
+
+    # À jour en mode tuiles, mais pas en mode mémoire (autre signature)
+    assert "Combos à régénérer: 0/4" in hybrider(tmp_path / "tuiles", True)
+    assert "Combos à régénérer: 4/4" in hybrider(tmp_path / "tuiles", False)